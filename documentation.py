@@ -148,6 +148,13 @@ All progress already done will be saved.
 tagfile updatedb
 ```
 
+To index only the files of a new media-path right away, add it with the
+`--scan` option:
+
+``` console
+tagfile add --scan ~/Pictures
+```
+
 To see statistics of indexed files and a list of media-paths:
 
 ``` console
@@ -229,7 +236,8 @@ Help and synopsis for main command that is printed when using:
 
 # Command tagfile main body
     {'text': '''``` console
-Usage: tagfile [--config <filename>] [--db <name>] <command>
+Usage: tagfile [--config <filename>] [--db <name>] [--profile[=FILE]]
+               [--trace-memory] <command>
    or: tagfile [-h | --help] | [-V | --version]
 
 Search, index and tag your files and find duplicates
@@ -239,6 +247,8 @@ Options:
 --db=<name>          use database <name>, defined in config file
 -h, --help           show this help information
 -V, --version        show version and platform information
+--profile=FILE       run command with cProfile, save to FILE
+--trace-memory       report peak memory usage at exit
 
 Commands:
   add        add a directory to media paths
@@ -247,11 +257,14 @@ Commands:
   help       show help information
   info       show statistics for index and media paths
   list       show all indexed files
+  relocate   move a media path to a new location
   updatedb   scan media paths and index newly added files
   version    show version and platform information
 
 See 'tagfile help <command>' for more information on a
 specific command, before using it.
+
+Without FILE, --profile saves to tagfile.prof in TAGFILE_DATA_HOME.
 ```
 ''', 'destinations': ['README.md', 'docs/commands.md']},
 
@@ -272,14 +285,19 @@ help <command>`, `tagfile <command> --help` or `tagfile <command> -h`.
 
 # Command add
     {'text': '''``` console
-usage: tagfile add [-q | --quiet] <media-path>
+usage: tagfile add [-q | --quiet] [--scan] <media-path>
    or: tagfile add [-h | --help]
 
 Add a directory to media paths
 
+Adding a media path only registers it, files are indexed when
+running updatedb. Use `--scan` to index the files in the new
+media path right away.
+
 Options:
 -h, --help   show this help information
 -q, --quiet  print nothing except fatal errors
+--scan       index files in the media path right away
 ```
 ''', 'destinations': ['README.md', 'docs/commands.md']},
 
@@ -321,13 +339,15 @@ Options:
     {'text': '''``` console
 usage: tagfile find [--type=TYPE] [--mime=MIMETYPE] [--size-gt=BYTES]
                     [--size-lt=BYTES] [--hash=HEX] [--in-path=STRING]
-                    [--name=NAME | --in-name=STRING] [-H | --show-hash]
+                    [--name=NAME | --in-name=STRING] [--match=QUERY]
+                    [--fuzzy=TEXT] [--limit=N] [-H | --show-hash]
                     [-s | --show-size] [-t | --show-type] [-m | --show-mime]
                     [-a | --show-all] [-S COL | --sort=COL] [--reverse]
 
    or: tagfile find [--type=TYPE] [--mime=MIMETYPE] [--size-gt=BYTES]
                     [--size-lt=BYTES] [--hash=HEX] [--in-path=STRING]
-                    [--name=NAME | --in-name=STRING] [-0 | --print0]
+                    [--name=NAME | --in-name=STRING] [--match=QUERY]
+                    [--fuzzy=TEXT] [--limit=N] [-0 | --print0]
                     [-S COL | --sort=COL] [--reverse]
 
    or: tagfile find [-h | --help]
@@ -344,6 +364,9 @@ Options:
 --in-path=STRING    match absolute paths with a substring of STRING
 --name=NAME         match filenames that are exactly NAME
 --in-name=STRING    match filenames with a substring of STRING
+--match=QUERY       match filenames and paths with a full-text QUERY
+--fuzzy=TEXT        match filenames that look like TEXT, best first
+--limit=N           show no more than N files
 -H, --show-hash     display column with checksum hash
 -s, --show-size     display column with filesizes
 -t, --show-type     display column with MIME type
@@ -352,6 +375,24 @@ Options:
 -S COL, --sort=COL  sort on: name, hash, size, type or mime
 --reverse           reverse sort order
 -0, --print0        end lines with null instead of newline
+
+Options --in-name, --in-path and --match use a full-text index of
+filenames and paths. Substrings of less than 3 characters are
+matched without the index, which is a lot slower. The index needs
+SQLite 3.34 or newer, without it --match and --fuzzy cannot be
+used.
+
+Option --match accepts the full-text query syntax of SQLite FTS5,
+where each word or "quoted phrase" matches filenames and paths
+that contain it. Combine them with AND, OR, NOT and parentheses
+and limit them to a column with "basename:" or "filepath:", i.e.
+`tagfile find --match='basename: holiday NOT raw'`. Words and
+phrases of less than 3 characters never match with --match.
+
+Option --fuzzy finds filenames that share the most trigrams (parts
+of 3 characters) with TEXT, which tolerates typos and a different
+order of words. The 20 best matches (or --limit) are shown,
+ordered by similarity. Options --sort and --reverse are ignored.
 ```
 ''', 'destinations': ['README.md', 'docs/commands.md']},
 
@@ -423,6 +464,30 @@ Options:
 ```
 ''', 'destinations': ['README.md', 'docs/commands.md']},
 
+# Command relocate
+    {'text': '''</details>
+
+<details><summary>tagfile relocate</summary>
+''', 'destinations': ['README.md']},
+    {'text': '''### relocate
+''', 'destinations': ['docs/commands.md']},
+    {'text': '''``` console
+usage: tagfile relocate [-q | --quiet] <id> <new-root>
+   or: tagfile relocate [-h | --help]
+
+Move a media path to a new location, like another mount point
+
+Use this when a disk is mounted at a different location or a
+directory is moved. The index entries of the media path keep
+their checksums, so no files are pruned or hashed again.
+See tagfile info for an overview of paths/ID's.
+
+Options:
+-h, --help   show this help information
+-q, --quiet  print nothing except fatal errors
+```
+''', 'destinations': ['README.md', 'docs/commands.md']},
+
 # Command updatedb
     {'text': '''</details>
 
@@ -432,7 +497,10 @@ Options:
 ''', 'destinations': ['docs/commands.md']},
     {'text': '''``` console
 usage: tagfile updatedb [-v, --verbose] [-q, --quiet] [--prune] [--scan]
-                        [-n ID, --path-id=ID]
+                        [-n ID, --path-id=ID] [--stats-json=FILE]
+
+   or: tagfile updatedb [-v, --verbose] [-q, --quiet] [--retry-errors]
+                        [--stats-json=FILE]
 
    or: tagfile updatedb [-h | --help]
 
@@ -452,9 +520,27 @@ Options:
 --prune              prune removed files only; don't scan
 --scan               scan for new files only; don't prune
 -n ID, --path-id=ID  prune/scan only files in path with this id
-
-When no options are specified, updatedb will both scan and prune.
-It will always prune deleted files before scanning for new files.
+--stats-json=FILE    write scan statistics as JSON to FILE
+--retry-errors       retry files that had errors before
+
+When no options are specified, updatedb will both scan and prune
+in a single pass, by walking each media path in sorted order and
+comparing it with the index. Files with a changed size or
+modification time are hashed again. Files that are moved or
+renamed within the same filesystem are recognized by device,
+inode, size and modification time and updated in place, without
+hashing them again.
+
+Media paths on a disk or network share that is not mounted are
+skipped and reported as offline, instead of pruning their files.
+Media paths that are nested in or an alias of another media path
+(i.e. by a symlink or bind mount) are skipped as well, since
+their files are walked as part of the other media path. Files
+indexed under the path of an alias are moved to the real path.
+
+Files that cannot be read are kept in a journal of errors and
+can be retried with `--retry-errors`. The delay before retrying
+a file doubles after each failed attempt.
 ```
 ''', 'destinations': ['README.md', 'docs/commands.md']},
 
@@ -526,7 +612,9 @@ A config file:
 -   Contains a single set of ignore rules for all databases.
 -   Defines one or more databases. New databases must be defined in the
     config `[databases]` section with a `name = "location-path"`
-    key-value pair.
+    key-value pair, or as a `[databases.name]` table with a `path`,
+    a pragma `profile` ("default", "bulk-load", "safe" or
+    "read-mostly") and SQLite `pragmas`.
 -   Can be specified with the tagfile `--config=FILENAME` option
 
 A database:
@@ -679,6 +767,62 @@ from scratch.
 -   *Development:* task-runner config `Taskfile.dist.yml` for
     go-task/task as alternative for `Makefile`. Make remains the primary
     task-runner however and the Taskfile contents may lag behind.
+-   Detection of moved and renamed files in *updatedb*, by matching
+    device, inode, size and modification time of missing files with new
+    files. The index is updated in place without hashing the files
+    again.
+-   Timings per phase (walk, ignore, stat, lookup, mime, hash and
+    write), bytes hashed and throughput in the statistics of *updatedb*,
+    with option `--stats-json=FILE` to write them as JSON
+-   Global options `--profile[=FILE]` to run any command (including
+    aliases) with cProfile and save pstats output, and `--trace-memory`
+    to report peak memory usage and top allocation sites at exit
+-   Config section [prune] with the number of workers and chunk-size
+    used when checking if indexed files still exist.
+-   Offline media paths: the filesystem identity (device and volume UUID
+    or network source) of each media path is recorded. Updatedb skips
+    and reports media paths on disks or shares that are not mounted,
+    instead of pruning and later rehashing all of their files. Command
+    *info* marks them as offline.
+-   Command *relocate* to move a media path to a new location, like
+    another mount point, without pruning and hashing its files again.
+    Index entries reference their media path by id. Media paths nested
+    in it move along.
+-   Journal of files that could not be read while scanning, in table
+    scan_errors, with the error, number of attempts and time of the last
+    attempt. Option `--retry-errors` of *updatedb* retries only these
+    files, with exponential backoff.
+-   Option `--scan` to command *add* to index the files of the new media
+    path right away.
+-   Detection of media paths that are nested in or an alias of another
+    media path (by symlink or bind mount). These are walked only once as
+    part of the other media path by *updatedb* and flagged as redundant
+    by *info*.
+-   Indexes on the columns of the index that are used for matching and
+    sorting by *find*, *list* and *clones*, including a unique index on
+    filepath. They are created automatically for existing databases,
+    after removing any duplicate entries.
+-   Versioned schema migrations. The schema version is kept in the
+    database (`PRAGMA user_version`) and databases of earlier 0.2.0
+    alphas are upgraded in place when tagfile starts, updating large
+    tables in batches.
+-   Full-text index of filenames and paths (SQLite FTS5 with trigrams),
+    used by options `--in-name` and `--in-path` of *find*
+-   Option `--match=QUERY` for *find*, to search names and paths with
+    the FTS5 query syntax
+-   Option `--fuzzy=TEXT` for *find*, to list the filenames that look
+    most like TEXT (typos included), ranked by trigram similarity, and
+    option `--limit=N`
+-   Table of duplicate groups (digest, number of files, total size and
+    wasted bytes), kept up-to-date by triggers, which *clones* and
+    *info* read instead of grouping the whole index
+-   Wasted space of duplicate files in the output of *info*
+-   Profiles of SQLite pragmas: "default", "bulk-load", "safe" and
+    "read-mostly". Commands select one that suits them, i.e. *updatedb*
+    uses "bulk-load" and *find* uses "read-mostly"
+-   Databases can be configured as tables with a `path`, a pragma
+    `profile` that all commands use and `pragmas` like `cache_size` and
+    `mmap_size`
 
 ### Changed
 
@@ -698,6 +842,50 @@ from scratch.
 -   Replaced dependency `ansicolors` with `rich`
 -   Don\'t scan symlinks (by default, but configurable)
 -   Logging level can be configured.
+-   Progressbars of *updatedb* are updated at a fixed refresh rate
+    instead of per file and are not rendered at all when stdout is not a
+    terminal. Newly found files are hashed after scanning, with a
+    progressbar and ETA based on the number of bytes to hash.
+-   Verbose output and logging only check a cached flag when a level is
+    disabled. Messages are formatted lazily and log records are written
+    to the log file from a queue listener thread, which is safe to use
+    from worker threads and processes.
+-   Prune deletes missing entries in chunked DELETE statements inside a
+    single transaction, instead of one statement and transaction per
+    file, and reports the number of deletes per second.
+-   Prune reads index entries from the database in chunks and checks if
+    their files exist with a pool of threads, which is much faster for
+    media paths on network filesystems.
+-   Updatedb without options walks each media path once in sorted order
+    and merge-joins it with the index ordered by filepath, to find
+    added, changed, moved and removed files in a single pass. Files with
+    a changed size or modification time are hashed again.
+-   When the directory of a missing file does not exist anymore, prune
+    removes all entries below the topmost missing directory with a
+    single range delete, instead of checking each of them.
+-   FIFOs, sockets, devices and other non-regular files are skipped
+    before they are opened and counted as special files in the
+    statistics of *updatedb*. Files are hashed with a non-blocking open
+    as a safety net.
+-   A permission error while hashing no longer stops the scan. Files
+    with errors are skipped and kept in the journal.
+-   Command *add* only registers the media path and returns immediately,
+    instead of walking the whole directory tree.
+-   Categories and MIME types are stored once in lookup tables
+    *category* and *mimetype* and referenced by id from the index, which
+    makes the database and its indexes smaller. Existing databases are
+    migrated.
+-   Digests are stored as bytes instead of hexadecimal text, which
+    halves the size of the hash column and its index. Option `--hash` of
+    *find* does a range query on the digest prefix. Existing databases
+    are migrated.
+-   *clones* lists all clones with a single query that joins the
+    duplicate groups, instead of passing all their digests as
+    parameters, which could exceed the maximum number that SQLite
+    allows.
+-   Databases are synced to disk at WAL checkpoints (`synchronous =
+    NORMAL`) by default, instead of never, except while adding and
+    updating files
 
 ### Removed
 
@@ -37,6 +37,7 @@ import peewee
 
 import tagfile.config
 import tagfile.common
+import tagfile.pragmas
 
 __author__ = "Benjamin Althues"
 __copyright__ = "Copyright (C) 2015-2023  Benjamin Althues"
@@ -61,16 +62,13 @@ def verboseVersionInfo():
 configuration = tagfile.config.Configuration()
 cfg = configuration.cfg
 
-database = peewee.SqliteDatabase(None, pragmas={
-    'journal_mode': 'wal',
-    'cache_size': -1 * 64000,  # 64MB
-    'foreign_keys': 1,
-    'ignore_check_constraints': 0,
-    'synchronous': 0
-})
+database = peewee.SqliteDatabase(
+    None, pragmas=tagfile.pragmas.connect_pragmas(tagfile.pragmas.DEFAULT)
+)
 '''Database handler for Peewee ORM / sqlite database.
 
 The database gets connected in `tagfile.core.tfman.init()`, which is
 called at the last appropiate time, in the shellcommands, after parsing
-all options and arguments.
+all options and arguments. The pragmas are set per database and command,
+see `tagfile.pragmas`.
 '''
@@ -41,15 +41,23 @@ from tagfile.core import tfman  # instance of tagfile.core._TagFileManager
 class AddCommand(pycommand.CommandBase):
     '''Add a directory to media paths'''
     usagestr = (
-        'usage: tagfile add [-q | --quiet] <media-path>\n'
+        'usage: tagfile add [-q | --quiet] [--scan] <media-path>\n'
         '   or: tagfile add [-h | --help]'
     )
-    description = __doc__
+    description = (
+        '{}\n\n'
+        'Adding a media path only registers it, files are indexed when\n'
+        'running updatedb. Use `--scan` to index the files in the new\n'
+        'media path right away.'
+    ).format(__doc__)
     optionList = (
         ('help', ('h', False, 'show this help information')),
         ('quiet', ('q', False, 'print nothing except fatal errors')),
+        ('scan', ('', False, 'index files in the media path right away')),
     )
 
+    pragma_profile = 'bulk-load'
+
     def run(self):
         if self.flags.help:
             output.echo(self.usage)
@@ -78,6 +86,9 @@ class AddCommand(pycommand.CommandBase):
             output.lnerr('\nerror: media path does not exist')
             return 4
 
-        with output.consout.status('', spinner='simpleDotsScrolling'):
-            tfman.addPath(filepath)
-            output.lnout('Added media path: {}'.format(filepath))
+        tfman.addRepository(filepath)
+        output.lnout('Added media path: {}'.format(filepath))
+        if self.flags.scan:
+            output.lnout()
+            tfman.reconcile([filepath])
+        return 0
@@ -60,6 +60,8 @@ class ClonesCommand(pycommand.CommandBase):
         ('hide-sum', ('', False, 'do not print "X clones/duplicates" line')),
     )
 
+    pragma_profile = 'read-mostly'
+
     def run(self):
         if self.flags.help:
             tagfile.output.lnout(self.usage, hl=False)
@@ -32,11 +32,18 @@
 
 import sys
 
+import peewee
 import pycommand
 
-from tagfile import output
+from tagfile import files, output, search
 import tagfile.repeat
-from tagfile.models import Index
+from tagfile.models import Category, Index, MimeType
+
+FUZZY_LIMIT = 20
+'''Number of files that --fuzzy shows when --limit is not given'''
+
+FUZZY_CANDIDATES = 10
+'''Number of candidates per shown file, that are ranked by similarity'''
 
 
 class FindCommand(pycommand.CommandBase):
@@ -45,13 +52,15 @@ class FindCommand(pycommand.CommandBase):
         'usage: tagfile find [--type=TYPE] [--mime=MIMETYPE] '
         '[--size-gt=BYTES]\n'
         '{pad} [--size-lt=BYTES] [--hash=HEX] [--in-path=STRING]\n'
-        '{pad} [--name=NAME | --in-name=STRING] [-H | --show-hash]\n'
+        '{pad} [--name=NAME | --in-name=STRING] [--match=QUERY]\n'
+        '{pad} [--fuzzy=TEXT] [--limit=N] [-H | --show-hash]\n'
         '{pad} [-s | --show-size] [-t | --show-type] [-m | --show-mime]\n'
         '{pad} [-a | --show-all] [-S COL | --sort=COL] [--reverse]\n\n'
         '   or: tagfile find [--type=TYPE] [--mime=MIMETYPE] '
         '[--size-gt=BYTES]\n'
         '{pad} [--size-lt=BYTES] [--hash=HEX] [--in-path=STRING]\n'
-        '{pad} [--name=NAME | --in-name=STRING] [-0 | --print0]\n'
+        '{pad} [--name=NAME | --in-name=STRING] [--match=QUERY]\n'
+        '{pad} [--fuzzy=TEXT] [--limit=N] [-0 | --print0]\n'
         '{pad} [-S COL | --sort=COL] [--reverse]\n\n'
         '   or: tagfile find [-h | --help]'
     ).format(pad=' ' * 19)
@@ -74,6 +83,11 @@ class FindCommand(pycommand.CommandBase):
                   'match filenames that are exactly NAME')),
         ('in-name', ('', 'STRING',
                      'match filenames with a substring of STRING')),
+        ('match', ('', 'QUERY',
+                   'match filenames and paths with a full-text QUERY')),
+        ('fuzzy', ('', 'TEXT',
+                   'match filenames that look like TEXT, best first')),
+        ('limit', ('', 'N', 'show no more than N files')),
 
         ('show-hash', ('H', False, 'display column with checksum hash')),
         ('show-size', ('s', False, 'display column with filesizes')),
@@ -84,6 +98,26 @@ class FindCommand(pycommand.CommandBase):
         ('reverse', ('', False, 'reverse sort order')),
         ('print0', ('0', False, 'end lines with null instead of newline')),
     )
+    usageTextExtra = (
+        'Options --in-name, --in-path and --match use a full-text index of\n'
+        'filenames and paths. Substrings of less than 3 characters are\n'
+        'matched without the index, which is a lot slower. The index needs\n'
+        'SQLite 3.34 or newer, without it --match and --fuzzy cannot be\n'
+        'used.\n\n'
+        'Option --match accepts the full-text query syntax of SQLite FTS5,\n'
+        'where each word or "quoted phrase" matches filenames and paths\n'
+        'that contain it. Combine them with AND, OR, NOT and parentheses\n'
+        'and limit them to a column with "basename:" or "filepath:", i.e.\n'
+        "`tagfile find --match='basename: holiday NOT raw'`. Words and\n"
+        'phrases of less than 3 characters never match with --match.\n\n'
+        'Option --fuzzy finds filenames that share the most trigrams (parts\n'
+        'of 3 characters) with TEXT, which tolerates typos and a different\n'
+        'order of words. The {} best matches (or --limit) are shown,\n'
+        'ordered by similarity. Options --sort and --reverse are ignored.\n'
+        .format(FUZZY_LIMIT)
+    )
+
+    pragma_profile = 'read-mostly'
 
     def run(self):
         if self.flags.help:
@@ -101,12 +135,12 @@ class FindCommand(pycommand.CommandBase):
         valid_args = False
         if self.flags.type:
             valid_args = True
-            fields.append('`cat` = ?')
-            params.append(self.flags.type)
+            fields.append('`cat_id` = ?')
+            params.append(Category.lookup(self.flags.type))
         if self.flags.mime:
             valid_args = True
-            fields.append('`mime` = ?')
-            params.append(self.flags.mime)
+            fields.append('`mime_id` = ?')
+            params.append(MimeType.lookup(self.flags.mime))
         if self.flags['size-gt']:
             valid_args = True
             fields.append('`filesize` > ?')
@@ -117,8 +151,17 @@ class FindCommand(pycommand.CommandBase):
             params.append(self.flags['size-lt'])
         if self.flags.hash:
             valid_args = True
-            fields.append('`filehash` LIKE ?')
-            params.append(f'{self.flags.hash}%')
+            try:
+                lower, upper = files.digest_range(self.flags.hash)
+            except ValueError:
+                output.lnerr('error: option --hash requires a hexadecimal '
+                             'value')
+                return 1
+            fields.append('`filehash` >= ?')
+            params.append(lower)
+            if upper is not None:
+                fields.append('`filehash` < ?')
+                params.append(upper)
 
         # Cannot use --name and --in-name simultaneously
         if self.flags.name:
@@ -127,13 +170,39 @@ class FindCommand(pycommand.CommandBase):
             params.append(self.flags.name)
         elif self.flags['in-name']:
             valid_args = True
-            fields.append('`basename` LIKE ?')
-            params.append(f'%{self.flags["in-name"]}%')
+            field, param = search.contains('basename', self.flags['in-name'])
+            fields.append(field)
+            params.extend(param)
 
         if self.flags['in-path']:
             valid_args = True
-            fields.append('`filepath` LIKE ?')
-            params.append(f'%{self.flags["in-path"]}%')
+            field, param = search.contains('filepath', self.flags['in-path'])
+            fields.append(field)
+            params.extend(param)
+        if self.flags.match:
+            valid_args = True
+            field, param = search.match(self.flags.match)
+            fields.append(field)
+            params.extend(param)
+
+        try:
+            limit = self.limit()
+        except ValueError:
+            output.lnerr('error: option --limit requires a number above 0')
+            return 1
+
+        needs_index = [f'--{name}' for name in ('match', 'fuzzy')
+                       if self.flags[name]]
+        if needs_index and not search.available():
+            output.lnerr(search.unavailable_msg(needs_index[0]))
+            return 1
+
+        join = ''
+        join_params = []
+        if self.flags.fuzzy:
+            valid_args = True
+            limit = limit or FUZZY_LIMIT
+            join, join_params = self.fuzzy_join(fields, params)
 
         # Stop and show error if no (valid) matching options are given
         if not valid_args:
@@ -142,26 +211,82 @@ class FindCommand(pycommand.CommandBase):
             return 1
 
     # handle sort flag and build ORDER BY statement ######################
+        if join:
+            # candidates of --fuzzy, that are ranked by similarity below
+            sortcol = '`fts_rank`'
+        else:
+            join, sortcol = self.order_by()
+
+    # all passed args are valid, create query and output rows ############
+        statement = "SELECT `index`.* FROM `index` {} {} ORDER BY {}".format(
+            join, f"WHERE {' AND '.join(fields)}" if fields else '', sortcol
+        )
+        if limit:
+            statement += ' LIMIT ?'
+            params.append(limit * FUZZY_CANDIDATES if join_params else limit)
+        output.log('debug', f'find built SQL statement: {statement}')
+        query = Index.raw(statement, *join_params, *params)
+
+        try:
+            if join_params:
+                query = sorted(query, reverse=True, key=lambda i: (
+                    search.similarity(self.flags.fuzzy, i.basename)
+                ))[:limit]
+            self.print_rows(query)
+        except peewee.OperationalError as err:
+            # i.e. a syntax error in the full-text query of --match
+            output.lnerr(f'error: {err}')
+            return 1
+        return 0
+
+    def limit(self):
+        '''Return the number of --limit, or None when it is not given.
+
+        Raises ValueError when it is not a number above 0.
+        '''
+        if not self.flags.limit:
+            return None
+        limit = int(self.flags.limit)
+        if limit < 1:
+            raise ValueError(f'invalid limit: {limit}')
+        return limit
+
+    def fuzzy_join(self, fields, params):
+        '''Return a tuple of (JOIN statement, params) for the candidates
+        of --fuzzy. When its text is too short for trigrams, a condition
+        for names that contain it is added to fields and params instead.
+        '''
+        fuzzy_query = search.fuzzy(self.flags.fuzzy)
+        if fuzzy_query is None:
+            field, param = search.contains('basename', self.flags.fuzzy)
+            fields.append(field)
+            params.extend(param)
+            return '', []
+        join = (
+            'JOIN (SELECT rowid AS `fts_id`, rank AS `fts_rank` '
+            f'FROM "{search.TABLE}" WHERE "{search.TABLE}" MATCH ?) '
+            'ON `fts_id` = `index`.`id`'
+        )
+        return join, [fuzzy_query]
+
+    def order_by(self):
+        '''Return a tuple of (JOIN statement, ORDER BY columns) for --sort'''
         a_d = 'DESC' if self.flags.reverse else ''
-        sortcol = f'`filepath` {a_d}'
         if self.flags.sort == 'name':
-            sortcol = f'`basename` {a_d}'
+            return '', f'`basename` {a_d}'
         elif self.flags.sort == 'hash':
-            sortcol = f'`filehash` {a_d}, `filepath`'
+            return '', f'`filehash` {a_d}, `filepath`'
         elif self.flags.sort == 'size':
-            sortcol = f'`filesize` {a_d}'
+            return '', f'`filesize` {a_d}'
         elif self.flags.sort == 'type':
-            sortcol = f'`cat` {a_d}, `filepath`'
+            return ('JOIN `category` ON `category`.`id` = `cat_id`',
+                    f'`category`.`name` {a_d}, `filepath`')
         elif self.flags.sort == 'mime':
-            sortcol = f'`mime` {a_d}, `filepath`'
-
-    # all passed args are valid, create query and output rows ############
-        statement = "SELECT * FROM `index` WHERE {} ORDER BY {}".format(
-            ' AND '.join(fields), sortcol
-        )
-        output.log('debug', f'find built SQL statement: {statement}')
-        query = Index.raw(statement, *params)
+            return ('JOIN `mimetype` ON `mimetype`.`id` = `mime_id`',
+                    f'`mimetype`.`name` {a_d}, `filepath`')
+        return '', f'`filepath` {a_d}'
 
+    def print_rows(self, query):
         for i in query:
             if self.flags['print0']:
                 output.sout(f'{i.filepath}\0', hl=False)
@@ -169,4 +294,3 @@ class FindCommand(pycommand.CommandBase):
                 continue
 
             tagfile.repeat.print_filelist_row(self.flags, i)
-        return 0
@@ -30,6 +30,7 @@
 
 # SPDX-License-Identifier: BSD-3-Clause
 
+import peewee
 from rich.pretty import Pretty
 import pycommand
 
@@ -37,9 +38,10 @@ from tagfile import (
     common,  # module
     configuration,  # instance of `tagfile.config.Configuration`
     core,    # module
+    files,   # module
     output,  # module
 )
-from tagfile.models import Index, Repository
+from tagfile.models import DupGroup, Index, Repository
 
 
 class InfoCommand(pycommand.CommandBase):
@@ -54,6 +56,8 @@ class InfoCommand(pycommand.CommandBase):
         ('show-config', ('C', False, 'pretty print active config in python')),
     )
 
+    pragma_profile = 'read-mostly'
+
     def run(self):
         if self.flags.help:
             print(self.usage)
@@ -72,13 +76,22 @@ class InfoCommand(pycommand.CommandBase):
         output.lnout('[bold]INDEX[/bold]')
         output.lnout(f'database name\t[bold]{core.tfman.db_name}[/bold]')
         output.lnout(f'files indexed\t{Index.select().count()}')
-        output.lnout(f'duplicate files\t{len(core.clones_list())}')
+        output.lnout(f'duplicate files\t{DupGroup.select().count()}')
+        wasted = DupGroup.select(peewee.fn.SUM(DupGroup.wasted)).scalar()
+        output.lnout(f'wasted space\t{files.sizefmt(wasted or 0, padding=0)}')
 
         qrep = Repository.select()
         repos = f'[green]{qrep.count()}[/green]'
         output.lnout(f'\n[bold]MEDIA PATHS ({repos}):[/bold]')
+        redundant = core.overlapping(qrep)
         for item in qrep:
             output.sout(item.filepath)
             output.sout(' [magenta](id=[/]', hl=False)
             output.sout(item.id)
-            output.lnout('[magenta])[/]', hl=False)
+            output.sout('[magenta])[/]', hl=False)
+            if core.is_offline(item):
+                output.sout(' [yellow]offline[/]', hl=False)
+            elif item.id in redundant:
+                output.sout(' [yellow]redundant[/], ', hl=False)
+                output.sout(core.overlap_msg(*redundant[item.id]))
+            output.lnout()
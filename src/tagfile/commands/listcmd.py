@@ -36,7 +36,7 @@ import pycommand
 
 import tagfile.core
 import tagfile.files
-from tagfile.models import Index
+from tagfile.models import Category, Index, MimeType
 import tagfile.output
 import tagfile.repeat
 
@@ -66,6 +66,8 @@ class ListCommand(pycommand.CommandBase):
         ('print0', ('0', False, 'end lines with null instead of newline')),
     )
 
+    pragma_profile = 'read-mostly'
+
     def run(self):
         if self.flags.help:
             tagfile.output.echo(self.usage)
@@ -91,13 +93,14 @@ class ListCommand(pycommand.CommandBase):
                 Index.filepath
             )
         elif self.flags.sort == 'type':
-            query = Index.select().order_by(
-                -Index.cat if self.flags.reverse else +Index.cat,
+            # join lookup table to sort on the names instead of their ids
+            query = Index.select().join(Category).order_by(
+                -Category.name if self.flags.reverse else +Category.name,
                 Index.filepath
             )
         elif self.flags.sort == 'mime':
-            query = Index.select().order_by(
-                -Index.mime if self.flags.reverse else +Index.mime,
+            query = Index.select().join(MimeType).order_by(
+                -MimeType.name if self.flags.reverse else +MimeType.name,
                 Index.filepath
             )
         else:  # default / self.flags.sort == 'path'
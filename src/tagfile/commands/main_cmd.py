@@ -37,6 +37,7 @@ import pycommand
 
 import tagfile
 from tagfile import __doc__ as main_description
+from tagfile import diagnostics
 from tagfile.core import tfman
 from tagfile.output import (
     lnerr,
@@ -48,6 +49,7 @@ from tagfile.commands.clones import ClonesCommand
 from tagfile.commands.find import FindCommand
 from tagfile.commands.info import InfoCommand
 from tagfile.commands.listcmd import ListCommand
+from tagfile.commands.relocate import RelocateCommand
 from tagfile.commands.updatedb import UpdateDbCommand
 
 
@@ -59,12 +61,15 @@ def entry(argv='sys_argv'):
     '''
     argv = sys.argv[1:] if argv == 'sys_argv' else argv
     try:
-        cmd = Command(argv)
+        cmd = Command(diagnostics.expand_profile_flag(argv))
         if cmd.error:
             lnerr('error: {0}'.format(cmd.error))
             return 1
         else:
-            return cmd.run()
+            return diagnostics.run(
+                cmd.run, profile=cmd.flags['profile'],
+                trace_memory=cmd.flags['trace-memory'],
+            )
     except KeyboardInterrupt:
         lnerr('\nUser interrupted. Tagfile successfully exited.')
         return 0
@@ -100,6 +105,8 @@ class HelpCommand(pycommand.CommandBase):
                 print(InfoCommand([]).usage)
             elif self.args[0] == 'list':
                 print(ListCommand([]).usage)
+            elif self.args[0] == 'relocate':
+                print(RelocateCommand([]).usage)
             elif self.args[0] == 'updatedb':
                 print(UpdateDbCommand([]).usage)
             else:
@@ -129,7 +136,9 @@ class VersionCommand(pycommand.CommandBase):
 class Command(pycommand.CommandBase):
     '''Argument handler based on pycommand'''
     usagestr = (
-        'Usage: tagfile [--config <filename>] [--db <name>] <command>\n'
+        'Usage: tagfile [--config <filename>] [--db <name>] '
+        '[--profile[=FILE]]\n'
+        '               [--trace-memory] <command>\n'
         '   or: tagfile [-h | --help] | [-V | --version]'
     )
     description = main_description
@@ -143,6 +152,7 @@ class Command(pycommand.CommandBase):
         'find': FindCommand,
         'info': InfoCommand,
         'list': ListCommand,
+        'relocate': RelocateCommand,
         'updatedb': UpdateDbCommand,
     }
     optionList = (
@@ -150,6 +160,8 @@ class Command(pycommand.CommandBase):
         ('db', ('', '<name>', 'use database <name>, defined in config file')),
         ('help', ('h', False, 'show this help information')),
         ('version', ('V', False, 'show version and platform information')),
+        ('profile', ('', 'FILE', 'run command with cProfile, save to FILE')),
+        ('trace-memory', ('', False, 'report peak memory usage at exit')),
     )
     usageTextExtra = (
         'Commands:\n'
@@ -159,11 +171,14 @@ class Command(pycommand.CommandBase):
         '  help       show help information\n'
         '  info       show statistics for index and media paths\n'
         '  list       show all indexed files\n'
+        '  relocate   move a media path to a new location\n'
         '  updatedb   scan media paths and index newly added files\n'
         '  version    show version and platform information\n'
 
         "\nSee 'tagfile help <command>' for more information on a\n"
         'specific command, before using it.\n'
+        '\nWithout FILE, --profile saves to tagfile.prof in '
+        'TAGFILE_DATA_HOME.\n'
     )
 
     def run(self):
@@ -244,6 +259,9 @@ class Command(pycommand.CommandBase):
                   .format(cmd=self.args[0], error=cmd.error))
             return 1
         else:
+            # i.e. "bulk-load" for scanning, see `tagfile.pragmas`
+            tfman.use_profile(getattr(cmd, 'pragma_profile',
+                                      tagfile.pragmas.DEFAULT))
             return cmd.run()
 
 
@@ -0,0 +1,112 @@
+# file: src/tagfile/commands/relocate.py
+
+# Copyright (c) 2015-2023 Benjamin Althues <benjamin@babab.nl>
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+# contributors may be used to endorse or promote products derived from this
+# software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import os
+
+import pycommand
+
+from tagfile import (
+    core,    # module
+    output,  # module
+)
+from tagfile.models import Repository
+
+
+class RelocateCommand(pycommand.CommandBase):
+    '''Move a media path to a new location, like another mount point'''
+    usagestr = (
+        'usage: tagfile relocate [-q | --quiet] <id> <new-root>\n'
+        '   or: tagfile relocate [-h | --help]'
+    )
+    description = (
+        '{}\n\n'
+        'Use this when a disk is mounted at a different location or a\n'
+        'directory is moved. The index entries of the media path keep\n'
+        'their checksums, so no files are pruned or hashed again.\n'
+        "See tagfile info for an overview of paths/ID's."
+    ).format(__doc__)
+    optionList = (
+        ('help', ('h', False, 'show this help information')),
+        ('quiet', ('q', False, 'print nothing except fatal errors')),
+    )
+
+    def run(self):
+        if self.flags.help:
+            output.echo(self.usage)
+            return 0
+
+        output.settings.quiet = self.flags.quiet
+
+        if len(self.args) != 2:
+            output.lnerr(
+                f'error: command relocate requires 2 arguments\n\n'
+                f'{self.usage}', hl=False
+            )
+            return 1
+
+        mp_id, arg = self.args
+        try:
+            repo = Repository.get_by_id(int(mp_id))
+        except (ValueError, Repository.DoesNotExist):
+            output.fatal(f'No media-path known with id {mp_id}')
+            return 2
+
+        new_root = os.path.abspath(os.path.expanduser(arg))
+        if not os.path.isdir(new_root):
+            output.lnerr(f'error: directory {new_root} does not exist')
+            return 3
+        old_root = repo.filepath
+        # nested media paths move along, to the same place below new_root
+        nested = [
+            (other, new_root + other.filepath[len(old_root.rstrip(os.sep)):])
+            for other in core.nested_repos(repo)
+        ]
+        moving = [repo.id] + [other.id for other, _ in nested]
+        for path in [new_root] + [path for _, path in nested]:
+            if Repository.select().where(
+                (Repository.filepath == path) & Repository.id.not_in(moving)
+            ).exists():
+                output.lnerr(f'error: {path} is already a media path')
+                return 4
+        nfiles = core.indexed_elsewhere(repo, new_root)
+        if nfiles:
+            output.lnerr(f'error: {nfiles} files below {new_root} are '
+                         'already indexed under another media path')
+            return 5
+
+        nfiles = core.relocate(repo, new_root)
+        output.lnout(f'Relocated media path {old_root} (id={repo.id})\n'
+                     f'to {new_root}, updated {nfiles} indexed files')
+        for other, path in nested:
+            output.lnout(f'Relocated nested media path {other.filepath} '
+                         f'(id={other.id}) to {path}')
+        return 0
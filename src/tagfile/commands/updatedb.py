@@ -44,7 +44,11 @@ class UpdateDbCommand(pycommand.CommandBase):
     usagestr = (
         'usage: tagfile updatedb [-v, --verbose] [-q, --quiet] [--prune] '
         '[--scan]\n'
-        '                        [-n ID, --path-id=ID]\n\n'
+        '                        [-n ID, --path-id=ID] '
+        '[--stats-json=FILE]\n\n'
+        '   or: tagfile updatedb [-v, --verbose] [-q, --quiet] '
+        '[--retry-errors]\n'
+        '                        [--stats-json=FILE]\n\n'
         '   or: tagfile updatedb [-h | --help]'
     )
     description = (
@@ -62,12 +66,31 @@ class UpdateDbCommand(pycommand.CommandBase):
         ('prune', ('', False, "prune removed files only; don't scan")),
         ('scan', ('', False, "scan for new files only; don't prune")),
         ('path-id', ('n', 'ID', "prune/scan only files in path with this id")),
+        ('stats-json', ('', 'FILE', 'write scan statistics as JSON to FILE')),
+        ('retry-errors', ('', False, 'retry files that had errors before')),
     )
     usageTextExtra = (
-        'When no options are specified, updatedb will both scan and prune.\n'
-        'It will always prune deleted files before scanning for new files.\n'
+        'When no options are specified, updatedb will both scan and prune\n'
+        'in a single pass, by walking each media path in sorted order and\n'
+        'comparing it with the index. Files with a changed size or\n'
+        'modification time are hashed again. Files that are moved or\n'
+        'renamed within the same filesystem are recognized by device,\n'
+        'inode, size and modification time and updated in place, without\n'
+        'hashing them again.\n\n'
+        'Media paths on a disk or network share that is not mounted are\n'
+        'skipped and reported as offline, instead of pruning their files.\n'
+        'Media paths that are nested in or an alias of another media path\n'
+        '(i.e. by a symlink or bind mount) are skipped as well, since\n'
+        'their files are walked as part of the other media path. Files\n'
+        'indexed under the path of an alias are moved to the real path.\n'
+        '\n'
+        'Files that cannot be read are kept in a journal of errors and\n'
+        'can be retried with `--retry-errors`. The delay before retrying\n'
+        'a file doubles after each failed attempt.\n'
     )
 
+    pragma_profile = 'bulk-load'
+
     def run(self):
         if self.flags.help:
             print(self.usage)
@@ -77,6 +100,13 @@ class UpdateDbCommand(pycommand.CommandBase):
         tagfile.output.settings.verbose = self.flags.verbose
         path_filter = None
 
+        if self.flags['retry-errors']:
+            stats = tagfile.core.tfman.retry_errors()
+            if stats:
+                self.write_stats(stats)
+            return 0
+        excluded = []
+
         if self.flags['path-id']:
             # Load only files in a single media-path/repo
             mp_id = self.flags['path-id']
@@ -92,21 +122,47 @@ class UpdateDbCommand(pycommand.CommandBase):
                     'does not exist on the filesystem (anymore)'
                 )
                 return 2
-            tagfile.core.tfman.addPath(mpath.filepath)
+            if tagfile.core.is_offline(mpath):
+                tagfile.output.fatal(
+                    f'Media-path {mpath.filepath} with id {mp_id}\n'
+                    'is offline, another filesystem is mounted there'
+                )
+                return 2
             path_filter = mpath.filepath
+            dirpaths = [mpath.filepath]
+            excluded = [repo.filepath for repo in
+                        tagfile.core.nested_repos(mpath)
+                        if tagfile.core.is_offline(repo)]
         else:
-            # Load all files in media-path/repo
-            tagfile.core.tfman.loadKnownRepos()
+            online, offline = tagfile.core.media_paths()
+            dirpaths = [mpath.filepath for mpath in online]
+            excluded = [mpath.filepath for mpath in offline]
 
         # support flagging of both options; don't skip or exit early with elif
         if self.flags.prune or self.flags.scan:
             if self.flags.prune:
-                tagfile.core.prune(path_filter)
+                tagfile.core.prune(path_filter, exclude=excluded)
             if self.flags.scan:
-                tagfile.core.tfman.scan()
+                text = 'Browsing media paths for files... '
+                with tagfile.output.consout.status(
+                    status=text, spinner='simpleDotsScrolling'
+                ):
+                    for dirpath in dirpaths:
+                        tagfile.core.tfman.addPath(dirpath)
+                stats = tagfile.core.tfman.scan()
+                self.write_stats(stats)
             return 0
 
-        # default, without options
-        tagfile.core.prune()
-        tagfile.core.tfman.scan()
+        # default, without options: walk and reconcile in a single pass
+        stats = tagfile.core.tfman.reconcile(dirpaths, exclude=excluded)
+        self.write_stats(stats)
         return 0
+
+    def write_stats(self, stats):
+        '''Write scan statistics to file if --stats-json is given.'''
+        if self.flags['stats-json']:
+            filepath = os.path.abspath(
+                os.path.expanduser(self.flags['stats-json'])
+            )
+            stats.write_json(filepath)
+            tagfile.output.info(f'updatedb: wrote statistics to {filepath}')
@@ -37,6 +37,10 @@ class ConfigError(Exception):
     pass
 
 
+class SpecialFileError(OSError):
+    pass
+
+
 class ProgrammingError(Exception):
     pass
 
@@ -36,7 +36,7 @@ import datetime
 import os
 import tomllib
 
-from tagfile import common
+from tagfile import common, pragmas
 
 defaultconfig = '''# config created by tagfile 0.2.0a13 at {date}
 
@@ -78,6 +78,19 @@ main = "{data_home}/main.db"
 #custom = "{data_home}/custom.db"
 #cats = "{data_home}/cat-pictures.sqlite"
 
+# A database can also be a table with its path, a pragma profile and
+# SQLite pragmas. Without a profile, each command picks the profile that
+# suits it: "bulk-load" for add and updatedb, "read-mostly" for find,
+# list, clones and info and "default" for others. Profile "safe" syncs
+# every transaction to disk. Pragmas take precedence over the profile
+# and can be: page_size (only for new databases), cache_size, mmap_size,
+# temp_store, synchronous and wal_autocheckpoint.
+#[databases.archive]
+#path = "{data_home}/archive.db"
+#profile = "safe"
+#pragmas.cache_size = -256000  # 256MB
+#pragmas.mmap_size = 1073741824  # 1GB
+
 [alias]
 ls = ['list', '-st']
 up = ['updatedb']
@@ -140,6 +153,15 @@ symlinks = true
 # algorithm can be "md5" or "sha1"
 algorithm = "sha1"
 buffer-size = 1024
+
+[prune]
+# Number of threads that check if indexed files still exist. Checks are
+# latency-bound on network filesystems (NFS, SMB, FUSE) and benefit from
+# more threads there.
+workers = 8
+# Number of index entries that are read from the database and checked
+# at a time.
+chunk-size = 1000
 '''.format(
     data_home=common.invertexpanduser(common.TAGFILE_DATA_HOME),
     date=datetime.datetime.now()
@@ -223,7 +245,26 @@ class Configuration:
             val.is_list(f'alias.{key}')
 
         val.is_dict('databases', min_size=1)
-        val.is_str('databases.main')
+        if 'main' not in cfg['databases']:
+            raise common.ConfigError('Missing "databases.main" setting')
+        for key, value in cfg['databases'].items():
+            if type(value) is not dict:
+                val.is_str(f'databases.{key}')
+                continue
+            val.is_str(f'databases.{key}.path')
+            if 'profile' in value:
+                val.is_str(f'databases.{key}.profile',
+                           options=list(pragmas.PROFILES))
+            if 'pragmas' in value:
+                val.is_dict(f'databases.{key}.pragmas')
+                for name in value['pragmas']:
+                    if name not in pragmas.NAMES:
+                        raise common.ConfigError(
+                            f'Pragma "databases.{key}.pragmas.{name}" is '
+                            f'not valid.\nValid pragmas are: '
+                            f'{",".join(pragmas.NAMES)}'
+                        )
+                    val.is_int(f'databases.{key}.pragmas.{name}')
         val.is_dict('ignore', min_size=2)
         val.is_dict('ignore.name-based', min_size=3)
         val.is_list('ignore.name-based.paths')
@@ -235,6 +276,9 @@ class Configuration:
         val.is_dict('hashing', min_size=2)
         val.is_str('hashing.algorithm', options=['sha1', 'md5'])
         val.is_int('hashing.buffer-size', vmin=64)
+        val.is_dict('prune', min_size=2)
+        val.is_int('prune.workers', vmin=1)
+        val.is_int('prune.chunk-size', vmin=1)
 
     def apply(self):
         '''Apply settings that have a global nature'''
@@ -30,19 +30,25 @@
 
 # SPDX-License-Identifier: BSD-3-Clause
 
-import logging
+from concurrent.futures import ThreadPoolExecutor
+import datetime
+import itertools
 import os
+import stat
+import time
 
 import magic
 import peewee
 import pycommand
-from rich.progress import track
 
 from tagfile import (
-    cfg,       # dict - from `tagfile.config.Configuration().cfg`
-    database,  # var - Database handler for Peewee
-    files,     # module
-    output,    # module
+    cfg,         # dict - from `tagfile.config.Configuration().cfg`
+    database,    # var - Database handler for Peewee
+    files,       # module
+    migrations,  # module
+    output,      # module
+    pragmas,     # module
+    reconcile,   # module
 )
 from tagfile.output import (
     consout as c,  # instance - from `rich.console.Console()`
@@ -50,9 +56,19 @@ from tagfile.output import (
 )
 from tagfile.common import (
     ProgrammingError,
+    SpecialFileError,
     TAGFILE_DATA_HOME,
 )
-from tagfile.models import Index, Repository
+from tagfile.models import (
+    Category,
+    DupGroup,
+    Index,
+    MimeType,
+    Repository,
+    ScanError,
+)
+from tagfile.progress import Progress
+from tagfile.stats import ScanStats
 
 # NAMESPACE SHORTCUTS
 # output = tagfile.output
@@ -71,9 +87,27 @@ class _TagFileManager:
     Use `addPath(path)` to add new media path (recursively adding files).
     '''
 
+    walktime = 0.0
+    '''Seconds spent walking media paths, reported as part of the scan.'''
+
+    scanstats = None
+    '''Instance of `tagfile.stats.ScanStats` for the latest scan.'''
+
+    _roots = None
+    '''Cached media paths, longest first, as (prefix, id) tuples'''
+
+    _errors = frozenset()
+    '''Filepaths in the error journal at the start of a scan'''
+
     ready = False
     db_name = None
 
+    db_profile = None
+    '''Pragma profile that is configured for the database, if any'''
+
+    db_pragmas = {}
+    '''Pragmas that are configured for the database'''
+
     def init(self, db_name=None):
         '''Connect the `tagfile.database` database handler and setup tables.'''
         if self.ready:
@@ -82,11 +116,9 @@ class _TagFileManager:
         _data_home = TAGFILE_DATA_HOME
         if not os.path.exists(_data_home):
             os.makedirs(_data_home)
-        logging.basicConfig(
-            filename=os.path.expanduser(cfg['logging']['file']),
-            level=output.configlvl(), style='{',
-            format='{asctime}:{levelname}: {message}'
-        )
+        if cfg['logging']['enabled']:
+            output.start_logging(os.path.expanduser(cfg['logging']['file']))
+        output.settings.update_levels()
 
         if not db_name:
             db_name = cfg['default_database']
@@ -99,14 +131,19 @@ class _TagFileManager:
 
     def select_db(self, db_name):
         try:
-            db_path = os.path.expanduser(cfg['databases'][db_name])
+            db_path, profile, db_pragmas = pragmas.database_config(db_name)
         except KeyError:
             output.fatal(f'no database configured with name "{db_name}"')
             self.ready = False
             return False
 
         output.info(f'core: loading default database "{db_name}"')
-        database.init(db_path)
+        db_path = os.path.expanduser(db_path)
+        database.init(db_path, pragmas=pragmas.connect_pragmas(
+            profile or pragmas.DEFAULT, db_pragmas
+        ))
+        self.db_profile = profile
+        self.db_pragmas = db_pragmas
         try:
             database.connect()
         except peewee.OperationalError as err:
@@ -119,131 +156,548 @@ class _TagFileManager:
             self.ready = False
             return False
 
-        if not Index.table_exists():
-            database.create_tables([Index, Repository])
+        # creates tables for a new database or migrates an existing one
+        migrations.upgrade()
+        Category.clear()
+        MimeType.clear()
         self.db_name = db_name
         self.ready = True
         return True
 
+    def use_profile(self, profile):
+        '''Set the pragmas of profile for the rest of the command.
+
+        The profile that is configured for the database, if any, is
+        used instead. Configured pragmas always take precedence.
+        '''
+        pragmas.apply(self.db_profile or profile, self.db_pragmas)
+
     def loadKnownRepos(self):
-        '''Load known media paths into `self.paths`'''
+        '''Load files of known media paths into `self.paths`.
+
+        Media paths that overlap with another, see `overlapping()`, are
+        skipped to walk their files only once.
+        '''
         if not self.ready:
             raise ProgrammingError("_TagFileManager was not initialized")
         text = 'Browsing media paths for files... '
         with c.status(status=text, spinner='simpleDotsScrolling'):
-            qrep = Repository.select()
+            qrep = list(Repository.select())
+            redundant = overlapping(qrep)
             for item in qrep:
-                self.addPath(item.filepath)
+                if item.id not in redundant:
+                    self.addPath(item.filepath)
 
     def addPath(self, path):
         '''Walk path and add all found files'''
         if not self.ready:
             raise ProgrammingError("_TagFileManager was not initialized")
+        started = time.perf_counter()
         self.paths.extend(files.walkdir(path))
-        Repository.get_or_create(filepath=path)
+        self.walktime += time.perf_counter() - started
+        self.addRepository(path)
+
+    def addRepository(self, path):
+        '''Register path as media path, without walking it.
+
+        Returns a tuple of (Repository instance, created).
+        '''
+        if not self.ready:
+            raise ProgrammingError("_TagFileManager was not initialized")
+        repo, created = Repository.get_or_create(filepath=path)
+        if created:
+            record_volume(repo)
+            self._roots = None
+        return repo, created
+
+    def _is_ignored(self, path, basename, stats):
+        '''Match path with the configured ignore rules.
+
+        Returns True and adds to the ignored count of `stats` when the
+        file should not be indexed.
+        '''
+        file_is_valid = True
+
+        # ignore symlinks
+        if cfg['ignore']['essential']['symlinks'] and os.path.islink(path):
+            stats.ignored += 1
+            output.info('scan: symlink ignored: {}', path)
+            return True
+
+        # see if path matches with any configured ignore substrings
+        for substr in cfg['ignore']['name-based']['paths']:
+            if substr in path:
+                file_is_valid = False
+                stats.ignored += 1
+                output.info('scan: path ignored ({}): {}', substr, path)
+                break
+        # see if filename matches any configured ignore strings
+        for fn in cfg['ignore']['name-based']['filenames']:
+            if basename == fn:
+                file_is_valid = False
+                stats.ignored += 1
+                output.info('scan: filename ignored ({}): {}', fn, path)
+                break
+        # see if file extension matches any configured ignore strings
+        for ext in cfg['ignore']['name-based']['extensions']:
+            if basename.endswith(ext):
+                file_is_valid = False
+                stats.ignored += 1
+                output.info('scan: extension ignored ({}): {}', ext, path)
+                break
+        return not file_is_valid
+
+    def _is_special(self, path, st, stats):
+        '''Check if path is not a regular file, like a FIFO, socket or
+        device. These are never opened, since reading them can block
+        forever or never end. Adds to the special count of `stats`.'''
+        if stat.S_ISREG(st.st_mode):
+            return False
+        stats.special += 1
+        output.info('scan: special file skipped: {}', path)
+        return True
+
+    def _locate(self, path):
+        '''Return a dict with the media path (`repo`) that contains path,
+        as fields for Index.'''
+        if self._roots is None:
+            self._roots = sorted(
+                ((r.filepath.rstrip(os.sep) + os.sep, r.id)
+                 for r in Repository.select()),
+                key=lambda root: len(root[0]), reverse=True,
+            )
+        for prefix, repo_id in self._roots:
+            if path.startswith(prefix):
+                return {'repo': repo_id}
+        return {'repo': None}
+
+    def _move(self, row_id, oldpath, path, basename, stats):
+        '''Update the entry of a moved/renamed file in place'''
+        t = time.perf_counter()
+        (Index.update(filepath=path, basename=basename, **self._locate(path))
+              .where(Index.id == row_id).execute())
+        stats.moved += 1
+        stats.lap('write', t)
+        output.info('scan: moved {} to {}', oldpath, path)
 
     def scan(self):
-        '''Check if filepaths are in database, otherwise hash file and save'''
+        '''Check if filepaths are in database, otherwise hash file and save
+
+        Returns an instance of `tagfile.stats.ScanStats`.
+        '''
         if not self.ready:
             raise ProgrammingError("_TagFileManager was not initialized")
-        iall = 0
-        inew = 0
-        iignore = 0
-        iexisting = 0
-        ierrunicode = 0
-        ierrpermission = 0
-        total = len(self.paths)
+        stats = ScanStats(walktime=self.walktime)
+        self.scanstats = stats
+        self._roots = None
+        self._load_errors()
+        clock = time.perf_counter
+        pending = []
+        pending_paths = set()  # media paths may overlap, hash files once
         try:
             lnout('\n[bold]SCANNING[/bold]')
-            disable_bar = False if cfg['ui']['progressbars'] else True
             ignore_empty = cfg['ignore']['essential']['empty-files']
-            for path in track(self.paths, console=output.consout,
-                              disable=disable_bar, description=''):
-                file_is_valid = True
-                iall += 1
-                basename = os.path.basename(path)
+            with Progress(total=len(self.paths)) as bar:
+                for path in self.paths:
+                    bar.advance()
+                    t = clock()
+                    stats.total += 1
+                    basename = os.path.basename(path)
+                    file_is_valid = not self._is_ignored(path, basename,
+                                                         stats)
+                    t = stats.lap('ignore', t)
+                    if not file_is_valid:
+                        continue
 
-                # ignore symlinks
-                if (cfg['ignore']['essential']['symlinks']
-                        and os.path.islink(path)):
-                    file_is_valid = False
-                    iignore += 1
-                    output.info(f'scan: symlink ignored: {path}')
-                    continue
-
-                # see if path matches with any configured ignore substrings
-                for substr in cfg['ignore']['name-based']['paths']:
-                    if substr in path:
-                        file_is_valid = False
-                        iignore += 1
-                        output.info(f'scan: path ignored ({substr}): {path}')
-                        break
-                # see if filename matches any configured ignore strings
-                for fn in cfg['ignore']['name-based']['filenames']:
-                    if basename == fn:
+                    # get file status, this might raise a few exceptions
+                    try:
+                        st = os.stat(path)
+                        if self._is_special(path, st, stats):
+                            file_is_valid = False
+                        elif ignore_empty and not st.st_size:
+                            file_is_valid = False
+                    except FileNotFoundError:
                         file_is_valid = False
-                        iignore += 1
-                        output.info(f'scan: filename ignored ({fn}): {path}')
-                        break
-                # see if file extension matches any configured ignore strings
-                for ext in cfg['ignore']['name-based']['extensions']:
-                    if basename.endswith(ext):
+                    except PermissionError as err:
                         file_is_valid = False
-                        iignore += 1
-                        output.info(f'scan: extension ignored ({ext}): {path}')
-                        break
+                        stats.err_permission += 1
+                        output.error('PermissionError(getsize) for: {}', path)
+                        record_error(path, err)
+                    t = stats.lap('stat', t)
 
-                # get filesize, this might raise a few exceptions
-                try:
-                    filesize = os.path.getsize(path)
-                    if ignore_empty and not filesize:
-                        file_is_valid = False
-                except FileNotFoundError:
-                    file_is_valid = False
-                except PermissionError:
-                    file_is_valid = False
-                    ierrpermission += 1
-                    output.error('PermissionError(getsize) for: ' + path)
-
-                if file_is_valid:
+                    if not file_is_valid or path in pending_paths:
+                        continue
                     try:
                         Index.get(Index.filepath == path)
-                        iexisting += 1
+                        stats.existing += 1
+                        self._clear_error(path)
+                        stats.lap('lookup', t)
+                        continue
                     except Index.DoesNotExist:
-                        try:
-                            _mimetype = magic.from_file(path, mime=True)
-                            _cat = _mimetype[:_mimetype.index('/')]
-                            Index.create(
-                                filehash=files.hashfile(path), filepath=path,
-                                basename=basename,
-                                filesize=filesize, cat=_cat, mime=_mimetype
-                            )
-                        except PermissionError:
-                            ierrpermission += 1
-                            output.error(
-                                'PermissionError(hashfile) for: ' + path
-                            )
-                            break
-                        inew += 1
-                        output.info('scan: added ' + path)
+                        t = stats.lap('lookup', t)
                     except UnicodeEncodeError:
-                        ierrunicode += 1
+                        stats.err_unicode += 1
+                        continue
+
+                    pending.append((path, basename, st, None))
+                    pending_paths.add(path)
+            self._hash(pending, stats)
+        finally:
+            stats.stop()
+            self._report(stats)
+        return stats
+
+    def reconcile(self, dirpaths, exclude=()):
+        '''Update the index for media paths in a single pass.
+
+        Each media path is walked once in sorted order and merge-joined
+        with its Index entries ordered by filepath, see
+        `tagfile.reconcile.merge()`. This gives the added, changed and
+        removed files in one pass over both, without checking each
+        indexed file for existence and looking up each found file in
+        the database separately, like `prune()` and `scan()` do.
+
+        Removed files with a known identity are matched with added files
+        to update entries of moved/renamed files in place. Files with a
+        different size or modification time are hashed again.
+
+        Directories in `exclude`, like offline media paths, are not
+        walked and their entries are kept as they are. Media paths in
+        `dirpaths` that are below another one (i.e. another filesystem
+        mounted inside it) are walked on their own, not as part of the
+        other media path.
+
+        Returns an instance of `tagfile.stats.ScanStats`.
+        '''
+        if not self.ready:
+            raise ProgrammingError("_TagFileManager was not initialized")
+        stats = ScanStats()
+        self.scanstats = stats
+        self._roots = None
+        self._load_errors()
+        clock = time.perf_counter
+        chunk_size = cfg['prune']['chunk-size']
+        ignore_empty = cfg['ignore']['essential']['empty-files']
+        pending = []
+        removed = []
+        vanished = {}
+        identities = []
+        unreadable = []
+
+        def listing_failed(err):
+            # keep the entries below directories that cannot be listed
+            unreadable.append(os.path.join(err.filename, ''))
+            self._listing_error(err, stats)
+
+        try:
+            lnout('[bold]SCANNING[/bold]')
+            with Progress() as bar:
+                for dirpath in dirpaths:
+                    skip = _subtrees(dirpath, [*dirpaths, *exclude])
+                    kept = tuple(os.path.join(path, '') for path in skip)
+                    pairs = reconcile.merge(
+                        files.walksorted(dirpath, listing_failed, skip),
+                        reconcile.index_rows(dirpath, chunk_size),
+                    )
+                    t = clock()
+                    for path, row in pairs:
+                        t = stats.lap('walk', t)
+                        if path is None:
+                            if row.filepath.startswith(kept) or (
+                                    unreadable and row.filepath.startswith(
+                                        tuple(unreadable))):
+                                continue
+                            _not_found(row, removed, vanished)
+                            continue
+
+                        bar.advance()
+                        stats.total += 1
+                        basename = os.path.basename(path)
+                        if row is None:
+                            ignored = self._is_ignored(path, basename, stats)
+                            t = stats.lap('ignore', t)
+                            if ignored:
+                                continue
+
+                        try:
+                            st = os.stat(path)
+                        except FileNotFoundError:
+                            if row is not None:
+                                removed.append((row.id, row.filepath))
+                            t = stats.lap('stat', t)
+                            continue
+                        except PermissionError as err:
+                            stats.err_permission += 1
+                            output.error('PermissionError(getsize) for: {}',
+                                         path)
+                            record_error(path, err)
+                            t = stats.lap('stat', t)
+                            continue
+                        t = stats.lap('stat', t)
+
+                        if self._is_special(path, st, stats):
+                            if row is not None:
+                                removed.append((row.id, row.filepath))
+                        elif row is None:
+                            if not ignore_empty or st.st_size:
+                                pending.append((path, basename, st, None))
+                        elif (st.st_size != row.filesize
+                              or row.mtime_ns is not None
+                              and st.st_mtime_ns != row.mtime_ns):
+                            pending.append((path, basename, st, row.id))
+                        else:
+                            stats.existing += 1
+                            self._clear_error(path)
+                            if row.inode is None:
+                                # indexed before identities were recorded
+                                identities.append((row.id, st))
+                            if len(identities) >= chunk_size:
+                                _set_identities(identities)
+                                t = stats.lap('write', t)
+                    self._clear_listed(dirpath, unreadable)
+
+            t = clock()
+            _set_identities(identities)
+            stats.lap('write', t)
+
+            # match added files with removed files to detect moves
+            added = []
+            for item in pending:
+                path, basename, st, row_id = item
+                key = files.identity(st)
+                if row_id is None and vanished.get(key):
+                    row_id, oldpath = vanished[key].pop()
+                    self._move(row_id, oldpath, path, basename, stats)
+                    continue
+                added.append(item)
+
+            for rows in vanished.values():
+                removed.extend(rows)
+            for row_id, filepath in removed:
+                output.info('prune: Removed {}', filepath)
+            t = clock()
+            stats.removed = delete_ids(row_id for row_id, _ in removed)
+            stats.lap('write', t)
+            self._hash(added, stats)
         finally:
-            lnout('DONE.\n\n[bold]STATISTICS[/bold]')
-            lnout('Already indexed {:>12}'.format(iexisting))
-            lnout('Ignored files   {:>12}'.format(iignore))
-            lnout('[green]Newly added[/]     {:>12}'.format(inew))
-            lnout('-' * 28)
-            lnout('Total files     {:>12}'.format(total))
-
-            if ierrunicode or ierrpermission:
-                lnout('\n[bold]ERRORS[/]')
-            if ierrunicode:
-                lnout('[red]Filenames with unicode errors:[/] {}'
-                      .format(ierrunicode))
-            if ierrpermission:
-                lnout('[red]File locations with permission errors:[/] {}'
-                      .format(ierrpermission))
+            stats.stop()
+            self._report(stats, reconciled=True)
+        return stats
+
+    def _hash(self, pending, stats):
+        '''Hash pending files and add them to the index.
+
+        Each item of `pending` is a tuple of (path, basename, stat_result,
+        row_id). The entry with `row_id` is updated for changed files,
+        while new entries are created for items with a `row_id` of None.
+        Progress and ETA are based on the number of bytes.
+        '''
+        clock = time.perf_counter
+        nbytes = sum(st.st_size for _, _, st, _ in pending)
+        if pending:
+            lnout(f'Hashing {len(pending)} files '
+                  f'({files.sizefmt(nbytes, padding=0)})...')
+        with Progress(total=nbytes, unit='bytes') as bar:
+            for path, basename, st, row_id in pending:
+                t = clock()
+                try:
+                    _mimetype = magic.from_file(path, mime=True)
+                    _cat = _mimetype[:_mimetype.index('/')]
+                    t = stats.lap('mime', t)
+                    _hash = files.hashfile(path)
+                    t = stats.lap('hash', t)
+                    stats.bytes_hashed += st.st_size
+                    fields = dict(
+                        filehash=_hash, filepath=path, basename=basename,
+                        filesize=st.st_size, cat=Category.intern(_cat),
+                        mime=MimeType.intern(_mimetype),
+                        device=st.st_dev, inode=st.st_ino,
+                        mtime_ns=st.st_mtime_ns, **self._locate(path),
+                    )
+                    if row_id is None:
+                        Index.create(**fields)
+                    else:
+                        Index.update(**fields).where(
+                            Index.id == row_id
+                        ).execute()
+                    stats.lap('write', t)
+                except SpecialFileError:
+                    stats.special += 1
+                    output.info('scan: special file skipped: {}', path)
+                    continue
+                except PermissionError as err:
+                    stats.err_permission += 1
+                    output.error('PermissionError(hashfile) for: {}', path)
+                    record_error(path, err)
+                    continue
+                except OSError as err:
+                    stats.err_other += 1
+                    output.error('{}(hashfile) for: {}',
+                                 type(err).__name__, path)
+                    record_error(path, err)
+                    continue
+                except UnicodeEncodeError:
+                    stats.err_unicode += 1
+                    continue
+                finally:
+                    bar.advance(st.st_size)
+                self._clear_error(path)
+                if row_id is None:
+                    stats.new += 1
+                    output.info('scan: added {}', path)
+                else:
+                    stats.changed += 1
+                    output.info('scan: updated changed file {}', path)
+
+    def _report(self, stats, reconciled=False):
+        '''Print statistics, timings and errors of a scan'''
+        lnout('DONE.\n\n[bold]STATISTICS[/bold]')
+        lnout('Already indexed {:>12}'.format(stats.existing))
+        lnout('Ignored files   {:>12}'.format(stats.ignored))
+        lnout('Special files   {:>12}'.format(stats.special))
+        if reconciled:
+            lnout('Moved/renamed   {:>12}'.format(stats.moved))
+            lnout('Changed         {:>12}'.format(stats.changed))
+            lnout('Removed         {:>12}'.format(stats.removed))
+        lnout('[green]Newly added[/]     {:>12}'.format(stats.new))
+        lnout('-' * 28)
+        lnout('Total files     {:>12}'.format(stats.total))
+
+        lnout('\n[bold]TIMINGS[/bold]')
+        for phase, seconds in stats.times.items():
+            lnout('{:<16}{:>11.3f}s'.format(phase, seconds), hl=False)
+        lnout('-' * 28)
+        lnout('Elapsed (scan)  {:>11.3f}s'.format(stats.elapsed), hl=False)
+        lnout('Bytes hashed    {:>12}'.format(
+            files.sizefmt(stats.bytes_hashed).strip()), hl=False)
+        lnout('Files/s         {:>12.1f}'.format(stats.files_per_second),
+              hl=False)
+        lnout('MB/s (hashing)  {:>12.1f}'.format(stats.mb_per_second),
+              hl=False)
+
+        if stats.err_unicode or stats.err_permission or stats.err_other:
+            lnout('\n[bold]ERRORS[/]')
+        if stats.err_unicode:
+            lnout('[red]Filenames with unicode errors:[/] {}'
+                  .format(stats.err_unicode))
+        if stats.err_permission:
+            lnout('[red]File locations with permission errors:[/] {}'
+                  .format(stats.err_permission))
+        if stats.err_other:
+            lnout('[red]Files with other errors:[/] {}'
+                  .format(stats.err_other))
+        if stats.err_permission or stats.err_other:
+            lnout('Files with errors are kept in a journal. Use '
+                  "'tagfile updatedb --retry-errors' to try them again.",
+                  hl=False)
+
+    def _load_errors(self):
+        self._errors = frozenset(
+            path for path, in ScanError.select(ScanError.filepath).tuples()
+        )
+
+    def _clear_error(self, path):
+        '''Remove path from the error journal, after indexing it'''
+        if path in self._errors:
+            ScanError.delete().where(ScanError.filepath == path).execute()
+
+    def _listing_error(self, err, stats):
+        '''Count and journal a directory that cannot be listed'''
+        if isinstance(err, PermissionError):
+            stats.err_permission += 1
+        else:
+            stats.err_other += 1
+        output.error('{}(listdir) for: {}', type(err).__name__, err.filename)
+        record_error(err.filename, err)
+
+    def _clear_listed(self, dirpath, unreadable):
+        '''Remove directories below dirpath from the error journal, when
+        they could be listed again'''
+        prefix = os.path.join(dirpath, '')
+        for path in self._errors:
+            if not (path == dirpath or path.startswith(prefix)):
+                continue
+            if (os.path.join(path, '').startswith(tuple(unreadable))
+                    or os.path.islink(path) or not os.path.isdir(path)):
+                continue
+            self._clear_error(path)
+
+    def retry_errors(self):
+        '''Index files in the error journal that are due for a retry.
+
+        The delay before retrying a file doubles after every failed
+        attempt, see `RETRY_DELAY`. Like `reconcile()`, files are hashed
+        again when their size or modification time differs from their
+        index entry, and directories that could not be listed are
+        reconciled. Files are removed from the journal only when they
+        are indexed, or when they do not exist anymore. Returns
+        `tagfile.stats.ScanStats` or None when no files are due.
+        '''
+        if not self.ready:
+            raise ProgrammingError("_TagFileManager was not initialized")
+        paths = []
+        for path in due_errors():
+            if os.path.lexists(path):
+                paths.append(path)
+            else:
+                ScanError.delete().where(ScanError.filepath == path).execute()
+                output.info('scan: removed missing file from journal: {}',
+                            path)
+        if not paths:
+            lnout('No files with errors are due for a retry.')
+            return None
+        dirpaths = [path for path in paths
+                    if os.path.isdir(path) and not os.path.islink(path)]
+        if dirpaths:
+            # reconciling retries the files below the directories as well
+            stats = self.reconcile(dirpaths)
+            below = tuple(os.path.join(path, '') for path in dirpaths)
+            paths = [path for path in paths if path not in dirpaths
+                     and not path.startswith(below)]
+            if not paths:
+                return stats
+        return self._retry_files(paths)
+
+    def _retry_files(self, paths):
+        '''Hash the files of the error journal that are new or changed'''
+        stats = ScanStats()
+        self.scanstats = stats
+        self._roots = None
+        self._load_errors()
+        pending = []
+        try:
+            lnout('[bold]SCANNING[/bold]')
+            for path in paths:
+                stats.total += 1
+                try:
+                    st = os.stat(path)
+                except OSError as err:
+                    if isinstance(err, PermissionError):
+                        stats.err_permission += 1
+                    else:
+                        stats.err_other += 1
+                    output.error('{}(getsize) for: {}',
+                                 type(err).__name__, path)
+                    record_error(path, err)
+                    continue
+                if self._is_special(path, st, stats):
+                    self._clear_error(path)
+                    continue
+                basename = os.path.basename(path)
+                row = Index.get_or_none(Index.filepath == path)
+                if row is None:
+                    pending.append((path, basename, st, None))
+                elif (st.st_size != row.filesize or row.mtime_ns is None
+                      or st.st_mtime_ns != row.mtime_ns):
+                    pending.append((path, basename, st, row.id))
+                else:
+                    stats.existing += 1
+                    self._clear_error(path)
+            self._hash(pending, stats)
+        finally:
+            stats.stop()
+            self._report(stats, reconciled=True)
+        return stats
 
 
 tfman = _TagFileManager()
@@ -251,42 +705,441 @@ tfman = _TagFileManager()
 use. The class `_TagFileManager` should not be used directly.'''
 
 
-def prune(path_filter=None):
+RETRY_DELAY = 60
+'''Seconds before a file in the error journal is retried for the first
+time. The delay doubles after every failed attempt.'''
+
+RETRY_DELAY_MAX = 7 * 24 * 60 * 60
+'''Maximum number of seconds between retries of a file'''
+
+
+def record_error(path, err):
+    '''Add path to the error journal, or count another failed attempt'''
+    now = datetime.datetime.now()
+    ScanError.insert(
+        filepath=path, error=type(err).__name__, message=str(err),
+        count=1, last_attempt=now,
+    ).on_conflict(
+        conflict_target=[ScanError.filepath],
+        update={
+            ScanError.error: type(err).__name__,
+            ScanError.message: str(err),
+            ScanError.count: ScanError.count + 1,
+            ScanError.last_attempt: now,
+        },
+    ).execute()
+
+
+def due_errors(now=None):
+    '''Yield filepaths from the error journal, when their delay before
+    retrying (exponential backoff) has passed.'''
+    now = now or datetime.datetime.now()
+    for err in ScanError.select().order_by(ScanError.filepath):
+        delay = min(RETRY_DELAY * 2 ** (err.count - 1), RETRY_DELAY_MAX)
+        if err.last_attempt + datetime.timedelta(seconds=delay) <= now:
+            yield err.filepath
+
+
+DELETE_CHUNK_SIZE = 500
+'''Number of ids per DELETE statement, which stays well below the
+default limit of 999 host parameters of older SQLite versions'''
+
+
+def delete_ids(ids):
+    '''Delete Index entries by id in one transaction.
+
+    The ids are deleted with `DELETE ... WHERE id IN (...)` statements
+    of `DELETE_CHUNK_SIZE` ids each. Returns the number of rows deleted.
+    '''
+    ids = list(ids)
+    ndeleted = 0
+    with database.atomic():
+        for n in range(0, len(ids), DELETE_CHUNK_SIZE):
+            chunk = ids[n:n + DELETE_CHUNK_SIZE]
+            ndeleted += Index.delete().where(Index.id.in_(chunk)).execute()
+    return ndeleted
+
+
+def _set_identities(items):
+    '''Record the file identity of entries that do not have one yet, in
+    a single transaction. Each item is a tuple of (id, stat_result).
+    The list of items is emptied.'''
+    with database.atomic():
+        for row_id, st in items:
+            Index.update(
+                device=st.st_dev, inode=st.st_ino, mtime_ns=st.st_mtime_ns
+            ).where(Index.id == row_id).execute()
+    items.clear()
+
+
+def _subtrees(dirpath, dirpaths):
+    '''Return the set of paths in dirpaths that are below dirpath,
+    without trailing separator'''
+    prefix = os.path.join(dirpath, '')
+    return {path.rstrip(os.sep) for path in dirpaths
+            if path.rstrip(os.sep).startswith(prefix)}
+
+
+def _not_found(row, removed, vanished):
+    '''Add the entry of a file that was not found to the removed files,
+    or to the vanished files by identity for detecting moves'''
+    if row.inode is None:
+        removed.append((row.id, row.filepath))
+    else:
+        key = (row.device, row.inode, row.filesize, row.mtime_ns)
+        # hardlinks share their identity
+        vanished.setdefault(key, []).append((row.id, row.filepath))
+
+
+def _removed_msg(npruned, seconds):
+    text = f'{npruned} files were removed from the index'
+    if npruned and seconds > 0:
+        text += f' ({npruned / seconds:,.0f} deletes/s)'
+    return text + '.'
+
+
+def _index_chunks(path_filter=None, chunk_size=1000):
+    '''Yield lists of Index entries, `chunk_size` at a time. Only one
+    chunk of entries is held in memory.
+
+    Entries are ordered by id, or by filepath when filtered on a path,
+    to read them with a range scan of the filepath index.
+    '''
+    if path_filter:
+        rows = reconcile.index_rows(path_filter, chunk_size)
+        while True:
+            chunk = list(itertools.islice(rows, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+    query = Index.select(Index.id, Index.filepath, Index.filesize,
+                         Index.device, Index.inode, Index.mtime_ns)
+    last_id = 0
+    while True:
+        chunk = list(query.where(Index.id > last_id)
+                          .order_by(Index.id)
+                          .limit(chunk_size))
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1].id
+
+
+def record_volume(repo):
+    '''Save the filesystem identity of the media path `repo`'''
+    repo.device = os.stat(repo.filepath).st_dev
+    repo.volume = files.volume_id(repo.filepath)
+    repo.save()
+
+
+def is_offline(repo):
+    '''Check if media path `repo` is on a volume that is not mounted.
+
+    A media path is offline when it does not exist, or when it is on
+    another filesystem than the one recorded for it (i.e. the empty
+    mount point directory of an unmounted disk). The filesystem identity
+    is recorded for media paths that do not have one yet.
+    '''
+    try:
+        st = os.stat(repo.filepath)
+    except OSError:
+        return True
+    if repo.volume is None and repo.device is None:
+        record_volume(repo)
+        return False
+    # device numbers of removable disks can change, volume ids don't;
+    # device names were recorded for block devices without UUID before
+    if repo.volume is not None and ':/dev/' not in repo.volume:
+        return files.volume_id(repo.filepath) != repo.volume
+    return st.st_dev != repo.device
+
+
+def nested_repos(repo):
+    '''Return the media paths below media path `repo`, by filepath'''
+    prefix = repo.filepath.rstrip(os.sep) + os.sep
+    return [other for other in Repository.select()
+            if other.filepath.startswith(prefix)]
+
+
+def relocate(repo, new_root):
+    '''Move media path `repo` and its index entries to `new_root`.
+
+    Entries keep their id and hash, so nothing is pruned or hashed
+    again. The absolute filepaths of the entries are updated with a
+    single UPDATE statement. Media paths nested in `repo` move along
+    with it, in the same transaction. Returns the number of updated
+    entries.
+    '''
+    old = repo.filepath.rstrip(os.sep)
+    new = new_root.rstrip(os.sep)
+    with database.atomic():
+        nfiles = Index.update(
+            filepath=_moved_filepath(old, new),
+            # entries of nested media paths keep their media path
+            repo=peewee.fn.COALESCE(Index.repo, repo.id),
+        ).where(
+            (Index.repo == repo.id) | reconcile.in_subtree(old)
+        ).execute()
+        for other in nested_repos(repo):
+            other.filepath = new + other.filepath[len(old):]
+            record_volume(other)
+        repo.filepath = new_root
+        record_volume(repo)
+    tfman._roots = None
+    return nfiles
+
+
+def indexed_elsewhere(repo, new_root):
+    '''Return the number of Index entries below `new_root` that do not
+    belong to media path `repo` (or one nested in it), i.e. that would
+    not move along with `relocate()`.'''
+    return Index.select().where(
+        reconcile.in_subtree(new_root)
+        & ~((Index.repo == repo.id) | reconcile.in_subtree(repo.filepath))
+    ).count()
+
+
+def overlapping(repos):
+    '''Find media paths that are aliases of or nested in other ones.
+
+    Media paths are compared by their location within the filesystem,
+    see `files.fs_location()`, so symlinks and bind mounts to the same
+    directory are recognized. Of media paths that are aliases of each
+    other, the one that is not (below) a symlink is kept, or else the one
+    with the lowest id.
+
+    Returns a dict of `{repo.id: (kind, other)}` for redundant media
+    paths, where kind is "alias" or "nested" and other is the outermost
+    media path that is kept and covers it. Media paths that do not
+    exist are ignored.
+    '''
+    locations = []
+    for repo in sorted(repos, key=lambda r: (_is_linked(r.filepath), r.id)):
+        try:
+            locations.append((files.fs_location(repo.filepath), repo))
+        except OSError:
+            continue
+    redundant = {}
+    for n, ((device, path), repo) in enumerate(locations):
+        cover = None
+        for m, ((other_device, other_path), other) in enumerate(locations):
+            if other_device != device or other is repo:
+                continue
+            if other_path == path and m < n:
+                kind = 'alias'
+            elif path.startswith(other_path.rstrip(os.sep) + os.sep):
+                kind = 'nested'
+            else:
+                continue
+            if cover is None or len(other_path) < cover[0]:
+                cover = (len(other_path), kind, other)
+        if cover is not None:
+            redundant[repo.id] = cover[1:]
+    return redundant
+
+
+def _is_linked(filepath):
+    '''Check if filepath is a symlink or is below one'''
+    return os.path.realpath(filepath) != os.path.normpath(filepath)
+
+
+def media_paths(query=None):
+    '''Return lists of online and offline media paths, as a tuple.
+
+    Offline media paths are reported, since they are skipped instead of
+    pruning all of their files from the index. Media paths that are
+    aliases of or nested in other media paths are reported and left
+    out, since their files are walked as part of the other media path.
+
+    Entries indexed under the path of such a media path that is not
+    below one of the walked media paths (i.e. a symlink to one) would
+    never be reconciled, so they are moved to the path of the same
+    directory below the walked media path. Entries of files that are
+    indexed there already are duplicates and removed.
+    '''
+    online = []
+    offline = []
+    for repo in Repository.select() if query is None else query:
+        (offline if is_offline(repo) else online).append(repo)
+    if offline:
+        lnout('[bold]OFFLINE MEDIA PATHS[/bold]')
+        for repo in offline:
+            lnout(f'[yellow]skipped[/] {repo.filepath} (id={repo.id})')
+        lnout()
+    redundant = overlapping(online)
+    if redundant:
+        lnout('[bold]OVERLAPPING MEDIA PATHS[/bold]')
+        walked = tuple(repo.filepath.rstrip(os.sep) + os.sep
+                       for repo in online if repo.id not in redundant)
+        for repo in online:
+            if repo.id not in redundant:
+                continue
+            kind, other = redundant[repo.id]
+            lnout(f'[yellow]skipped[/] {repo.filepath} (id={repo.id}), '
+                  + overlap_msg(kind, other))
+            if (repo.filepath.rstrip(os.sep) + os.sep).startswith(walked):
+                continue
+            # the same directory below the media path that is walked
+            relpath = os.path.relpath(files.fs_location(repo.filepath)[1],
+                                      files.fs_location(other.filepath)[1])
+            target = os.path.normpath(os.path.join(other.filepath, relpath))
+            nmoved, nremoved = _move_entries(repo.filepath, target)
+            if nmoved:
+                lnout(f'moved {nmoved} files indexed under '
+                      f'{repo.filepath} to {target}', hl=False)
+            if nremoved:
+                lnout(f'removed {nremoved} files indexed under '
+                      f'{repo.filepath} twice from the index', hl=False)
+        lnout()
+        online = [repo for repo in online if repo.id not in redundant]
+    return online, offline
+
+
+def _move_entries(old, new):
+    '''Move the Index entries below directory `old` to directory `new`.
+
+    Entries of files that are indexed below `new` already are removed.
+    Returns a tuple of the number of moved and removed entries.
+    '''
+    moved = _moved_filepath(old, new)
+    other = Index.alias()
+    tfman._roots = None
+    with database.atomic():
+        nremoved = Index.delete().where(
+            reconcile.in_subtree(old) & peewee.fn.EXISTS(
+                other.select(other.id).where(other.filepath == moved)
+            )
+        ).execute()
+        nmoved = Index.update(
+            filepath=moved, **tfman._locate(os.path.join(new, ''))
+        ).where(reconcile.in_subtree(old)).execute()
+    return nmoved, nremoved
+
+
+def _moved_filepath(old, new):
+    '''Return an expression for the filepath of Index entries below
+    directory `old` after moving them to directory `new`'''
+    start = len(old.rstrip(os.sep)) + 1  # 1-based position of separator
+    return peewee.Value(new.rstrip(os.sep)).concat(
+        peewee.fn.substr(Index.filepath, start)
+    )
+
+
+def overlap_msg(kind, other):
+    '''Describe how a media path overlaps with media path `other`'''
+    how = 'alias of' if kind == 'alias' else 'inside'
+    return f'{how} {other.filepath} (id={other.id})'
+
+
+def _missing_subtree(filepath, path_filter=None):
+    '''Return the topmost missing directory that contains filepath, or
+    None when the directory of filepath exists. Directories above
+    `path_filter` are not checked.'''
+    dirpath = os.path.dirname(filepath)
+    if os.path.isdir(dirpath):
+        return None
+    top = path_filter.rstrip(os.sep) if path_filter else ''
+    while True:
+        parent = os.path.dirname(dirpath)
+        if (parent == dirpath or len(parent) < len(top)
+                or os.path.isdir(parent)):
+            return dirpath
+        dirpath = parent
+
+
+def prune(path_filter=None, exclude=()):
+    '''Remove entries from the index for files that do not exist anymore.
+
+    Entries are read in chunks and checked for existence by a pool of
+    threads, configured in the `[prune]` section of the config. So are
+    the directories of missing files, once per directory. When the
+    directory of a missing file does not exist either, all entries below
+    the topmost missing directory are removed with a single range delete,
+    without checking the rest of them one by one.
+
+    Entries below any of the directories in `exclude`, like offline
+    media paths, are skipped.
+    '''
     lnout('[bold]PRUNING[/bold]')
     text = 'Checking index for entries with missing files... '
     with c.status(text, spinner='simpleDotsScrolling'):
         if path_filter:
-            res = Index.select().where(Index.filepath.startswith(path_filter))
+            total = Index.select().where(
+                reconcile.in_subtree(path_filter)
+            ).count()
         else:
-            res = Index.select()
-        npruned = 0
+            total = Index.select().count()
+        missing = []
+        subtrees = []
+        # prefixes of skipped and missing subtrees, for str.startswith
+        gone = tuple(dirpath.rstrip(os.sep) + os.sep for dirpath in exclude)
 
-    disable_bar = False if cfg['ui']['progressbars'] else True
-    for i in track(res, console=output.consout,
-                   disable=disable_bar, description=''):
-        if not os.path.exists(i.filepath):
-            Index.delete().where(Index.id == i.id).execute()
-            output.info('prune: Removed {}'.format(i.filepath))
-            npruned += 1
-    lnout(f'DONE. {npruned} files were removed from the index.', hl=False)
+    chunks = _index_chunks(path_filter, cfg['prune']['chunk-size'])
+    with ThreadPoolExecutor(cfg['prune']['workers']) as pool, \
+            Progress(total=total) as bar:
+        for chunk in chunks:
+            bar.advance(len(chunk))
+            chunk = [i for i in chunk if not i.filepath.startswith(gone)]
+            exists = pool.map(os.path.exists, [i.filepath for i in chunk])
+            chunk = [i for i, found in zip(chunk, exists) if not found]
+            # check the directories of missing files once, in the pool
+            firsts = {}
+            for i in chunk:
+                firsts.setdefault(os.path.dirname(i.filepath), i.filepath)
+            subtree_of = dict(zip(firsts, pool.map(
+                _missing_subtree, firsts.values(),
+                itertools.repeat(path_filter),
+            )))
+            for i in chunk:
+                if i.filepath.startswith(gone):
+                    continue
+                dirpath = subtree_of[os.path.dirname(i.filepath)]
+                if dirpath is None:
+                    missing.append(i.id)
+                    output.info('prune: Removed {}', i.filepath)
+                    continue
+                gone += (dirpath.rstrip(os.sep) + os.sep,)
+                output.info('prune: Directory is missing: {}', dirpath)
+                subtrees.append(dirpath)
+
+    started = time.perf_counter()
+    with database.atomic():
+        npruned = delete_ids(missing)
+        for dirpath in subtrees:
+            npruned += Index.delete().where(
+                reconcile.in_subtree(dirpath)
+            ).execute()
+            output.info('prune: Removed all files in {}', dirpath)
+    lnout('DONE. ' + _removed_msg(npruned, time.perf_counter() - started),
+          hl=False)
+    if subtrees:
+        lnout(f'{len(subtrees)} missing directories were removed as a '
+              'whole.', hl=False)
 
 
 def clones_list():
-    res = Index.raw('SELECT *, COUNT(filehash) FROM `index` '
-                    'GROUP BY filehash HAVING ( COUNT(filehash) > 1 )')
-    hashes = []
-    for i in res:
-        hashes.append(i.filehash)
-    return hashes
+    # groups are kept up-to-date by triggers, see `DupGroup`
+    res = DupGroup.select(DupGroup.filehash).tuples()
+    return [filehash for filehash, in res]
+
+
+def clone_rows():
+    '''Return a query of all clones, ordered by digest and filepath.
+
+    Only the duplicate groups are scanned, with a lookup of their files
+    in the (filehash, filepath) index, instead of the whole index.
+    '''
+    return (Index.select()
+                 .join(DupGroup, on=(Index.filehash == DupGroup.filehash))
+                 .order_by(DupGroup.filehash, Index.filepath))
 
 
 def clones(flags):
     if not isinstance(flags, pycommand.pycommand.dictobject):
         raise ProgrammingError('flags is not a pycommand.dictobject')
-    hashes = clones_list()
-    res = (Index.select()
-                .where(Index.filehash << hashes)
-                .order_by(Index.filehash, Index.filepath))
+    # iterate with a cursor, so the output of a large number of clones
+    # starts right away and uses little memory
+    res = clone_rows().iterator()
     count = -1
     changed = ''
     toggler = False
@@ -298,12 +1151,16 @@ def clones(flags):
                 lnout(f'└──── [italic]{count:>3} clones/duplicates[/italic]')
             count = 0
 
-        _hash = i.filehash[:7]
+        _hash = i.filehash.hex()[:7]
         _size = ' {}'.format(
             files.sizefmt(i.filesize)
         ) if flags['show-size'] else ''
-        _type = ' {}'.format(i.cat) if flags['show-type'] else ''
-        _mime = ' {}'.format(i.mime) if flags['show-mime'] else ''
+        _type = ' {}'.format(
+            Category.name_of(i.cat_id)
+        ) if flags['show-type'] else ''
+        _mime = ' {}'.format(
+            MimeType.name_of(i.mime_id)
+        ) if flags['show-mime'] else ''
         if toggler:
             output.sout(f'[green]{_hash}[/]', hl=False)
         else:
@@ -0,0 +1,133 @@
+'''Profiling and memory tracing of commands'''
+
+# file: src/tagfile/diagnostics.py
+
+# Copyright (c) 2015-2023 Benjamin Althues <benjamin@babab.nl>
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+# contributors may be used to endorse or promote products derived from this
+# software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import cProfile
+import io
+import os
+import pstats
+import tracemalloc
+
+from rich.markup import escape
+
+from tagfile import files, output
+from tagfile.common import TAGFILE_DATA_HOME
+
+DEFAULT_PROFILE = os.path.join(TAGFILE_DATA_HOME, 'tagfile.prof')
+'''Location of pstats output when `--profile` is given without FILE'''
+
+_active = False
+
+
+def expand_profile_flag(argv):
+    '''Return argv where a bare ``--profile`` is replaced with
+    ``--profile=DEFAULT_PROFILE``.
+
+    The getopt based parser of pycommand does not support options with
+    optional arguments. Only global options, before the command name,
+    are expanded.
+    '''
+    argv = list(argv)
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg == '--profile':
+            argv[i] = f'--profile={DEFAULT_PROFILE}'
+        elif arg in ('--config', '--db'):
+            i += 1  # skip option argument
+        elif arg == '--' or not arg.startswith('-'):
+            break
+        i += 1
+    return argv
+
+
+def run(func, profile=None, trace_memory=False, limit=20):
+    '''Call `func` and return its result, optionally while profiling
+    with cProfile (writing pstats output to the filepath `profile`)
+    and/or tracing memory allocations with tracemalloc.
+
+    Nested calls, like for aliased commands, run `func` directly.
+    '''
+    global _active
+    if _active or not (profile or trace_memory):
+        return func()
+
+    _active = True
+    profiler = cProfile.Profile() if profile else None
+    if trace_memory:
+        tracemalloc.start()
+    try:
+        if profiler:
+            return profiler.runcall(func)
+        return func()
+    finally:
+        _active = False
+        if trace_memory:
+            report_memory(limit=limit)
+        if profiler:
+            report_profile(profiler, profile, limit=limit)
+
+
+def report_profile(profiler, filepath, limit=20):
+    '''Write pstats output to filepath and print the top entries'''
+    filepath = os.path.abspath(os.path.expanduser(filepath))
+    profiler.dump_stats(filepath)
+    stream = io.StringIO()
+    (pstats.Stats(profiler, stream=stream)
+           .sort_stats(pstats.SortKey.CUMULATIVE)
+           .print_stats(limit))
+    output.lnerr('\n[bold]PROFILE[/bold]', ignore_quiet=True)
+    output.lnerr(escape(stream.getvalue().strip('\n')), hl=False,
+                 ignore_quiet=True)
+    output.lnerr(f'\npstats output written to {filepath}', ignore_quiet=True)
+
+
+def report_memory(limit=10):
+    '''Print peak of traced memory and top allocation sites, then stop
+    tracing.'''
+    snapshot = tracemalloc.take_snapshot()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    ))
+    output.lnerr('\n[bold]MEMORY[/bold]', ignore_quiet=True)
+    output.lnerr(f'peak traced memory  {files.sizefmt(peak)}', hl=False,
+                 ignore_quiet=True)
+    output.lnerr('top allocation sites (in use at exit):', ignore_quiet=True)
+    for stat in snapshot.statistics('lineno')[:limit]:
+        frame = stat.traceback[0]
+        output.lnerr(f'{files.sizefmt(stat.size)}  '
+                     f'{escape(frame.filename)}:{frame.lineno}', hl=False,
+                     ignore_quiet=True)
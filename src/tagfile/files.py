@@ -32,11 +32,14 @@
 
 # SPDX-License-Identifier: BSD-3-Clause
 
+import errno
 import hashlib
 import os
+import re
+import stat
 
 import tagfile
-from tagfile.common import ConfigError
+from tagfile.common import ConfigError, SpecialFileError
 
 
 def walkdir(filepath):
@@ -48,7 +51,150 @@ def walkdir(filepath):
     return paths
 
 
+def walksorted(dirpath, onerror=None, skip=frozenset()):
+    '''Yield filepaths of all files below dirpath in sorted order.
+
+    The order is the same as SQLite uses for sorting the filepaths as
+    text, which makes it possible to merge-join the filepaths with the
+    index ordered by filepath. Directories are sorted as if their names
+    end with a path separator, since all of their filepaths do.
+
+    Like `os.walk()`, symlinks to directories are not followed and
+    directories that cannot be read are skipped. If `onerror` is given,
+    it is called with the OSError of each directory that cannot be read
+    (its `filename` attribute is the path of the directory). Directories
+    in `skip` (without trailing separator) are left out.
+    '''
+    try:
+        with os.scandir(dirpath) as it:
+            entries = []
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    if not entry.is_symlink() and entry.path not in skip:
+                        entries.append((entry.name + os.sep, entry.path))
+                else:
+                    entries.append((entry.name, entry.path))
+    except OSError as err:
+        if onerror is not None:
+            onerror(err)
+        return
+    entries.sort()
+    for key, path in entries:
+        if key.endswith(os.sep):
+            yield from walksorted(path, onerror, skip)
+        else:
+            yield path
+
+
+def identity(stat_result):
+    '''Return a tuple of (device, inode, size, mtime_ns) for a stat result.
+
+    Files that are moved or renamed within the same filesystem keep
+    their identity, which makes it possible to recognize them without
+    hashing their content again.
+    '''
+    return (stat_result.st_dev, stat_result.st_ino,
+            stat_result.st_size, stat_result.st_mtime_ns)
+
+
+def mountpoint(path):
+    '''Return the mount point of the filesystem that contains path'''
+    path = os.path.realpath(path)
+    while not os.path.ismount(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+def _unescape_mountinfo(field):
+    '''Decode octal escapes like ``\\040`` (space) in mountinfo fields'''
+    return re.sub(r'\\([0-7]{3})', lambda m: chr(int(m.group(1), 8)), field)
+
+
+def volume_id(path, mountinfo='/proc/self/mountinfo',
+              uuid_dir='/dev/disk/by-uuid'):
+    '''Return an identifier for the filesystem volume that contains path.
+
+    Uses the filesystem UUID for block devices, i.e. ``uuid:<UUID>``.
+    Other filesystems (NFS, SMB, FUSE) are identified by their type and
+    source, i.e. ``nfs4:server:/export``. Returns None when the volume
+    cannot be identified, like on systems without `mountinfo` or for
+    block devices without UUID, since their names (i.e. /dev/sdb1) can
+    change between boots.
+    '''
+    mount = mountpoint(path)
+    fstype = source = None
+    try:
+        with open(mountinfo) as fh:
+            for line in fh:
+                fields = line.split()
+                sep = fields.index('-')
+                # the last matching entry is the one that is visible
+                if _unescape_mountinfo(fields[4]) == mount:
+                    fstype = fields[sep + 1]
+                    source = _unescape_mountinfo(fields[sep + 2])
+    except (OSError, ValueError, IndexError):
+        return None
+    if source is None:
+        return None
+
+    if source.startswith('/dev/'):
+        device = os.path.realpath(source)
+        try:
+            for uuid in os.listdir(uuid_dir):
+                link = os.path.join(uuid_dir, uuid)
+                if os.path.realpath(link) == device:
+                    return f'uuid:{uuid}'
+        except OSError:
+            pass
+        return None
+    return f'{fstype}:{source}'
+
+
+def fs_location(path, mountinfo='/proc/self/mountinfo'):
+    '''Return a tuple of (device, path) for the location of path within
+    its filesystem, independent of where and how often it is mounted.
+
+    Symlinks and bind mounts to the same directory give the same
+    location, which makes it possible to recognize media paths that are
+    aliases of each other or nested in one another. Without `mountinfo`,
+    the location is the device and realpath of path.
+    '''
+    path = os.path.realpath(path)
+    device = os.stat(path).st_dev
+    mount = root = None
+    try:
+        with open(mountinfo) as fh:
+            for line in fh:
+                fields = line.split()
+                point = _unescape_mountinfo(fields[4])
+                # the last matching entry is the one that is visible
+                if (path == point or path.startswith(point.rstrip(os.sep)
+                                                     + os.sep)) \
+                        and (mount is None or len(point) >= len(mount)):
+                    mount = point
+                    root = _unescape_mountinfo(fields[3])
+    except (OSError, IndexError):
+        mount = None
+    if mount is None:
+        return device, path
+    relpath = path[len(mount):].lstrip(os.sep)
+    return device, os.path.join(root, relpath).rstrip(os.sep) or os.sep
+
+
 def hashfile(filepath):
+    '''Return the digest of the contents of filepath, as bytes.
+
+    The file is opened with O_NONBLOCK (where available), so opening a
+    FIFO that replaced a regular file after it was checked can not
+    block. SpecialFileError is raised when it is not a regular file.
+    '''
     if tagfile.cfg['hashing']['algorithm'] == 'md5':
         h = hashlib.md5()
     elif tagfile.cfg['hashing']['algorithm'] == 'sha1':
@@ -56,13 +202,33 @@ def hashfile(filepath):
     else:
         raise ConfigError('Invalid "hashing.algorithm" in configuration')
 
-    with open(filepath, 'rb') as f:
+    fd = os.open(filepath, os.O_RDONLY | getattr(os, 'O_NONBLOCK', 0))
+    with open(fd, 'rb') as f:
+        if not stat.S_ISREG(os.fstat(fd).st_mode):
+            raise SpecialFileError(errno.EINVAL, 'Not a regular file',
+                                   filepath)
         while True:
             data = f.read(tagfile.cfg['hashing']['buffer-size'])
             if not data:
                 break
             h.update(data)
-    return h.hexdigest()
+    return h.digest()
+
+
+def digest_range(prefix):
+    '''Return a tuple of (lower, upper) bounds of the digests that start
+    with the hexadecimal string prefix, for a range query on digests
+    stored as bytes. Upper is None when there is no upper bound.
+
+    Raises ValueError when prefix is not hexadecimal.
+    '''
+    ndigits = len(prefix)
+    value = int(prefix, 16)
+    pad = '0' * (ndigits % 2)  # fill up the last byte of odd prefixes
+    lower = bytes.fromhex(prefix + pad)
+    if value + 1 >= 16 ** ndigits:
+        return lower, None
+    return lower, bytes.fromhex(f'{value + 1:0{ndigits}x}' + pad)
 
 
 def sizefmt(value, padding=6):
@@ -0,0 +1,297 @@
+'''Versioned schema migrations for existing databases'''
+
+# file: src/tagfile/migrations.py
+
+# Copyright (c) 2015-2023 Benjamin Althues <benjamin@babab.nl>
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+# contributors may be used to endorse or promote products derived from this
+# software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import os
+import sqlite3
+
+import peewee
+from playhouse import migrate as pw_migrate
+
+from tagfile import database, output, reconcile, search
+from tagfile.models import (
+    Category,
+    DupGroup,
+    Index,
+    MimeType,
+    Repository,
+    ScanError,
+)
+from tagfile.progress import Progress
+
+MODELS = [Repository, Category, MimeType, Index, ScanError, DupGroup]
+'''Models with a table in the database, in order of creation'''
+
+BATCH_SIZE = 10000
+'''Number of rows that are updated per transaction by data migrations'''
+
+
+def user_version():
+    '''Return the schema version of the database'''
+    return database.execute_sql('PRAGMA user_version').fetchone()[0]
+
+
+def set_user_version(version):
+    database.execute_sql(f'PRAGMA user_version = {int(version)}')
+
+
+def _add_columns(table, **fields):
+    '''Add columns to table, skipping columns that exist already'''
+    existing = {column.name for column in database.get_columns(table)}
+    migrator = pw_migrate.SqliteMigrator(database)
+    pw_migrate.migrate(*(
+        migrator.add_column(table, name, field)
+        for name, field in fields.items() if name not in existing
+    ))
+
+
+def _create_index(table, *columns, unique=False):
+    '''Create an index named like peewee does, if it does not exist.
+
+    Migrations create indexes explicitly, instead of with the current
+    models, which may have columns that do not exist yet.
+    '''
+    name = '_'.join((table,) + columns)
+    database.execute_sql('CREATE {}INDEX IF NOT EXISTS "{}" ON "{}" ({})'
+                         .format('UNIQUE ' if unique else '', name, table,
+                                 ', '.join(f'"{c}"' for c in columns)))
+
+
+def _id_ranges(model):
+    '''Yield (first, last) ranges of ids, `BATCH_SIZE` ids at a time'''
+    max_id = model.select(peewee.fn.MAX(model.id)).scalar() or 0
+    for start in range(1, max_id + 1, BATCH_SIZE):
+        yield start, min(start + BATCH_SIZE - 1, max_id)
+
+
+# migrations #################################################################
+#
+# Each migration upgrades the schema by one version. Migrations must be
+# safe to run on a database that is (partly) upgraded already, since
+# databases created by development versions have no schema version and
+# batched data migrations can be interrupted.
+
+def file_identity():
+    '''Add columns for file identity, media paths and the error journal'''
+    with database.atomic():
+        _add_columns(
+            'index',
+            device=peewee.IntegerField(null=True),
+            inode=peewee.IntegerField(null=True),
+            mtime_ns=peewee.IntegerField(null=True),
+            repo_id=peewee.ForeignKeyField(
+                Repository, field=Repository.id, null=True,
+                on_delete='SET NULL',
+            ),
+        )
+        _add_columns(
+            'repository',
+            device=peewee.IntegerField(null=True),
+            volume=peewee.CharField(null=True),
+        )
+        database.create_tables([ScanError])
+
+
+def link_media_paths():
+    '''Link existing index entries to the media path that contains them'''
+    roots = sorted(Repository.select(),
+                   key=lambda repo: len(repo.filepath.rstrip(os.sep)),
+                   reverse=True)
+    ranges = list(_id_ranges(Index))
+    with Progress(total=len(ranges), console=output.conserr) as bar:
+        for first, last in ranges:
+            with database.atomic():
+                for repo in roots:
+                    Index.update(repo=repo.id).where(
+                        Index.id.between(first, last)
+                        & Index.repo.is_null()
+                        & reconcile.in_subtree(repo.filepath)
+                    ).execute()
+            bar.advance()
+
+
+def unique_filepaths():
+    '''Remove duplicate entries and add indexes for searching/sorting'''
+    with database.atomic():
+        first = (Index.select(peewee.fn.MIN(Index.id))
+                      .group_by(Index.filepath))
+        nremoved = Index.delete().where(Index.id.not_in(first)).execute()
+        if nremoved:
+            output.lnerr(f'Removed {nremoved} duplicate entries.', hl=False)
+        _create_index('index', 'filepath', unique=True)
+        _create_index('index', 'basename')
+        _create_index('index', 'filehash', 'filepath')
+        _create_index('index', 'filesize', 'filepath')
+        _create_index('index', 'cat', 'filepath')
+        _create_index('index', 'mime', 'filepath')
+
+
+def lookup_tables():
+    '''Move categories and MIME types into lookup tables'''
+    if 'cat' not in {c.name for c in database.get_columns('index')}:
+        return
+    with database.atomic():
+        database.create_tables([Category, MimeType])
+        _add_columns(
+            'index',
+            cat_id=peewee.ForeignKeyField(Category, field=Category.id,
+                                          null=True, index=False),
+            mime_id=peewee.ForeignKeyField(MimeType, field=MimeType.id,
+                                           null=True, index=False),
+        )
+        database.execute_sql('INSERT OR IGNORE INTO "category" (name) '
+                             'SELECT DISTINCT cat FROM "index"')
+        database.execute_sql('INSERT OR IGNORE INTO "mimetype" (name) '
+                             'SELECT DISTINCT mime FROM "index"')
+
+    ranges = list(_id_ranges(Index))
+    with Progress(total=len(ranges), console=output.conserr) as bar:
+        for first, last in ranges:
+            with database.atomic():
+                database.execute_sql(
+                    'UPDATE "index" SET '
+                    'cat_id = (SELECT id FROM "category" '
+                    'WHERE name = "index".cat), '
+                    'mime_id = (SELECT id FROM "mimetype" '
+                    'WHERE name = "index".mime) '
+                    'WHERE id BETWEEN ? AND ? AND cat_id IS NULL',
+                    (first, last),
+                )
+            bar.advance()
+
+    with database.atomic():
+        database.execute_sql('DROP INDEX IF EXISTS "index_cat_filepath"')
+        database.execute_sql('DROP INDEX IF EXISTS "index_mime_filepath"')
+        # the table is rebuilt without them on SQLite older than 3.35,
+        # which has no ALTER TABLE ... DROP COLUMN
+        migrator = pw_migrate.SqliteMigrator(database)
+        pw_migrate.migrate(migrator.drop_column('index', 'cat'),
+                           migrator.drop_column('index', 'mime'))
+        _create_index('index', 'cat_id', 'filepath')
+        _create_index('index', 'mime_id', 'filepath')
+
+
+def binary_digests():
+    '''Store digests as bytes instead of hexadecimal text'''
+    # blobs keep their storage class in a column with text affinity,
+    # so the column and its indexes do not need to be recreated
+    database.register_function(bytes.fromhex, 'tagfile_unhex', 1)
+    ranges = list(_id_ranges(Index))
+    with Progress(total=len(ranges), console=output.conserr) as bar:
+        for first, last in ranges:
+            with database.atomic():
+                database.execute_sql(
+                    'UPDATE "index" SET filehash = tagfile_unhex(filehash) '
+                    "WHERE id BETWEEN ? AND ? AND typeof(filehash) = 'text'",
+                    (first, last),
+                )
+            bar.advance()
+
+
+def search_index():
+    '''Add a full-text index of filenames and paths'''
+    with database.atomic():
+        if not search.create_table():
+            output.lnerr(f'skipped, SQLite {sqlite3.sqlite_version} has no '
+                         'FTS5 with trigram tokenizer', hl=False)
+            return
+        # start over when an earlier attempt was interrupted
+        database.execute_sql(f'INSERT INTO "{search.TABLE}" '
+                             f'("{search.TABLE}") VALUES (\'delete-all\')')
+    ranges = list(_id_ranges(Index))
+    with Progress(total=len(ranges), console=output.conserr) as bar:
+        for first, last in ranges:
+            with database.atomic():
+                database.execute_sql(
+                    f'INSERT INTO "{search.TABLE}" '
+                    '(rowid, basename, filepath) '
+                    'SELECT id, basename, filepath FROM "index" '
+                    'WHERE id BETWEEN ? AND ?',
+                    (first, last),
+                )
+            bar.advance()
+
+
+def duplicate_groups():
+    '''Add a table of duplicate groups that is kept up-to-date'''
+    with database.atomic():
+        database.create_tables([DupGroup])
+        DupGroup.create_triggers()
+        DupGroup.rebuild()
+
+
+MIGRATIONS = [
+    file_identity,
+    link_media_paths,
+    unique_filepaths,
+    lookup_tables,
+    binary_digests,
+    search_index,
+    duplicate_groups,
+]
+'''Migrations in order, the schema version is the position in the list'''
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def upgrade():
+    '''Create tables for a new database or migrate an existing one.
+
+    The schema version is stored in the database with `PRAGMA
+    user_version` and is updated after each migration that completes.
+    Returns the number of migrations that were applied.
+    '''
+    if not database.table_exists(Index._meta.table_name):
+        with database.atomic():
+            database.create_tables(MODELS)
+            search.create_table()
+            DupGroup.create_triggers()
+            set_user_version(SCHEMA_VERSION)
+        return 0
+
+    version = user_version()
+    if version > SCHEMA_VERSION:
+        output.warning('migrations: database schema version {} is newer '
+                       'than {}', version, SCHEMA_VERSION)
+        return 0
+    pending = MIGRATIONS[version:]
+    if pending:
+        output.lnerr('[bold]UPGRADING DATABASE[/bold]')
+    for number, migration in enumerate(pending, start=version + 1):
+        output.lnerr(f'schema version {number}: {migration.__doc__}', hl=False)
+        output.info('migrations: upgrading to schema version {}', number)
+        migration()
+        set_user_version(number)
+    if pending:
+        output.lnerr()
+    return len(pending)
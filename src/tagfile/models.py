@@ -44,14 +44,155 @@ class Model(peewee.Model):
         database = database
 
 
+class Repository(Model):
+    filepath = peewee.CharField()
+    # filesystem identity, used for detecting offline media paths
+    device = peewee.IntegerField(null=True)
+    volume = peewee.CharField(null=True)
+
+
+class Lookup(Model):
+    '''Base model for small tables of names that are referenced by id.
+
+    Names and ids are cached in-process, since there are only a few of
+    them. Call `clear()` after selecting another database.
+    '''
+    name = peewee.CharField(unique=True)
+
+    _ids = None
+    _names = None
+
+    @classmethod
+    def load(cls):
+        cls._ids = dict(cls.select(cls.name, cls.id).tuples())
+        cls._names = {row_id: name for name, row_id in cls._ids.items()}
+
+    @classmethod
+    def clear(cls):
+        cls._ids = cls._names = None
+
+    @classmethod
+    def intern(cls, name):
+        '''Return the id for name, adding name to the table if needed'''
+        if cls._ids is None:
+            cls.load()
+        try:
+            return cls._ids[name]
+        except KeyError:
+            row_id = cls.get_or_create(name=name)[0].id
+            cls._ids[name] = row_id
+            cls._names[row_id] = name
+            return row_id
+
+    @classmethod
+    def lookup(cls, name):
+        '''Return the id for name, or None when it is not in the table'''
+        if cls._ids is None:
+            cls.load()
+        return cls._ids.get(name)
+
+    @classmethod
+    def name_of(cls, row_id):
+        '''Return the name for id'''
+        if cls._names is None or row_id not in cls._names:
+            cls.load()
+        return cls._names.get(row_id)
+
+
+class Category(Lookup):
+    '''First part of MIME types, i.e. "image" for "image/png"'''
+
+
+class MimeType(Lookup):
+    '''Full MIME types with subtype, i.e. "image/png"'''
+
+
 class Index(Model):
-    filehash = peewee.CharField()
-    filepath = peewee.CharField(max_length=4096)
-    basename = peewee.CharField(max_length=255)
+    filehash = peewee.BlobField()  # digest as bytes, not hex
+    filepath = peewee.CharField(max_length=4096, unique=True)
+    basename = peewee.CharField(max_length=255, index=True)
     filesize = peewee.IntegerField()
-    cat = peewee.CharField()
-    mime = peewee.CharField()
+    # ids of names in lookup tables, see `Lookup.name_of()`
+    cat = peewee.ForeignKeyField(Category, lazy_load=False, index=False)
+    mime = peewee.ForeignKeyField(MimeType, lazy_load=False, index=False)
+    # file identity, used for detecting moved/renamed files
+    device = peewee.IntegerField(null=True)
+    inode = peewee.IntegerField(null=True)
+    mtime_ns = peewee.IntegerField(null=True)
+    # media path that contains the file, see `tagfile.core.relocate()`
+    repo = peewee.ForeignKeyField(Repository, null=True, backref='files',
+                                  on_delete='SET NULL')
 
+    class Meta:
+        # composite indexes for matching and sorting on a column, with
+        # filepath as secondary sort order (and clones grouped by hash)
+        indexes = (
+            (('filehash', 'filepath'), False),
+            (('filesize', 'filepath'), False),
+            (('cat', 'filepath'), False),
+            (('mime', 'filepath'), False),
+        )
 
-class Repository(Model):
-    filepath = peewee.CharField()
+
+class ScanError(Model):
+    # journal of files that could not be indexed, to retry them later
+    filepath = peewee.CharField(max_length=4096, unique=True)
+    error = peewee.CharField()
+    message = peewee.TextField(null=True)
+    count = peewee.IntegerField(default=1)
+    last_attempt = peewee.DateTimeField()
+
+    class Meta:
+        table_name = 'scan_errors'
+
+
+class DupGroup(Model):
+    '''Groups of indexed files with the same digest, i.e. clones.
+
+    Triggers keep the groups up-to-date when files are added, removed or
+    changed, see `create_triggers()`. Only digests of two or more files
+    have a group.
+    '''
+    filehash = peewee.BlobField(primary_key=True)
+    count = peewee.IntegerField()
+    size = peewee.IntegerField()  # total size of all files in group
+    wasted = peewee.IntegerField()  # total size of all but one file
+
+    class Meta:
+        table_name = 'dupgroup'
+
+    _insert_sql = (
+        'INSERT INTO "dupgroup" (filehash, count, size, wasted) '
+        'SELECT filehash, COUNT(*), SUM(filesize), '
+        'SUM(filesize) - MAX(filesize) FROM "index" {} '
+        'GROUP BY filehash HAVING COUNT(*) > 1'
+    )
+
+    @classmethod
+    def _update_sql(cls, filehash):
+        '''Return statements that recompute the group of filehash'''
+        return (f'DELETE FROM "dupgroup" WHERE filehash = {filehash}; '
+                + cls._insert_sql.format(f'WHERE filehash = {filehash}')
+                + ';')
+
+    @classmethod
+    def create_triggers(cls):
+        '''Create triggers on the Index table if they do not exist'''
+        old = cls._update_sql('old.filehash')
+        new = cls._update_sql('new.filehash')
+        triggers = {
+            'ai': f'AFTER INSERT ON "index" BEGIN {new} END',
+            'ad': f'AFTER DELETE ON "index" BEGIN {old} END',
+            'au': ('AFTER UPDATE OF filehash, filesize ON "index" '
+                   f'BEGIN {old} {new} END'),
+        }
+        for suffix, body in triggers.items():
+            database.execute_sql(
+                f'CREATE TRIGGER IF NOT EXISTS "dupgroup_{suffix}" {body}'
+            )
+
+    @classmethod
+    def rebuild(cls):
+        '''Recompute all groups from the Index table'''
+        database.execute_sql('DELETE FROM "dupgroup"')
+        database.execute_sql(cls._insert_sql.format(''))
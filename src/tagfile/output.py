@@ -30,7 +30,10 @@
 
 # SPDX-License-Identifier: BSD-3-Clause
 
+import atexit
 import logging
+from logging.handlers import QueueHandler, QueueListener
+import queue
 
 from rich import console
 from rich.theme import Theme
@@ -40,11 +43,25 @@ from tagfile.common import ConfigError
 
 
 class OutputSettings:
-    verbose = False
-    '''Used to set state of verbose output when using -v command flags'''
-
     def __init__(self):
         self._quiet_bool = False
+        self._verbose_bool = False
+        self.logs = {}
+        '''Cached bools per numerical level: will messages be logged'''
+        self.enabled = {}
+        '''Cached bools per numerical level: will messages be logged
+        and/or printed. Checked before doing any work for a message.'''
+        self.update_levels()
+
+    @property
+    def verbose(self):
+        '''Used to set state of verbose output when using -v command flags'''
+        return self._verbose_bool
+
+    @verbose.setter
+    def verbose(self, yesno):
+        self._verbose_bool = bool(yesno)
+        self.update_levels()
 
     @property
     def quiet(self):
@@ -55,6 +72,28 @@ class OutputSettings:
     def quiet(self, yesno):
         self._quiet_bool = bool(yesno)
         self.update_consoles()
+        self.update_levels()
+
+    def update_levels(self):
+        '''Cache which levels are logged and/or printed.
+
+        This is called when verbose or quiet is changed and when logging
+        is started. Call it after changing the logging settings of
+        `tagfile.cfg` in any other way.
+        '''
+        try:
+            log_enabled = tagfile.cfg['logging']['enabled']
+            log_level = configlvl()
+        except (KeyError, ConfigError):
+            log_enabled = False
+            log_level = logging.WARNING
+        echo_levels = (logging.INFO, logging.WARNING, logging.ERROR)
+        for lvl in set(LEVELS.values()):
+            self.logs[lvl] = bool(log_enabled and lvl >= log_level)
+            prints = lvl >= logging.FATAL or (
+                self.verbose and not self.quiet and lvl in echo_levels
+            )
+            self.enabled[lvl] = self.logs[lvl] or prints
 
     def update_consoles(self):
         '''Set properties of rich consoles to {en,dis}able progessbars etc.'''
@@ -67,8 +106,8 @@ class OutputSettings:
         - Use ``force_term=True`` to update the consoles.
         - Use ``force_term=False`` to reset the consoles after test is done.
 
-        This is the only funtion in tagfile as a whole where the global
-        keyword is used. It is essentially only ever used to force override
+        The global keyword is used here to replace the module level
+        consoles. It is essentially only ever used to force override
         colored output in `consout` and `conserr` for testing the prescence
         of ANSI escape sequences in the output with pytest. This is not to
         be used in regular program flow. Use `update_consoles()` instead.
@@ -97,45 +136,40 @@ consout = console.Console(theme=theme)
 conserr = console.Console(theme=theme, stderr=True)
 '''Rich text console API for stderr'''
 
-settings = OutputSettings()
-
 
 # mappings for strings to values of logging.* constants ######################
 
+LEVELS = {
+    'debug': logging.DEBUG,
+    'info': logging.INFO,
+    'warn': logging.WARNING,
+    'warning': logging.WARNING,
+    'error': logging.ERROR,
+    'fatal': logging.FATAL,
+    'critical': logging.FATAL,
+}
+'''Mapping of level strings to numerical values of logging.* constants'''
+
+LOGFUNCS = {
+    'debug': logging.debug,
+    'info': logging.info,
+    'warn': logging.warning,
+    'warning': logging.warning,
+    'error': logging.error,
+    'fatal': logging.fatal,
+    'critical': logging.fatal,
+}
+'''Mapping of level strings to logging functions'''
+
+
 def lvlstr2int(level_string):
     '''Transform log level string to corresponding numerical value.'''
-    levels = {
-        'debug': logging.DEBUG,
-        'info': logging.INFO,
-        'warn': logging.WARNING,
-        'warning': logging.WARNING,
-        'error': logging.ERROR,
-        'fatal': logging.FATAL,
-        'critical': logging.FATAL,
-    }
-    try:
-        ret = levels[level_string.lower()]
-    except KeyError:
-        ret = logging.WARNING
-    return ret
+    return LEVELS.get(level_string.lower(), logging.WARNING)
 
 
 def get_logfunc_for(level_string):
     '''Get logging function corresponding to string'''
-    levels = {
-        'debug': logging.debug,
-        'info': logging.info,
-        'warn': logging.warning,
-        'warning': logging.warning,
-        'error': logging.error,
-        'fatal': logging.fatal,
-        'critical': logging.fatal,
-    }
-    try:
-        ret = levels[level_string.lower()]
-    except KeyError:
-        ret = logging.warning
-    return ret
+    return LOGFUNCS.get(level_string.lower(), logging.warning)
 
 
 def configlvl():
@@ -148,6 +182,61 @@ def configlvl():
     return ret
 
 
+settings = OutputSettings()
+
+
+# logging through a queue ####################################################
+
+log_queue = None
+'''Queue that log records are put on, see `start_logging()`'''
+
+_listener = None
+
+
+def start_logging(filename, queue_obj=None):
+    '''Log to filename from a listener thread that reads from a queue.
+
+    Logging calls only put records on `log_queue`, which makes logging
+    cheap and safe from worker threads. Pass a `multiprocessing.Queue`
+    as `queue_obj` to also receive records from worker processes that
+    call `worker_logging(queue_obj)`.
+    '''
+    global log_queue, _listener
+    if _listener is not None:
+        return
+    log_queue = queue.SimpleQueue() if queue_obj is None else queue_obj
+    handler = logging.FileHandler(filename)
+    handler.setFormatter(logging.Formatter(
+        '{asctime}:{levelname}: {message}', style='{'
+    ))
+    root = logging.getLogger()
+    root.setLevel(configlvl())
+    root.addHandler(QueueHandler(log_queue))
+    _listener = QueueListener(log_queue, handler)
+    _listener.start()
+    atexit.register(stop_logging)
+    settings.update_levels()
+
+
+def stop_logging():
+    '''Stop the listener thread after writing all queued records.'''
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def worker_logging(queue_obj):
+    '''Setup logging in a worker process to send records to the queue
+    that was passed to `start_logging()` in the main process.'''
+    root = logging.getLogger()
+    root.handlers[:] = [QueueHandler(queue_obj)]
+    root.setLevel(configlvl())
+    settings.update_levels()
+
+
 # generic functions for printing to console without logging  #################
 
 def sout(*args, hl=True):
@@ -201,7 +290,10 @@ def vecho(level_string, text):
     Messages with the *debug* level print nothing here. They are
     exclusively logged.
     '''
-    lvl = lvlstr2int(level_string)
+    _vecho(lvlstr2int(level_string), text)
+
+
+def _vecho(lvl, text):
     if lvl >= logging.FATAL:
         lnerr('fatal error: {}'.format(text), ignore_quiet=True)
         return
@@ -218,34 +310,49 @@ def vecho(level_string, text):
 
 def log(level_string, text):
     '''Generic function for logging using correct level'''
-    if tagfile.cfg['logging']['enabled']:
-        func = get_logfunc_for(level_string)
-        func(text)
+    lvl = lvlstr2int(level_string)
+    if settings.logs[lvl]:
+        logging.log(lvl, text)
 
 
 def logvecho(level_string, text):
     '''Generic function for combination of verbose output and logging'''
-    log(level_string, text)
-    vecho(level_string, text)
+    _logvecho(lvlstr2int(level_string), text, ())
+
+
+def _logvecho(lvl, text, args):
+    if args:
+        text = text.format(*args)
+    if settings.logs[lvl]:
+        logging.log(lvl, text)
+    _vecho(lvl, text)
 
 
 # level specific shortcuts for logging and verbose echo ######################
+#
+# When a level is neither logged nor printed, these functions only do a
+# lookup of a cached bool. Pass any variable parts of the message as
+# args for `text.format(*args)`, to skip formatting in that case, i.e.:
+# `output.info('scan: added {}', path)`.
 
-def info(text):
+def info(text, *args):
     '''Log info level message and print if settings.verbose is True'''
-    logvecho('info', text)
+    if settings.enabled[logging.INFO]:
+        _logvecho(logging.INFO, text, args)
 
 
-def warning(text):
+def warning(text, *args):
     '''Log warning level message and print if settings.verbose is True'''
-    logvecho('warning', text)
+    if settings.enabled[logging.WARNING]:
+        _logvecho(logging.WARNING, text, args)
 
 
-def error(text):
+def error(text, *args):
     '''Log error level message and print if settings.verbose is True'''
-    logvecho('error', text)
+    if settings.enabled[logging.ERROR]:
+        _logvecho(logging.ERROR, text, args)
 
 
-def fatal(text):
+def fatal(text, *args):
     '''Log fatal level message and print regardless of settings.verbose'''
-    logvecho('fatal', text)
+    _logvecho(logging.FATAL, text, args)
@@ -0,0 +1,127 @@
+'''SQLite pragmas per database and profiles for commands'''
+
+# file: src/tagfile/pragmas.py
+
+# Copyright (c) 2015-2023 Benjamin Althues <benjamin@babab.nl>
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+# contributors may be used to endorse or promote products derived from this
+# software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import tagfile
+
+REQUIRED = {
+    'journal_mode': 'wal',
+    'foreign_keys': 1,
+    'ignore_check_constraints': 0,
+}
+'''Pragmas that are always set, since tagfile depends on them'''
+
+NAMES = (
+    'page_size',
+    'cache_size',
+    'mmap_size',
+    'temp_store',
+    'synchronous',
+    'wal_autocheckpoint',
+)
+'''Pragmas that can be configured per database'''
+
+DEFAULT = 'default'
+
+PROFILES = {
+    DEFAULT: {
+        'cache_size': -1 * 64000,  # 64MB
+        'mmap_size': 0,
+        'temp_store': 0,  # as compiled, usually files
+        'synchronous': 1,  # normal, durable at checkpoints with WAL
+        'wal_autocheckpoint': 1000,
+    },
+    'bulk-load': {
+        'cache_size': -1 * 256000,  # 256MB
+        'mmap_size': 0,
+        'temp_store': 2,  # memory
+        'synchronous': 0,  # off, a crash of the OS can corrupt the DB
+        'wal_autocheckpoint': 10000,
+    },
+    'safe': {
+        'cache_size': -1 * 64000,  # 64MB
+        'mmap_size': 0,
+        'temp_store': 0,
+        'synchronous': 2,  # full, durable after each transaction
+        'wal_autocheckpoint': 1000,
+    },
+    'read-mostly': {
+        'cache_size': -1 * 256000,  # 256MB
+        'mmap_size': 1024 ** 3,  # 1GB
+        'temp_store': 2,
+        'synchronous': 1,
+        'wal_autocheckpoint': 1000,
+    },
+}
+'''Named sets of pragmas, each one sets all pragmas of `NAMES` except
+page_size, which can only be set before a database is created.
+
+Commands select the profile that suits them, i.e. "bulk-load" for
+scanning and "read-mostly" for searching, unless the configuration of
+the database selects a profile.
+'''
+
+
+def database_config(db_name):
+    '''Return a tuple of (path, profile, pragmas) for the configured
+    database db_name. The profile is None when it is not configured.
+
+    Raises KeyError when no database is configured with db_name.
+    '''
+    value = tagfile.cfg['databases'][db_name]
+    if isinstance(value, str):
+        return value, None, {}
+    return value['path'], value.get('profile'), value.get('pragmas', {})
+
+
+def connect_pragmas(profile, pragmas=None):
+    '''Return a list of (name, value) pragmas to set on connecting.
+
+    Pragmas take precedence over the profile. Page size is set first,
+    since it can not be changed after switching to WAL mode.
+    '''
+    merged = {**PROFILES[profile], **(pragmas or {})}
+    page_size = merged.pop('page_size', None)
+    ret = [] if page_size is None else [('page_size', page_size)]
+    return ret + list(REQUIRED.items()) + list(merged.items())
+
+
+def apply(profile, pragmas=None):
+    '''Set the pragmas of profile on the connected database, for the
+    current and any later connections. Pragmas take precedence over
+    the profile.
+    '''
+    merged = {**PROFILES[profile], **(pragmas or {})}
+    merged.pop('page_size', None)
+    for name, value in merged.items():
+        tagfile.database.pragma(name, value, permanent=True)
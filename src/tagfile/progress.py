@@ -0,0 +1,133 @@
+'''Progress reporting for long running loops'''
+
+# file: src/tagfile/progress.py
+
+# Copyright (c) 2015-2023 Benjamin Althues <benjamin@babab.nl>
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+# contributors may be used to endorse or promote products derived from this
+# software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import time
+
+from rich import progress as rprogress
+
+import tagfile
+from tagfile import output
+
+
+class Progress:
+    '''Progress bar that is cheap to advance from within hot loops.
+
+    Calls to `advance()` only add to a counter. The rich progress bar
+    is updated with the accumulated amount at most once per `interval`
+    seconds and rendered by rich at a fixed refresh rate. This makes
+    the overhead per item independent of the number of items.
+
+    With ``unit='bytes'`` the bar, speed and estimated time remaining
+    are based on the number of bytes instead of number of items. This
+    gives a meaningful ETA when file sizes vary wildly.
+
+    The bar is rendered on `console`, which is `output.consout` (stdout)
+    by default. When progressbars are disabled in the config, output is
+    quiet or the console is not a terminal, `advance()` is a no-op and
+    nothing is rendered at all.
+
+    Usage::
+
+        with Progress(total=sum(sizes), unit='bytes') as bar:
+            for size in sizes:
+                ...
+                bar.advance(size)
+    '''
+
+    def __init__(self, total=None, unit='items', interval=0.25,
+                 console=None):
+        console = console or output.consout
+        self.enabled = bool(
+            tagfile.cfg['ui']['progressbars']
+            and not output.settings.quiet
+            and console.is_terminal
+        )
+        self.total = total
+        self.unit = unit
+        self.interval = interval
+        self.completed = 0
+        self._reported = 0
+        self._next_update = 0.0
+        self._bar = None
+        self._task = None
+        if not self.enabled:
+            self.advance = self._advance_disabled
+            return
+
+        if unit == 'bytes':
+            columns = (
+                rprogress.BarColumn(),
+                rprogress.DownloadColumn(),
+                rprogress.TransferSpeedColumn(),
+                rprogress.TimeRemainingColumn(),
+            )
+        else:
+            columns = (
+                rprogress.BarColumn(),
+                rprogress.MofNCompleteColumn(),
+                rprogress.TimeRemainingColumn(),
+            )
+        self._bar = rprogress.Progress(
+            *columns, console=console, transient=False,
+            refresh_per_second=1 / interval,
+        )
+
+    def __enter__(self):
+        if self._bar is not None:
+            self._bar.start()
+            self._task = self._bar.add_task('', total=self.total)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._bar is not None:
+            self._flush()
+            self._bar.stop()
+        return False
+
+    def advance(self, amount=1):
+        '''Add amount to progress; update bar when interval has passed'''
+        self.completed += amount
+        now = time.monotonic()
+        if now >= self._next_update:
+            self._next_update = now + self.interval
+            self._flush()
+
+    def _advance_disabled(self, amount=1):
+        self.completed += amount
+
+    def _flush(self):
+        if self._task is not None and self.completed != self._reported:
+            self._bar.update(self._task,
+                             advance=self.completed - self._reported)
+            self._reported = self.completed
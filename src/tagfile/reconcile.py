@@ -0,0 +1,90 @@
+'''Merge-join of media paths on the filesystem with the index'''
+
+# file: src/tagfile/reconcile.py
+
+# Copyright (c) 2015-2023 Benjamin Althues <benjamin@babab.nl>
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+# contributors may be used to endorse or promote products derived from this
+# software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import os
+
+from tagfile.models import Index
+
+
+def in_subtree(dirpath):
+    '''Return a peewee expression matching Index entries below dirpath.
+
+    This is a range condition on `Index.filepath`, which unlike LIKE is
+    case-sensitive and does not match sibling paths with the same prefix
+    (i.e. ``/media2`` for ``/media``).
+    '''
+    base = dirpath.rstrip(os.sep)
+    lower = base + os.sep
+    upper = base + chr(ord(os.sep) + 1)
+    return (Index.filepath >= lower) & (Index.filepath < upper)
+
+
+def index_rows(dirpath, chunk_size=1000):
+    '''Yield Index entries below dirpath, ordered by filepath.
+
+    Entries are read `chunk_size` at a time, continuing after the last
+    filepath of the previous chunk, so only one chunk is held in memory.
+    '''
+    query = (Index.select(Index.id, Index.filepath, Index.filesize,
+                          Index.device, Index.inode, Index.mtime_ns)
+                  .where(in_subtree(dirpath))
+                  .order_by(Index.filepath))
+    chunk = list(query.limit(chunk_size))
+    while chunk:
+        yield from chunk
+        chunk = list(query.where(Index.filepath > chunk[-1].filepath)
+                          .limit(chunk_size))
+
+
+def merge(filepaths, rows):
+    '''Merge-join filepaths with Index entries, both sorted by filepath.
+
+    Yields tuples of ``(filepath, row)``, where `row` is None for files
+    that are not indexed and `filepath` is None for entries of files
+    that do not exist anymore. Both inputs are consumed lazily.
+    '''
+    rows = iter(rows)
+    row = next(rows, None)
+    for filepath in filepaths:
+        while row is not None and row.filepath < filepath:
+            yield None, row
+            row = next(rows, None)
+        if row is not None and row.filepath == filepath:
+            yield filepath, row
+            row = next(rows, None)
+        else:
+            yield filepath, None
+    while row is not None:
+        yield None, row
+        row = next(rows, None)
@@ -31,15 +31,20 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
 from tagfile import files, output
+from tagfile.models import Category, MimeType
 
 
 def print_filelist_row(flags, iteritem):
     if flags['show-hash']:
-        output.sout(f'[green]{iteritem.filehash[:7]}[/] ', hl=False)
+        output.sout(f'[green]{iteritem.filehash.hex()[:7]}[/] ', hl=False)
     if flags['show-size']:
         _size = '{} '.format(files.sizefmt(iteritem.filesize))
         output.sout(_size, hl=False)
 
-    _type = '{} '.format(iteritem.cat) if flags['show-type'] else ''
-    _mime = '{} '.format(iteritem.mime) if flags['show-mime'] else ''
+    _type = '{} '.format(
+        Category.name_of(iteritem.cat_id)
+    ) if flags['show-type'] else ''
+    _mime = '{} '.format(
+        MimeType.name_of(iteritem.mime_id)
+    ) if flags['show-mime'] else ''
     output.lnout(f'{_type}{_mime}{iteritem.filepath}')
@@ -0,0 +1,219 @@
+'''Full-text search of filenames and paths with SQLite FTS5'''
+
+# file: src/tagfile/search.py
+
+# Copyright (c) 2015-2023 Benjamin Althues <benjamin@babab.nl>
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+# contributors may be used to endorse or promote products derived from this
+# software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import sqlite3
+
+import peewee
+
+from tagfile import database
+
+TABLE = 'index_search'
+'''FTS5 table with the basename and filepath of all Index entries.
+
+It is an external content table, which stores only the full-text index
+and reads the text from the Index table. Triggers keep it in sync with
+the Index table. The trigram tokenizer indexes all sequences of three
+characters, so any substring of three or more characters can be found
+with the index. Like LIKE, matching is case-insensitive.
+'''
+
+VOCAB = f'{TABLE}_vocab'
+'''fts5vocab table with the number of names and paths per trigram.
+
+It is created as a temporary table when needed, since it reads the
+full-text index directly and stores nothing itself.
+'''
+
+MIN_LENGTH = 3
+'''Substrings that are shorter cannot be found with the trigram index'''
+
+FUZZY_MAX_DOCS = 20000
+'''Number of basenames that a fuzzy query matches at most, unless the
+rarest trigram of the text is in more basenames'''
+
+
+def supported():
+    '''Check if SQLite has FTS5 with the trigram tokenizer.
+
+    The trigram tokenizer is available since SQLite 3.34, and FTS5 is an
+    extension that can be left out of a build of SQLite. Support is
+    tested by creating a temporary table.
+    '''
+    try:
+        database.execute_sql(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS temp."tagfile_trigram" '
+            "USING fts5(text, tokenize='trigram')"
+        )
+    except peewee.OperationalError:
+        return False
+    database.execute_sql('DROP TABLE temp."tagfile_trigram"')
+    return True
+
+
+def available():
+    '''Check if the database has the full-text index'''
+    return database.table_exists(TABLE)
+
+
+def unavailable_msg(option):
+    '''Return an error message for an option that needs the full-text
+    index when it is not available'''
+    return (f'error: option {option} requires a full-text index, which '
+            'needs SQLite 3.34 or newer with FTS5 '
+            f'(this is SQLite {sqlite3.sqlite_version})')
+
+
+def create_table():
+    '''Create the FTS5 table and its triggers if they do not exist.
+
+    Returns False without creating them when SQLite does not support
+    the table, see `supported()`.
+    '''
+    if not supported():
+        return False
+    database.execute_sql(
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS "{TABLE}" USING fts5('
+        "basename, filepath, content='index', content_rowid='id', "
+        "tokenize='trigram')"
+    )
+    delete = (f'INSERT INTO "{TABLE}" ("{TABLE}", rowid, basename, filepath) '
+              "VALUES ('delete', old.id, old.basename, old.filepath);")
+    insert = (f'INSERT INTO "{TABLE}" (rowid, basename, filepath) '
+              'VALUES (new.id, new.basename, new.filepath);')
+    triggers = {
+        'ai': f'AFTER INSERT ON "index" BEGIN {insert} END',
+        'ad': f'AFTER DELETE ON "index" BEGIN {delete} END',
+        'au': ('AFTER UPDATE OF basename, filepath ON "index" '
+               f'BEGIN {delete} {insert} END'),
+    }
+    for suffix, body in triggers.items():
+        database.execute_sql(
+            f'CREATE TRIGGER IF NOT EXISTS "{TABLE}_{suffix}" {body}'
+        )
+    return True
+
+
+def phrase(text):
+    '''Quote text as a phrase for FTS5 queries'''
+    return '"{}"'.format(text.replace('"', '""'))
+
+
+def contains(column, text):
+    '''Return a tuple of (SQL condition, params) for Index entries with
+    a value of column ("basename" or "filepath") that contains text.
+
+    Uses the full-text index, or LIKE when text is too short for it or
+    the database has no full-text index.
+    '''
+    if len(text) < MIN_LENGTH or not available():
+        return f'`{column}` LIKE ?', [f'%{text}%']
+    return match(f'{column} : {phrase(text)}')
+
+
+def match(query):
+    '''Return a tuple of (SQL condition, params) for Index entries that
+    match query, using the FTS5 query syntax.
+
+    With the trigram tokenizer, each word or phrase in the query matches
+    names and paths that contain it. Column filters (i.e. "basename :")
+    and the operators AND, OR, NOT, parentheses and NEAR can be used.
+    '''
+    return (f'`id` IN (SELECT rowid FROM "{TABLE}" WHERE "{TABLE}" MATCH ?)',
+            [query])
+
+
+def trigrams(text):
+    '''Return the set of lowercase trigrams of text'''
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def doc_counts(grams):
+    '''Return a dict of {trigram: number of basenames that contain it},
+    for the trigrams in grams that are found in any basename'''
+    grams = list(grams)
+    database.execute_sql(
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS temp."{VOCAB}" '
+        f"USING fts5vocab(main, \"{TABLE}\", 'col')"
+    )
+    cursor = database.execute_sql(
+        f'SELECT term, doc FROM temp."{VOCAB}" '
+        "WHERE col = 'basename' AND term IN ({})"
+        .format(', '.join('?' * len(grams))),
+        grams,
+    )
+    return dict(cursor.fetchall())
+
+
+def fuzzy(text, max_docs=FUZZY_MAX_DOCS):
+    '''Return an FTS5 query for basenames that share a rare trigram with
+    text, or None when text is too short to have trigrams.
+
+    Only the rarest trigrams of text are used, as long as they are in
+    no more than `max_docs` basenames together, and at least the rarest
+    one. This keeps the number of names that are ranked small, since
+    a common trigram (like "jpg") is in a large part of all names.
+    Ordered by rank, names that share the most (and rarest) trigrams
+    with text come first, which makes them good candidates for ranking
+    by `similarity()`.
+    '''
+    grams = trigrams(text)
+    if not grams:
+        return None
+    counts = doc_counts(grams)
+    selected = []
+    ndocs = 0
+    for gram in sorted(counts, key=lambda gram: (counts[gram], gram)):
+        ndocs += counts[gram]
+        if selected and ndocs > max_docs:
+            break
+        selected.append(gram)
+    # when no trigram is found in any name, the query matches nothing
+    selected = sorted(selected or grams)
+    return 'basename : ({})'.format(' OR '.join(map(phrase, selected)))
+
+
+def similarity(text, name):
+    '''Return a sort key for how much name looks like text.
+
+    This is a tuple of the fraction of trigrams of text that are found
+    in name and the fraction of all trigrams that they have in common.
+    The first favors names that contain text, even with a typo, and the
+    second favors names that have few other characters.
+    '''
+    grams, other = trigrams(text), trigrams(name)
+    if not grams:
+        return 0.0, 0.0
+    common = len(grams & other)
+    return common / len(grams), common / len(grams | other)
@@ -0,0 +1,129 @@
+'''Statistics and timings for scanning media paths'''
+
+# file: src/tagfile/stats.py
+
+# Copyright (c) 2015-2023 Benjamin Althues <benjamin@babab.nl>
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+# contributors may be used to endorse or promote products derived from this
+# software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import json
+import time
+
+PHASES = ('walk', 'ignore', 'stat', 'lookup', 'mime', 'hash', 'write')
+'''Phases of a scan that are timed separately, in order of execution:
+
+- walk: walking media paths for files
+- ignore: matching paths against the configured ignore rules
+- stat: getting file status (size, inode, etc.)
+- lookup: checking the database for already indexed paths
+- mime: determining MIME types with libmagic
+- hash: reading and hashing file contents
+- write: inserting and updating rows in the database
+'''
+
+
+class ScanStats:
+    '''Counters, timings and throughput of a single scan.
+
+    Timings are kept as the sum of wall clock time spent per phase.
+    Use `lap()` to add the time since a previous `time.perf_counter()`
+    call to a phase, which keeps the overhead within the scan loop down
+    to a single clock read and dict update.
+    '''
+
+    def __init__(self, walktime=0.0):
+        self.times = dict.fromkeys(PHASES, 0.0)
+        self.times['walk'] = walktime
+        self.total = 0
+        self.existing = 0
+        self.ignored = 0
+        self.special = 0
+        self.moved = 0
+        self.changed = 0
+        self.removed = 0
+        self.new = 0
+        self.bytes_hashed = 0
+        self.err_unicode = 0
+        self.err_permission = 0
+        self.err_other = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def lap(self, phase, since):
+        '''Add time since `since` to `phase` and return the current time.'''
+        now = time.perf_counter()
+        self.times[phase] += now - since
+        return now
+
+    def stop(self):
+        '''Set the elapsed wall clock time of the scan (excluding walk).'''
+        self.elapsed = time.perf_counter() - self.started
+
+    @property
+    def files_per_second(self):
+        return self.total / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def mb_per_second(self):
+        '''Throughput of hashing in megabytes (1024 ** 2) per second'''
+        if not self.times['hash']:
+            return 0.0
+        return self.bytes_hashed / self.times['hash'] / 1024 ** 2
+
+    def as_dict(self):
+        return {
+            'files': {
+                'total': self.total,
+                'existing': self.existing,
+                'ignored': self.ignored,
+                'special': self.special,
+                'moved': self.moved,
+                'changed': self.changed,
+                'removed': self.removed,
+                'new': self.new,
+            },
+            'errors': {
+                'unicode': self.err_unicode,
+                'permission': self.err_permission,
+                'other': self.err_other,
+            },
+            'seconds': {
+                **{k: round(v, 6) for k, v in self.times.items()},
+                'elapsed': round(self.elapsed, 6),
+            },
+            'bytes_hashed': self.bytes_hashed,
+            'files_per_second': round(self.files_per_second, 3),
+            'mb_per_second': round(self.mb_per_second, 3),
+        }
+
+    def write_json(self, filepath):
+        '''Write statistics to `filepath` for use in dashboards etc.'''
+        with open(filepath, 'w') as fh:
+            json.dump(self.as_dict(), fh, indent=2)
+            fh.write('\n')
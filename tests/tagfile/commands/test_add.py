@@ -37,20 +37,26 @@ import pytest
 
 import tagfile.output
 from tagfile.commands.add import AddCommand as Command
+from tagfile.models import Index, Repository
 
 TAGFILE_CONFIG_HOME = os.environ['TAGFILE_CONFIG_HOME']
 TAGFILE_DATA_HOME = os.environ['TAGFILE_DATA_HOME']
 TAGFILEDEV_MEDIA_PATH = os.environ['TAGFILEDEV_MEDIA_PATH']
 
 
-output_help = '''usage: tagfile add [-q | --quiet] <media-path>
+output_help = '''usage: tagfile add [-q | --quiet] [--scan] <media-path>
    or: tagfile add [-h | --help]
 
 Add a directory to media paths
 
+Adding a media path only registers it, files are indexed when
+running updatedb. Use `--scan` to index the files in the new
+media path right away.
+
 Options:
 -h, --help   show this help information
 -q, --quiet  print nothing except fatal errors
+--scan       index files in the media path right away
 
 '''
 
@@ -123,7 +129,31 @@ def test_media_path_arg_will_add_path_to_repos_if_valid(capfd):
     cmd.run()
     cap = capfd.readouterr()
     assert output_add_tmp_tagfiletests == cap.out
-    assert tagfile.core.tfman.paths[0].startswith(TAGFILEDEV_MEDIA_PATH)
+    assert Repository.select().where(
+        Repository.filepath == TAGFILEDEV_MEDIA_PATH
+    ).count() == 1
+    # registering a media path does not walk it
+    assert tagfile.core.tfman.paths == []
+
+
+def test_scan_flag_indexes_files_of_new_media_path(capfd):
+    testdir = os.path.join(os.environ['TAGFILEDEV_TESTS_CACHE'], 'add-scan')
+    os.makedirs(testdir, exist_ok=True)
+    with open(os.path.join(testdir, 'file.txt'), 'w') as f:
+        f.write('add --scan\n')
+    cmd = Command(['--scan', testdir])
+    exitcode = cmd.run()
+    cap = capfd.readouterr()
+    assert exitcode == 0
+    assert f'Added media path: {testdir}\n' in cap.out
+    assert Index.select().where(
+        Index.filepath == os.path.join(testdir, 'file.txt')
+    ).count() == 1
+
+    # cleanup
+    os.remove(os.path.join(testdir, 'file.txt'))
+    tagfile.core.tfman.reconcile([testdir])
+    Repository.delete().where(Repository.filepath == testdir).execute()
 
 
 def test_media_path_arg_will_show_error_if_not_exists(capfd):
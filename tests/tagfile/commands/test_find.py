@@ -33,19 +33,24 @@
 import pycommand
 import pytest
 
+import tagfile.core
+import tagfile.search
 from tagfile.commands.find import FindCommand as Command
+from tagfile.models import Category, Index, MimeType
 
 
 output_help = (
     '''usage: tagfile find [--type=TYPE] [--mime=MIMETYPE] [--size-gt=BYTES]
                     [--size-lt=BYTES] [--hash=HEX] [--in-path=STRING]
-                    [--name=NAME | --in-name=STRING] [-H | --show-hash]
+                    [--name=NAME | --in-name=STRING] [--match=QUERY]
+                    [--fuzzy=TEXT] [--limit=N] [-H | --show-hash]
                     [-s | --show-size] [-t | --show-type] [-m | --show-mime]
                     [-a | --show-all] [-S COL | --sort=COL] [--reverse]
 
    or: tagfile find [--type=TYPE] [--mime=MIMETYPE] [--size-gt=BYTES]
                     [--size-lt=BYTES] [--hash=HEX] [--in-path=STRING]
-                    [--name=NAME | --in-name=STRING] [-0 | --print0]
+                    [--name=NAME | --in-name=STRING] [--match=QUERY]
+                    [--fuzzy=TEXT] [--limit=N] [-0 | --print0]
                     [-S COL | --sort=COL] [--reverse]
 
    or: tagfile find [-h | --help]
@@ -62,6 +67,9 @@ Options:
 --in-path=STRING    match absolute paths with a substring of STRING
 --name=NAME         match filenames that are exactly NAME
 --in-name=STRING    match filenames with a substring of STRING
+--match=QUERY       match filenames and paths with a full-text QUERY
+--fuzzy=TEXT        match filenames that look like TEXT, best first
+--limit=N           show no more than N files
 -H, --show-hash     display column with checksum hash
 -s, --show-size     display column with filesizes
 -t, --show-type     display column with MIME type
@@ -71,6 +79,24 @@ Options:
 --reverse           reverse sort order
 -0, --print0        end lines with null instead of newline
 
+Options --in-name, --in-path and --match use a full-text index of
+filenames and paths. Substrings of less than 3 characters are
+matched without the index, which is a lot slower. The index needs
+SQLite 3.34 or newer, without it --match and --fuzzy cannot be
+used.
+
+Option --match accepts the full-text query syntax of SQLite FTS5,
+where each word or "quoted phrase" matches filenames and paths
+that contain it. Combine them with AND, OR, NOT and parentheses
+and limit them to a column with "basename:" or "filepath:", i.e.
+`tagfile find --match='basename: holiday NOT raw'`. Words and
+phrases of less than 3 characters never match with --match.
+
+Option --fuzzy finds filenames that share the most trigrams (parts
+of 3 characters) with TEXT, which tolerates typos and a different
+order of words. The 20 best matches (or --limit) are shown,
+ordered by similarity. Options --sort and --reverse are ignored.
+
 ''')
 
 output_noargs = '''error: command find requires one or more options
@@ -336,3 +362,79 @@ def test_command_help_flag_shows_help_message(capfd):
     cmd.run()
     cap = capfd.readouterr()
     assert output_help == cap.out
+
+
+def test_substrings_and_queries_match_with_full_text_index(capfd):
+    testdir = '/tagfile-find-search'
+    ids = [
+        Index.create(filehash=b'\0', filepath=f'{testdir}/{path}',
+                     basename=path.split('/')[-1], filesize=1,
+                     cat=Category.intern('text'),
+                     mime=MimeType.intern('text/plain')).id
+        for path in ('Holiday/beach.jpg', 'holiday/beach.raw', 'work/ab.txt')
+    ]
+
+    def find(*args):
+        assert Command([*args, '--in-path', testdir]).run() == 0
+        return sorted(capfd.readouterr().out.split())
+
+    try:
+        assert find('--in-name', 'BEACH') == [
+            f'{testdir}/Holiday/beach.jpg', f'{testdir}/holiday/beach.raw',
+        ]
+        assert find('--in-name', 'b.') == [f'{testdir}/work/ab.txt']
+        assert find('--match', 'filepath: holiday NOT raw') == [
+            f'{testdir}/Holiday/beach.jpg',
+        ]
+        assert find('--match', 'basename: beach NOT raw') == [
+            f'{testdir}/Holiday/beach.jpg',
+        ]
+        # terms of less than 3 characters never match
+        assert find('--match', 'ab') == []
+
+        # renamed files are found by their new name only
+        Index.update(filepath=f'{testdir}/work/cd.txt', basename='cd.txt') \
+            .where(Index.id == ids[2]).execute()
+        assert find('--in-name', 'ab.txt') == []
+        assert find('--in-name', 'cd.txt') == [f'{testdir}/work/cd.txt']
+
+        # best matches first, despite a typo and different case
+        assert find('--fuzzy', 'bech.JPG', '--limit', '2') == [
+            f'{testdir}/Holiday/beach.jpg', f'{testdir}/holiday/beach.raw',
+        ]
+        assert Command(['--fuzzy', 'bech.JPG', '--in-path', testdir,
+                        '--limit', '1']).run() == 0
+        assert capfd.readouterr().out == f'{testdir}/Holiday/beach.jpg\n'
+        assert find('--fuzzy', 'cd') == [f'{testdir}/work/cd.txt']
+        assert Command(['--fuzzy', 'beach', '--limit', '0']).run() == 1
+        assert capfd.readouterr().err.startswith('error: option --limit')
+
+        assert Command(['--match', 'holiday AND']).run() == 1
+        assert capfd.readouterr().err.startswith('error: ')
+    finally:
+        tagfile.core.delete_ids(ids)
+    assert find('--in-name', 'beach') == []
+
+
+def test_substrings_match_without_full_text_index(monkeypatch, capfd):
+    testdir = '/tagfile-find-like'
+    ids = [
+        Index.create(filehash=b'\0', filepath=f'{testdir}/{name}',
+                     basename=name, filesize=1,
+                     cat=Category.intern('text'),
+                     mime=MimeType.intern('text/plain')).id
+        for name in ('beach.jpg', 'work.txt')
+    ]
+    # i.e. a database that was created with SQLite older than 3.34
+    monkeypatch.setattr(tagfile.search, 'available', lambda: False)
+    try:
+        assert Command(['--in-name', 'BEACH', '--in-path', testdir]).run() \
+            == 0
+        assert capfd.readouterr().out == f'{testdir}/beach.jpg\n'
+        for option in ('--match', '--fuzzy'):
+            assert Command([option, 'beach']).run() == 1
+            assert capfd.readouterr().err.startswith(
+                f'error: option {option} requires a full-text index'
+            )
+    finally:
+        tagfile.core.delete_ids(ids)
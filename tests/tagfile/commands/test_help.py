@@ -37,7 +37,8 @@ from tagfile.commands.main_cmd import HelpCommand as Command
 
 
 output_help_main = (
-    '''Usage: tagfile [--config <filename>] [--db <name>] <command>
+    '''Usage: tagfile [--config <filename>] [--db <name>] [--profile[=FILE]]
+               [--trace-memory] <command>
    or: tagfile [-h | --help] | [-V | --version]
 
 Search, index and tag your files and find duplicates
@@ -47,6 +48,8 @@ Options:
 --db=<name>          use database <name>, defined in config file
 -h, --help           show this help information
 -V, --version        show version and platform information
+--profile=FILE       run command with cProfile, save to FILE
+--trace-memory       report peak memory usage at exit
 
 Commands:
   add        add a directory to media paths
@@ -55,12 +58,15 @@ Commands:
   help       show help information
   info       show statistics for index and media paths
   list       show all indexed files
+  relocate   move a media path to a new location
   updatedb   scan media paths and index newly added files
   version    show version and platform information
 
 See 'tagfile help <command>' for more information on a
 specific command, before using it.
 
+Without FILE, --profile saves to tagfile.prof in TAGFILE_DATA_HOME.
+
 ''')
 
 output_help_help = '''usage: tagfile help [<command>]
@@ -81,14 +87,19 @@ Options:
 
 '''
 
-output_help_add = '''usage: tagfile add [-q | --quiet] <media-path>
+output_help_add = '''usage: tagfile add [-q | --quiet] [--scan] <media-path>
    or: tagfile add [-h | --help]
 
 Add a directory to media paths
 
+Adding a media path only registers it, files are indexed when
+running updatedb. Use `--scan` to index the files in the new
+media path right away.
+
 Options:
 -h, --help   show this help information
 -q, --quiet  print nothing except fatal errors
+--scan       index files in the media path right away
 
 '''
 
@@ -117,13 +128,15 @@ Options:
 output_help_find = (
     '''usage: tagfile find [--type=TYPE] [--mime=MIMETYPE] [--size-gt=BYTES]
                     [--size-lt=BYTES] [--hash=HEX] [--in-path=STRING]
-                    [--name=NAME | --in-name=STRING] [-H | --show-hash]
+                    [--name=NAME | --in-name=STRING] [--match=QUERY]
+                    [--fuzzy=TEXT] [--limit=N] [-H | --show-hash]
                     [-s | --show-size] [-t | --show-type] [-m | --show-mime]
                     [-a | --show-all] [-S COL | --sort=COL] [--reverse]
 
    or: tagfile find [--type=TYPE] [--mime=MIMETYPE] [--size-gt=BYTES]
                     [--size-lt=BYTES] [--hash=HEX] [--in-path=STRING]
-                    [--name=NAME | --in-name=STRING] [-0 | --print0]
+                    [--name=NAME | --in-name=STRING] [--match=QUERY]
+                    [--fuzzy=TEXT] [--limit=N] [-0 | --print0]
                     [-S COL | --sort=COL] [--reverse]
 
    or: tagfile find [-h | --help]
@@ -140,6 +153,9 @@ Options:
 --in-path=STRING    match absolute paths with a substring of STRING
 --name=NAME         match filenames that are exactly NAME
 --in-name=STRING    match filenames with a substring of STRING
+--match=QUERY       match filenames and paths with a full-text QUERY
+--fuzzy=TEXT        match filenames that look like TEXT, best first
+--limit=N           show no more than N files
 -H, --show-hash     display column with checksum hash
 -s, --show-size     display column with filesizes
 -t, --show-type     display column with MIME type
@@ -149,6 +165,24 @@ Options:
 --reverse           reverse sort order
 -0, --print0        end lines with null instead of newline
 
+Options --in-name, --in-path and --match use a full-text index of
+filenames and paths. Substrings of less than 3 characters are
+matched without the index, which is a lot slower. The index needs
+SQLite 3.34 or newer, without it --match and --fuzzy cannot be
+used.
+
+Option --match accepts the full-text query syntax of SQLite FTS5,
+where each word or "quoted phrase" matches filenames and paths
+that contain it. Combine them with AND, OR, NOT and parentheses
+and limit them to a column with "basename:" or "filepath:", i.e.
+`tagfile find --match='basename: holiday NOT raw'`. Words and
+phrases of less than 3 characters never match with --match.
+
+Option --fuzzy finds filenames that share the most trigrams (parts
+of 3 characters) with TEXT, which tolerates typos and a different
+order of words. The 20 best matches (or --limit) are shown,
+ordered by similarity. Options --sort and --reverse are ignored.
+
 ''')
 
 output_help_info = '''usage: tagfile info [-C | --show-config]
@@ -188,9 +222,29 @@ Options:
 
 ''')
 
+output_help_relocate = (
+    '''usage: tagfile relocate [-q | --quiet] <id> <new-root>
+   or: tagfile relocate [-h | --help]
+
+Move a media path to a new location, like another mount point
+
+Use this when a disk is mounted at a different location or a
+directory is moved. The index entries of the media path keep
+their checksums, so no files are pruned or hashed again.
+See tagfile info for an overview of paths/ID's.
+
+Options:
+-h, --help   show this help information
+-q, --quiet  print nothing except fatal errors
+
+''')
+
 output_help_updatedb = (
     '''usage: tagfile updatedb [-v, --verbose] [-q, --quiet] [--prune] [--scan]
-                        [-n ID, --path-id=ID]
+                        [-n ID, --path-id=ID] [--stats-json=FILE]
+
+   or: tagfile updatedb [-v, --verbose] [-q, --quiet] [--retry-errors]
+                        [--stats-json=FILE]
 
    or: tagfile updatedb [-h | --help]
 
@@ -210,9 +264,27 @@ Options:
 --prune              prune removed files only; don't scan
 --scan               scan for new files only; don't prune
 -n ID, --path-id=ID  prune/scan only files in path with this id
-
-When no options are specified, updatedb will both scan and prune.
-It will always prune deleted files before scanning for new files.
+--stats-json=FILE    write scan statistics as JSON to FILE
+--retry-errors       retry files that had errors before
+
+When no options are specified, updatedb will both scan and prune
+in a single pass, by walking each media path in sorted order and
+comparing it with the index. Files with a changed size or
+modification time are hashed again. Files that are moved or
+renamed within the same filesystem are recognized by device,
+inode, size and modification time and updated in place, without
+hashing them again.
+
+Media paths on a disk or network share that is not mounted are
+skipped and reported as offline, instead of pruning their files.
+Media paths that are nested in or an alias of another media path
+(i.e. by a symlink or bind mount) are skipped as well, since
+their files are walked as part of the other media path. Files
+indexed under the path of an alias are moved to the real path.
+
+Files that cannot be read are kept in a journal of errors and
+can be retried with `--retry-errors`. The delay before retrying
+a file doubles after each failed attempt.
 
 ''')
 
@@ -315,6 +387,13 @@ def test_command_arg_list_shows_help_message(capfd):
     assert output_help_list == cap.out
 
 
+def test_command_arg_relocate_shows_help_message(capfd):
+    cmd = Command(['relocate'])
+    cmd.run()
+    cap = capfd.readouterr()
+    assert output_help_relocate == cap.out
+
+
 def test_command_arg_updatedb_shows_help_message(capfd):
     cmd = Command(['updatedb'])
     cmd.run()
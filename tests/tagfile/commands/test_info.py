@@ -61,6 +61,7 @@ INDEX
 database name   main
 files indexed   0
 duplicate files 0
+wasted space    0B
 
 MEDIA PATHS (1):
 {TAGFILEDEV_MEDIA_PATH} (id=1)
@@ -37,7 +37,8 @@ from tagfile.commands.main_cmd import Command
 
 
 output_help = (
-    '''Usage: tagfile [--config <filename>] [--db <name>] <command>
+    '''Usage: tagfile [--config <filename>] [--db <name>] [--profile[=FILE]]
+               [--trace-memory] <command>
    or: tagfile [-h | --help] | [-V | --version]
 
 Search, index and tag your files and find duplicates
@@ -47,6 +48,8 @@ Options:
 --db=<name>          use database <name>, defined in config file
 -h, --help           show this help information
 -V, --version        show version and platform information
+--profile=FILE       run command with cProfile, save to FILE
+--trace-memory       report peak memory usage at exit
 
 Commands:
   add        add a directory to media paths
@@ -55,12 +58,15 @@ Commands:
   help       show help information
   info       show statistics for index and media paths
   list       show all indexed files
+  relocate   move a media path to a new location
   updatedb   scan media paths and index newly added files
   version    show version and platform information
 
 See 'tagfile help <command>' for more information on a
 specific command, before using it.
 
+Without FILE, --profile saves to tagfile.prof in TAGFILE_DATA_HOME.
+
 ''')
 
 output_noargs = output_help
@@ -0,0 +1,182 @@
+# file: tests/tagfile/commands/test_relocate.py
+
+# Copyright (c) 2015-2023 Benjamin Althues <benjamin@babab.nl>
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+# contributors may be used to endorse or promote products derived from this
+# software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import os
+
+import tagfile.core
+from tagfile.commands.relocate import RelocateCommand as Command
+from tagfile.models import Index, Repository
+
+TAGFILEDEV_TESTS_CACHE = os.environ['TAGFILEDEV_TESTS_CACHE']
+
+
+output_help = '''usage: tagfile relocate [-q | --quiet] <id> <new-root>
+   or: tagfile relocate [-h | --help]
+
+Move a media path to a new location, like another mount point
+
+Use this when a disk is mounted at a different location or a
+directory is moved. The index entries of the media path keep
+their checksums, so no files are pruned or hashed again.
+See tagfile info for an overview of paths/ID's.
+
+Options:
+-h, --help   show this help information
+-q, --quiet  print nothing except fatal errors
+
+'''
+
+output_noargs = '''error: command relocate requires 2 arguments
+
+{}'''.format(output_help)
+
+
+def test_command_help_flag_shows_help_message(capfd):
+    cmd = Command(['-h'])
+    cmd.run()
+    cap = capfd.readouterr()
+    assert output_help == cap.out
+
+
+def test_command_shows_message_when_no_args(capfd):
+    cmd = Command([])
+    exitcode = cmd.run()
+    cap = capfd.readouterr()
+    assert exitcode == 1
+    assert cap.out == ''
+    assert cap.err == output_noargs
+
+
+def test_unknown_id_and_missing_directory_are_errors(capfd):
+    assert Command(['999999', TAGFILEDEV_TESTS_CACHE]).run() == 2
+    assert Command(['not-an-id', TAGFILEDEV_TESTS_CACHE]).run() == 2
+    repo = Repository.create(filepath='/tagfile/OhhcJ11KPwWqfLb4')
+    assert Command([str(repo.id), '/tagfile/doesnotexist']).run() == 3
+    repo.delete_instance()
+    capfd.readouterr()
+
+
+def test_relocate_keeps_entries_without_rehashing(capfd):
+    olddir = os.path.join(TAGFILEDEV_TESTS_CACHE, 'relocate-old')
+    newdir = os.path.join(TAGFILEDEV_TESTS_CACHE, 'relocate-new')
+    os.makedirs(os.path.join(olddir, 'sub'), exist_ok=True)
+    with open(os.path.join(olddir, 'sub', 'file.txt'), 'w') as f:
+        f.write('relocated\n')
+    repo = Repository.create(filepath=olddir)
+    tagfile.core.tfman.reconcile([olddir])
+    row = Index.get(Index.filepath == os.path.join(olddir, 'sub/file.txt'))
+    assert row.repo.id == repo.id
+
+    os.rename(olddir, newdir)
+    exitcode = Command([str(repo.id), newdir]).run()
+    cap = capfd.readouterr()
+    assert exitcode == 0
+    assert f'to {newdir}, updated 1 indexed files' in cap.out
+    moved = Index.get_by_id(row.id)
+    assert moved.filepath == os.path.join(newdir, 'sub/file.txt')
+    assert moved.filehash == row.filehash
+    assert Repository.get_by_id(repo.id).filepath == newdir
+
+    # cleanup
+    os.remove(os.path.join(newdir, 'sub', 'file.txt'))
+    tagfile.core.tfman.reconcile([newdir])
+    repo.delete_instance()
+
+
+def test_relocate_moves_nested_media_paths_along(capfd):
+    olddir = os.path.join(TAGFILEDEV_TESTS_CACHE, 'relocate-outer-old')
+    newdir = os.path.join(TAGFILEDEV_TESTS_CACHE, 'relocate-outer-new')
+    os.makedirs(os.path.join(olddir, 'inner'), exist_ok=True)
+    for name in ('outer.txt', 'inner/inner.txt'):
+        with open(os.path.join(olddir, name), 'w') as f:
+            f.write(f'{name}\n')
+    inner = Repository.create(filepath=os.path.join(olddir, 'inner'))
+    tagfile.core.tfman.reconcile([inner.filepath])
+    repo = Repository.create(filepath=olddir)
+    tagfile.core.tfman.reconcile([olddir])
+
+    os.rename(olddir, newdir)
+    exitcode = Command([str(repo.id), newdir]).run()
+    cap = capfd.readouterr()
+    assert exitcode == 0
+    assert 'updated 2 indexed files' in cap.out
+    assert f'(id={inner.id}) to {newdir}/inner' in cap.out
+    assert Repository.get_by_id(inner.id).filepath == \
+        os.path.join(newdir, 'inner')
+    rows = Index.select().where(Index.filepath.startswith(newdir + '/'))
+    assert sorted((i.basename, i.repo_id) for i in rows) == [
+        ('inner.txt', inner.id), ('outer.txt', repo.id),
+    ]
+    assert not Index.select().where(
+        Index.filepath.startswith(olddir + '/')
+    ).exists()
+
+    # cleanup
+    for name in ('outer.txt', 'inner/inner.txt'):
+        os.remove(os.path.join(newdir, name))
+    tagfile.core.tfman.reconcile([newdir])
+    inner.delete_instance()
+    repo.delete_instance()
+
+
+def test_relocate_into_directory_indexed_elsewhere_is_an_error(capfd):
+    olddir = os.path.join(TAGFILEDEV_TESTS_CACHE, 'relocate-src')
+    newdir = os.path.join(TAGFILEDEV_TESTS_CACHE, 'relocate-dst')
+    for dirpath in (olddir, newdir):
+        os.makedirs(dirpath, exist_ok=True)
+        with open(os.path.join(dirpath, 'file.txt'), 'w') as f:
+            f.write(f'{dirpath}\n')
+    repo = Repository.create(filepath=olddir)
+    other = Repository.create(filepath=newdir)
+    tagfile.core.tfman.reconcile([olddir, newdir])
+    capfd.readouterr()
+
+    other.filepath = os.path.join(TAGFILEDEV_TESTS_CACHE, 'relocate-gone')
+    other.save()
+    exitcode = Command([str(repo.id), newdir]).run()
+    cap = capfd.readouterr()
+    assert exitcode == 5
+    assert 'error: 1 files below' in cap.err
+    assert Repository.get_by_id(repo.id).filepath == olddir
+    assert Index.select().where(
+        Index.filepath == os.path.join(olddir, 'file.txt')
+    ).exists()
+
+    # cleanup
+    other.filepath = newdir
+    other.save()
+    for dirpath in (olddir, newdir):
+        os.remove(os.path.join(dirpath, 'file.txt'))
+    tagfile.core.tfman.reconcile([olddir, newdir])
+    other.delete_instance()
+    repo.delete_instance()
+    capfd.readouterr()
@@ -30,16 +30,24 @@
 
 # SPDX-License-Identifier: BSD-3-Clause
 
+import json
+import os
+
 import pycommand
 import pytest
 
+import tagfile.core
 import tagfile.output
 from tagfile.commands.updatedb import UpdateDbCommand as Command
+from tagfile.models import Category, Index, MimeType, Repository
 
 
 output_help = (
     '''usage: tagfile updatedb [-v, --verbose] [-q, --quiet] [--prune] [--scan]
-                        [-n ID, --path-id=ID]
+                        [-n ID, --path-id=ID] [--stats-json=FILE]
+
+   or: tagfile updatedb [-v, --verbose] [-q, --quiet] [--retry-errors]
+                        [--stats-json=FILE]
 
    or: tagfile updatedb [-h | --help]
 
@@ -59,9 +67,27 @@ Options:
 --prune              prune removed files only; don't scan
 --scan               scan for new files only; don't prune
 -n ID, --path-id=ID  prune/scan only files in path with this id
-
-When no options are specified, updatedb will both scan and prune.
-It will always prune deleted files before scanning for new files.
+--stats-json=FILE    write scan statistics as JSON to FILE
+--retry-errors       retry files that had errors before
+
+When no options are specified, updatedb will both scan and prune
+in a single pass, by walking each media path in sorted order and
+comparing it with the index. Files with a changed size or
+modification time are hashed again. Files that are moved or
+renamed within the same filesystem are recognized by device,
+inode, size and modification time and updated in place, without
+hashing them again.
+
+Media paths on a disk or network share that is not mounted are
+skipped and reported as offline, instead of pruning their files.
+Media paths that are nested in or an alias of another media path
+(i.e. by a symlink or bind mount) are skipped as well, since
+their files are walked as part of the other media path. Files
+indexed under the path of an alias are moved to the real path.
+
+Files that cannot be read are kept in a journal of errors and
+can be retried with `--retry-errors`. The delay before retrying
+a file doubles after each failed attempt.
 
 ''')
 
@@ -175,3 +201,69 @@ def test_verbose_flag_sets_output_flags_for_consoles():
     # reset to default value
     tagfile.output.settings.verbose = False
     assert tagfile.output.settings.verbose is False
+
+
+def test_stats_json_flag_writes_statistics_of_scan():
+    filepath = os.path.join(os.environ['TAGFILEDEV_TESTS_CACHE'],
+                            'updatedb-stats.json')
+    cmd = Command(['--scan', '-q', f'--stats-json={filepath}'])
+    exitcode = cmd.run()
+    tagfile.output.settings.quiet = False
+    assert exitcode == 0
+    with open(filepath) as fh:
+        data = json.load(fh)
+    assert data['files']['total'] > 0
+    assert 'hash' in data['seconds']
+    assert 'mb_per_second' in data
+
+
+def test_default_updatedb_reconciles_in_a_single_pass():
+    filepath = os.path.join(os.environ['TAGFILEDEV_TESTS_CACHE'],
+                            'updatedb-reconcile.json')
+    cmd = Command(['-q', f'--stats-json={filepath}'])
+    exitcode = cmd.run()
+    tagfile.output.settings.quiet = False
+    assert exitcode == 0
+    with open(filepath) as fh:
+        data = json.load(fh)
+    assert data['files']['total'] > 0
+    assert data['files']['removed'] == 0
+    assert data['files']['new'] + data['files']['existing'] > 0
+
+
+def test_entries_of_offline_media_path_inside_another_are_kept(capfd):
+    testdir = os.path.join(os.environ['TAGFILEDEV_TESTS_CACHE'], 'usbdata')
+    os.makedirs(f'{testdir}/usb', exist_ok=True)  # empty mount point
+    with open(f'{testdir}/a.txt', 'w') as f:
+        f.write('online\n')
+    outer = Repository.create(filepath=testdir)
+    usb = Repository.create(filepath=f'{testdir}/usb', volume='uuid:other')
+    Index.create(filehash=b'\0', filepath=f'{testdir}/usb/b.txt',
+                 basename='b.txt', filesize=1,
+                 cat=Category.intern('text'),
+                 mime=MimeType.intern('text/plain'))
+
+    for args in ([], ['--path-id', str(outer.id)]):
+        assert Command(args).run() == 0
+        assert Index.select().where(
+            Index.filepath == f'{testdir}/usb/b.txt'
+        ).exists()
+        capfd.readouterr()
+    assert Index.select().where(
+        Index.filepath == f'{testdir}/a.txt'
+    ).exists()
+
+    # cleanup
+    usb.delete_instance()
+    outer.delete_instance()
+    os.remove(f'{testdir}/a.txt')
+    tagfile.core.prune(path_filter=testdir)
+    capfd.readouterr()
+
+
+def test_retry_errors_flag_without_errors_in_journal(capfd):
+    cmd = Command(['--retry-errors'])
+    exitcode = cmd.run()
+    cap = capfd.readouterr()
+    assert exitcode == 0
+    assert cap.out == 'No files with errors are due for a retry.\n'
@@ -100,3 +100,23 @@ def test_configuration_method_load_configfile_error_when_exists():
     obj.set_paths(_testconfigpath, 'custom.toml')
     obj.load_configfile()
     obj.cfg = _defaultconfigdict
+
+
+def test_configuration_validates_database_tables():
+    obj = config.Configuration()
+    cfg = tomllib.loads(config.defaultconfig)
+    cfg['databases']['archive'] = {
+        'path': '~/archive.db',
+        'profile': 'safe',
+        'pragmas': {'mmap_size': 0},
+    }
+    obj.validate(cfg)
+
+    cfg['databases']['archive']['profile'] = 'fast'
+    with pytest.raises(common.ConfigError):
+        obj.validate(cfg)
+
+    cfg['databases']['archive']['profile'] = 'safe'
+    cfg['databases']['archive']['pragmas'] = {'journal_mode': 0}
+    with pytest.raises(common.ConfigError):
+        obj.validate(cfg)
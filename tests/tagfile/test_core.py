@@ -30,7 +30,9 @@
 
 # SPDX-License-Identifier: BSD-3-Clause
 
+import datetime
 import os
+import threading
 
 import pytest
 
@@ -38,12 +40,19 @@ import tagfile
 import tagfile.common
 import tagfile.core
 import tagfile.files
+from tagfile.models import (
+    Category,
+    DupGroup,
+    Index,
+    MimeType,
+    Repository,
+    ScanError,
+)
 
 
 output_prune_with_path_filter = '''PRUNING
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━{whitespace}
 DONE. 0 files were removed from the index.
-'''.format(whitespace='   ')
+'''
 
 
 # testing workings before init() step
@@ -90,3 +99,563 @@ def test_prune_with_path_filter(capfd):
     cap = capfd.readouterr()
     assert cap.out == output_prune_with_path_filter
     assert cap.err == ''
+
+
+def test_moved_file_is_updated_in_place_without_rehashing(capfd):
+    tfman = tagfile.core.tfman
+    testdir = os.path.join(os.environ['TAGFILEDEV_TESTS_CACHE'], 'moves')
+    os.makedirs(testdir, exist_ok=True)
+    oldpath = os.path.join(testdir, 'before.txt')
+    newpath = os.path.join(testdir, 'after.txt')
+    with open(oldpath, 'w') as f:
+        f.write('moved file\n')
+
+    tfman.reconcile([testdir])
+    row = Index.get(Index.filepath == oldpath)
+
+    os.rename(oldpath, newpath)
+    stats = tfman.reconcile([testdir])
+    assert (stats.moved, stats.new, stats.removed) == (1, 0, 0)
+
+    moved = Index.get(Index.filepath == newpath)
+    assert moved.id == row.id
+    assert moved.inode == os.stat(newpath).st_ino
+
+    # entries that were indexed without an identity get one, so their
+    # files are recognized when they are moved later on
+    Index.update(device=None, inode=None, mtime_ns=None).where(
+        Index.id == row.id
+    ).execute()
+    stats = tfman.reconcile([testdir])
+    assert (stats.existing, stats.new, stats.changed) == (1, 0, 0)
+    os.rename(newpath, oldpath)
+    assert tfman.reconcile([testdir]).moved == 1
+    os.rename(oldpath, newpath)
+    tfman.reconcile([testdir])
+    moved = Index.get(Index.filepath == newpath)
+    assert moved.id == row.id
+    assert moved.basename == 'after.txt'
+    assert moved.filehash == row.filehash
+    cap = capfd.readouterr()
+    assert 'Moved/renamed              1' in cap.out
+
+    # cleanup
+    os.remove(newpath)
+    tfman.reconcile([testdir])
+    assert Index.select().where(Index.filepath == newpath).count() == 0
+
+
+def test_prune_deletes_missing_files_in_chunks(capfd, monkeypatch):
+    monkeypatch.setattr(tagfile.core, 'DELETE_CHUNK_SIZE', 3)
+    testdir = os.path.join(os.environ['TAGFILEDEV_TESTS_CACHE'], 'gone')
+    os.makedirs(testdir, exist_ok=True)
+    for n in range(7):
+        Index.create(filehash='0' * 40, filepath=f'{testdir}/{n}.txt',
+                     basename=f'{n}.txt', filesize=1,
+                     cat=Category.intern('text'),
+                     mime=MimeType.intern('text/plain'))
+    capfd.readouterr()
+
+    tagfile.core.prune(path_filter=testdir)
+    cap = capfd.readouterr()
+    assert 'DONE. 7 files were removed from the index (' in cap.out
+    assert 'deletes/s).' in cap.out
+    assert Index.select().where(
+        Index.filepath.startswith(testdir)
+    ).count() == 0
+
+
+def test_delete_ids_returns_number_of_deleted_rows():
+    assert tagfile.core.delete_ids([]) == 0
+    assert tagfile.core.delete_ids([-1, -2]) == 0
+
+
+def test_prune_checks_existence_in_chunks_with_threads(capfd, monkeypatch):
+    monkeypatch.setitem(tagfile.cfg['prune'], 'chunk-size', 2)
+    monkeypatch.setitem(tagfile.cfg['prune'], 'workers', 3)
+    testdir = os.path.join(os.environ['TAGFILEDEV_TESTS_CACHE'], 'chunks')
+    os.makedirs(testdir, exist_ok=True)
+    for n in range(5):
+        filepath = f'{testdir}/{n}.txt'
+        if n % 2:
+            with open(filepath, 'w') as f:
+                f.write('exists\n')
+        Index.create(filehash='0' * 40, filepath=filepath,
+                     basename=f'{n}.txt', filesize=1,
+                     cat=Category.intern('text'),
+                     mime=MimeType.intern('text/plain'))
+
+    chunks = list(tagfile.core._index_chunks(testdir, chunk_size=2))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+
+    tagfile.core.prune(path_filter=testdir)
+    cap = capfd.readouterr()
+    assert 'DONE. 3 files were removed from the index (' in cap.out
+    res = Index.select().where(Index.filepath.startswith(testdir))
+    assert sorted(i.basename for i in res) == ['1.txt', '3.txt']
+
+    # cleanup
+    for n in (1, 3):
+        os.remove(f'{testdir}/{n}.txt')
+    tagfile.core.prune(path_filter=testdir)
+    assert res.count() == 0
+
+
+def test_reconcile_adds_changes_moves_and_removes_in_one_pass(capfd):
+    tfman = tagfile.core.tfman
+    testdir = os.path.join(os.environ['TAGFILEDEV_TESTS_CACHE'], 'reconcile')
+    os.makedirs(os.path.join(testdir, 'sub'), exist_ok=True)
+
+    def write(name, text):
+        with open(os.path.join(testdir, name), 'w') as f:
+            f.write(text)
+
+    write('keep.txt', 'keep\n')
+    write('change.txt', 'before\n')
+    write('sub/move.txt', 'move\n')
+    write('sub/remove.txt', 'remove\n')
+    stats = tfman.reconcile([testdir])
+    assert stats.new == 4
+
+    write('change.txt', 'after the change\n')
+    os.rename(os.path.join(testdir, 'sub/move.txt'),
+              os.path.join(testdir, 'moved.txt'))
+    os.remove(os.path.join(testdir, 'sub/remove.txt'))
+    write('sub/new.txt', 'new\n')
+    stats = tfman.reconcile([testdir])
+    assert (stats.existing, stats.changed, stats.moved, stats.removed,
+            stats.new) == (1, 1, 1, 1, 1)
+
+    res = Index.select().where(Index.filepath.startswith(testdir))
+    assert sorted(i.filepath[len(testdir):] for i in res) == [
+        '/change.txt', '/keep.txt', '/moved.txt', '/sub/new.txt',
+    ]
+    changed = Index.get(Index.filepath == os.path.join(testdir,
+                                                       'change.txt'))
+    assert changed.filesize == len('after the change\n')
+    cap = capfd.readouterr()
+    assert 'Changed                    1' in cap.out
+    assert 'Removed                    1' in cap.out
+
+    # cleanup
+    for name in ('keep.txt', 'change.txt', 'moved.txt', 'sub/new.txt'):
+        os.remove(os.path.join(testdir, name))
+    stats = tfman.reconcile([testdir])
+    assert stats.removed == 4
+    assert res.count() == 0
+
+
+def test_reconcile_moves_and_removes_all_hardlinks(capfd):
+    tfman = tagfile.core.tfman
+    testdir = os.path.join(os.environ['TAGFILEDEV_TESTS_CACHE'], 'hardlinks')
+    os.makedirs(f'{testdir}/a', exist_ok=True)
+    with open(f'{testdir}/a/x1', 'w') as f:
+        f.write('linked\n')
+    os.link(f'{testdir}/a/x1', f'{testdir}/a/x2')
+    assert tfman.reconcile([testdir]).new == 2
+
+    # hardlinks have the same identity, each one is moved once
+    os.rename(f'{testdir}/a', f'{testdir}/b')
+    stats = tfman.reconcile([testdir])
+    assert (stats.moved, stats.new, stats.removed) == (2, 0, 0)
+
+    # cleanup
+    os.remove(f'{testdir}/b/x1')
+    os.remove(f'{testdir}/b/x2')
+    assert tfman.reconcile([testdir]).removed == 2
+    assert Index.select().where(
+        Index.filepath.startswith(testdir)
+    ).count() == 0
+
+
+def test_prune_removes_missing_directory_with_range_delete(
+    capfd, monkeypatch
+):
+    checked = []
+
+    def exists(filepath):
+        checked.append(filepath)
+        return os.path.lexists(filepath)
+
+    monkeypatch.setattr(tagfile.core.os.path, 'exists', exists)
+    monkeypatch.setitem(tagfile.cfg['prune'], 'chunk-size', 2)
+    monkeypatch.setitem(tagfile.cfg['prune'], 'workers', 1)
+    testdir = os.path.join(os.environ['TAGFILEDEV_TESTS_CACHE'], 'subtree')
+    os.makedirs(testdir, exist_ok=True)
+    filepaths = [f'{testdir}/deleted/dir/{n}.txt' for n in range(6)]
+    filepaths.append(f'{testdir}/deleted-not.txt')
+    for filepath in filepaths:
+        Index.create(filehash='0' * 40, filepath=filepath,
+                     basename=os.path.basename(filepath), filesize=1,
+                     cat=Category.intern('text'),
+                     mime=MimeType.intern('text/plain'))
+    capfd.readouterr()
+
+    tagfile.core.prune(path_filter=testdir)
+    cap = capfd.readouterr()
+    assert 'DONE. 7 files were removed from the index (' in cap.out
+    assert '1 missing directories were removed as a whole.' in cap.out
+    # only the rows in the first chunk (ordered by filepath) are checked
+    checked = [path for path in checked if path.startswith(testdir + '/')]
+    assert sorted(checked) == sorted(filepaths[:1] + filepaths[-1:])
+    assert Index.select().where(
+        Index.filepath.startswith(testdir)
+    ).count() == 0
+
+
+def test_prune_checks_directories_of_missing_files_once_in_pool(
+    capfd, monkeypatch
+):
+    calls = []
+    missing_subtree = tagfile.core._missing_subtree
+
+    def checked_subtree(filepath, path_filter=None):
+        calls.append((filepath, threading.current_thread()))
+        return missing_subtree(filepath, path_filter)
+
+    monkeypatch.setattr(tagfile.core, '_missing_subtree', checked_subtree)
+    testdir = os.path.join(os.environ['TAGFILEDEV_TESTS_CACHE'], 'dirsonce')
+    os.makedirs(testdir, exist_ok=True)
+    filepaths = [f'{testdir}/{n}.txt' for n in range(4)]
+    filepaths += [f'{testdir}/deleted/{n}.txt' for n in range(4)]
+    for filepath in filepaths:
+        Index.create(filehash='0' * 40, filepath=filepath,
+                     basename=os.path.basename(filepath), filesize=1,
+                     cat=Category.intern('text'),
+                     mime=MimeType.intern('text/plain'))
+
+    tagfile.core.prune(path_filter=testdir)
+    assert sorted(path for path, _ in calls) == [filepaths[0], filepaths[4]]
+    assert threading.main_thread() not in [thread for _, thread in calls]
+    assert Index.select().where(
+        Index.filepath.startswith(testdir)
+    ).count() == 0
+
+
+def test_missing_subtree_is_topmost_missing_directory():
+    testdir = os.environ['TAGFILEDEV_TESTS_CACHE']
+    missing = tagfile.core._missing_subtree
+    assert missing(f'{testdir}/x.txt') is None
+    assert missing(f'{testdir}/a/b/c/x.txt') == f'{testdir}/a'
+    assert missing(f'{testdir}/a/b/c/x.txt',
+                   path_filter=f'{testdir}/a/b') == f'{testdir}/a/b'
+
+
+def test_offline_media_paths_are_skipped_by_prune(capfd):
+    testdir = os.path.join(os.environ['TAGFILEDEV_TESTS_CACHE'], 'offline')
+    os.makedirs(testdir, exist_ok=True)
+    online = Repository.create(filepath=testdir)
+    offline = Repository.create(filepath=f'{testdir}/not-mounted')
+    other_volume = Repository.create(filepath=testdir, volume='uuid:other')
+    # the device name that was recorded before is not compared
+    device_name = Repository.create(filepath=testdir, volume='ext4:/dev/sdz9',
+                                    device=os.stat(testdir).st_dev)
+    Index.create(filehash='0' * 40, filepath=f'{testdir}/not-mounted/a',
+                 basename='a', filesize=1, cat=Category.intern('text'),
+                 mime=MimeType.intern('text/plain'))
+
+    assert tagfile.core.is_offline(online) is False
+    assert online.device == os.stat(testdir).st_dev
+    assert tagfile.core.is_offline(offline) is True
+    assert tagfile.core.is_offline(other_volume) is True
+    assert tagfile.core.is_offline(device_name) is False
+
+    query = Repository.select().where(
+        Repository.id << [online.id, offline.id]
+    )
+    capfd.readouterr()
+    online_paths, offline_paths = tagfile.core.media_paths(query)
+    assert [r.id for r in online_paths] == [online.id]
+    assert [r.id for r in offline_paths] == [offline.id]
+    tagfile.core.prune(exclude=[offline.filepath])
+    cap = capfd.readouterr()
+    assert f'skipped {testdir}/not-mounted (id={offline.id})' in cap.out
+    assert Index.select().where(
+        Index.filepath == f'{testdir}/not-mounted/a'
+    ).count() == 1
+
+    # cleanup
+    for repo in (online, offline, other_volume, device_name):
+        repo.delete_instance()
+    tagfile.core.prune(path_filter=testdir)
+
+
+def test_overlapping_media_paths_are_walked_once(capfd):
+    testdir = os.path.join(os.environ['TAGFILEDEV_TESTS_CACHE'], 'overlap')
+    os.makedirs(f'{testdir}/photos', exist_ok=True)
+    if not os.path.islink(f'{testdir}-alias'):
+        os.symlink(testdir, f'{testdir}-alias')
+    # the symlink is added first, the real path is kept anyway
+    alias = Repository.create(filepath=f'{testdir}-alias')
+    outer = Repository.create(filepath=testdir)
+    nested = Repository.create(filepath=f'{testdir}/photos')
+    nested_alias = Repository.create(filepath=f'{testdir}-alias/photos')
+    repos = [alias, outer, nested, nested_alias]
+
+    redundant = tagfile.core.overlapping(repos)
+    assert redundant == {
+        nested.id: ('nested', outer),
+        alias.id: ('alias', outer),
+        nested_alias.id: ('nested', outer),
+    }
+    # entries indexed under an alias are moved to the real path
+    for filepath in (f'{testdir}-alias/x.txt', f'{testdir}-alias/photos/y.txt',
+                     f'{testdir}/photos/y.txt'):
+        Index.create(filehash=b'\x00', filepath=filepath,
+                     basename=os.path.basename(filepath), filesize=1,
+                     cat=Category.intern('text'),
+                     mime=MimeType.intern('text/plain'))
+    query = Repository.select().where(Repository.id << [r.id for r in repos])
+    capfd.readouterr()
+    online, offline = tagfile.core.media_paths(query)
+    assert [r.id for r in online] == [outer.id]
+    cap = capfd.readouterr()
+    assert 'OVERLAPPING MEDIA PATHS' in cap.out
+    assert (f'skipped {testdir}-alias (id={alias.id}), alias of {testdir} '
+            f'(id={outer.id})') in cap.out
+    assert f'moved 1 files indexed under {testdir}-alias to' in cap.out
+    assert f'removed 1 files indexed under {testdir}-alias twice' in cap.out
+    rows = Index.select().where(Index.filepath.startswith(testdir))
+    assert sorted((i.filepath, i.repo_id) for i in rows) == [
+        (f'{testdir}/photos/y.txt', None),
+        (f'{testdir}/x.txt', outer.id),
+    ]
+    Index.delete().where(Index.id << [i.id for i in rows]).execute()
+
+    # cleanup
+    for repo in repos:
+        repo.delete_instance()
+    os.remove(f'{testdir}-alias')
+
+
+def test_reconcile_walks_nested_media_paths_on_their_own(capfd):
+    testdir = os.path.join(os.environ['TAGFILEDEV_TESTS_CACHE'], 'mounted')
+    os.makedirs(f'{testdir}/mnt', exist_ok=True)
+    for name in ('a.txt', 'mnt/b.txt'):
+        with open(f'{testdir}/{name}', 'w') as f:
+            f.write(f'{name}\n')
+
+    # i.e. another filesystem mounted at mnt, so not left out as nested
+    stats = tagfile.core.tfman.reconcile([testdir, f'{testdir}/mnt'])
+    assert stats.new == 2
+    stats = tagfile.core.tfman.reconcile([testdir, f'{testdir}/mnt'])
+    assert (stats.new, stats.removed, stats.existing) == (0, 0, 2)
+
+    # cleanup
+    for name in ('a.txt', 'mnt/b.txt'):
+        os.remove(f'{testdir}/{name}')
+    tagfile.core.tfman.reconcile([testdir])
+    capfd.readouterr()
+
+
+def test_special_files_are_skipped_and_counted(capfd):
+    testdir = os.path.join(os.environ['TAGFILEDEV_TESTS_CACHE'], 'special')
+    os.makedirs(testdir, exist_ok=True)
+    fifo = os.path.join(testdir, 'fifo')
+    os.mkfifo(fifo)
+
+    stats = tagfile.core.tfman.reconcile([testdir])
+    assert stats.special == 1
+    assert stats.new == 0
+    cap = capfd.readouterr()
+    assert 'Special files              1' in cap.out
+
+    tagfile.core.tfman.paths = [fifo]
+    stats = tagfile.core.tfman.scan()
+    tagfile.core.tfman.paths = []
+    assert stats.special == 1
+    assert Index.select().where(Index.filepath == fifo).count() == 0
+    os.remove(fifo)
+
+
+def test_errors_do_not_abort_scan_and_are_retried_later(capfd, monkeypatch):
+    tfman = tagfile.core.tfman
+    testdir = os.path.join(os.environ['TAGFILEDEV_TESTS_CACHE'], 'errors')
+    os.makedirs(testdir, exist_ok=True)
+    paths = [os.path.join(testdir, f'{n}.txt') for n in range(3)]
+    for path in paths:
+        with open(path, 'w') as f:
+            f.write(f'{path}\n')
+    hashfile = tagfile.files.hashfile
+
+    def failing_hashfile(filepath):
+        if filepath == paths[0]:
+            raise PermissionError(13, 'Permission denied', filepath)
+        return hashfile(filepath)
+
+    monkeypatch.setattr(tagfile.files, 'hashfile', failing_hashfile)
+    stats = tfman.reconcile([testdir])
+    assert stats.err_permission == 1
+    assert stats.new == 2
+    err = ScanError.get(ScanError.filepath == paths[0])
+    assert (err.error, err.count) == ('PermissionError', 1)
+    cap = capfd.readouterr()
+    assert 'tagfile updatedb --retry-errors' in cap.out
+
+    # not due yet: nothing is retried
+    assert tfman.retry_errors() is None
+    monkeypatch.setattr(tagfile.core, 'RETRY_DELAY', 0)
+    stats = tfman.retry_errors()
+    assert stats.err_permission == 1
+    assert ScanError.get(ScanError.filepath == paths[0]).count == 2
+
+    monkeypatch.setattr(tagfile.files, 'hashfile', hashfile)
+    stats = tfman.retry_errors()
+    assert stats.new == 1
+    assert ScanError.select().count() == 0
+
+    # cleanup
+    for path in paths:
+        os.remove(path)
+    tfman.paths = []
+    tfman.reconcile([testdir])
+
+
+def test_retry_errors_hashes_changed_files_again(capfd, monkeypatch):
+    tfman = tagfile.core.tfman
+    testdir = os.path.join(os.environ['TAGFILEDEV_TESTS_CACHE'], 'retry')
+    os.makedirs(testdir, exist_ok=True)
+    path = os.path.join(testdir, 'changed.txt')
+    with open(path, 'w') as f:
+        f.write('before\n')
+    tfman.reconcile([testdir])
+    row = Index.get(Index.filepath == path)
+    with open(path, 'w') as f:
+        f.write('changed\n')
+    hashfile = tagfile.files.hashfile
+
+    def failing_hashfile(filepath):
+        raise OSError(5, 'Input/output error', filepath)
+
+    monkeypatch.setattr(tagfile.files, 'hashfile', failing_hashfile)
+    assert tfman.reconcile([testdir]).err_other == 1
+    monkeypatch.setattr(tagfile.core, 'RETRY_DELAY', 0)
+
+    # a failed retry is not counted as indexed and stays in the journal
+    stats = tfman.retry_errors()
+    assert (stats.existing, stats.changed, stats.err_other) == (0, 0, 1)
+    assert ScanError.get(ScanError.filepath == path).count == 2
+    assert Index.get_by_id(row.id).filehash == row.filehash
+
+    monkeypatch.setattr(tagfile.files, 'hashfile', hashfile)
+    stats = tfman.retry_errors()
+    assert (stats.existing, stats.changed) == (0, 1)
+    assert Index.get_by_id(row.id).filehash == hashfile(path)
+    assert ScanError.select().count() == 0
+
+    # cleanup
+    os.remove(path)
+    tfman.reconcile([testdir])
+    capfd.readouterr()
+
+
+def test_reconcile_keeps_entries_of_unreadable_directories(monkeypatch):
+    tfman = tagfile.core.tfman
+    testdir = os.path.join(os.environ['TAGFILEDEV_TESTS_CACHE'], 'unreadable')
+    subdir = os.path.join(testdir, 'sub')
+    os.makedirs(subdir, exist_ok=True)
+    paths = [os.path.join(testdir, 'a.txt'), os.path.join(subdir, 'b.txt'),
+             os.path.join(testdir, 'z.txt')]
+    for path in paths:
+        with open(path, 'w') as f:
+            f.write(f'{path}\n')
+    assert tfman.reconcile([testdir]).new == 3
+    scandir = os.scandir
+
+    def failing_scandir(path):
+        if path == subdir:
+            raise PermissionError(13, 'Permission denied', path)
+        return scandir(path)
+
+    monkeypatch.setattr(os, 'scandir', failing_scandir)
+    stats = tfman.reconcile([testdir])
+    assert (stats.existing, stats.removed, stats.err_permission) == (2, 0, 1)
+    assert Index.select().where(Index.filepath == paths[1]).exists()
+    err = ScanError.get(ScanError.filepath == subdir)
+    assert (err.error, err.count) == ('PermissionError', 1)
+
+    # retried and listed again: the directory is removed from the journal
+    monkeypatch.setattr(os, 'scandir', scandir)
+    monkeypatch.setattr(tagfile.core, 'RETRY_DELAY', 0)
+    stats = tfman.retry_errors()
+    assert (stats.existing, stats.err_permission) == (1, 0)
+    assert ScanError.select().count() == 0
+
+    # cleanup
+    for path in paths:
+        os.remove(path)
+    tfman.reconcile([testdir])
+
+
+def test_due_errors_back_off_exponentially():
+    now = datetime.datetime.now()
+    ScanError.create(filepath='/tmp/x-retry-x', error='OSError', count=3,
+                     last_attempt=now)
+    delay = tagfile.core.RETRY_DELAY * 4
+    assert list(tagfile.core.due_errors(now)) == []
+    later = now + datetime.timedelta(seconds=delay - 1)
+    assert list(tagfile.core.due_errors(later)) == []
+    later = now + datetime.timedelta(seconds=delay)
+    assert list(tagfile.core.due_errors(later)) == ['/tmp/x-retry-x']
+    ScanError.delete().execute()
+
+
+def test_queries_use_indexes_instead_of_table_scans():
+    def plan(query):
+        sql, params = query.sql()
+        cursor = tagfile.database.execute_sql(
+            f'EXPLAIN QUERY PLAN {sql}', params
+        )
+        return ' '.join(row[-1] for row in cursor)
+
+    names = [i.name for i in tagfile.database.get_indexes('index')]
+    assert 'index_filepath' in names
+    assert 'index_filehash_filepath' in names
+
+    by_type = (Index.select().where(Index.cat == 1)
+                    .order_by(Index.filepath))
+    assert 'USING INDEX index_cat_id_filepath' in plan(by_type)
+    assert 'TEMP B-TREE' not in plan(by_type)
+    sorted_by_type = (Index.select().join(Category)
+                           .order_by(Category.name, Index.filepath))
+    assert 'TEMP B-TREE' not in plan(sorted_by_type)
+    by_size = Index.select().order_by(Index.filesize, Index.filepath)
+    assert 'USING INDEX index_filesize_filepath' in plan(by_size)
+    lookup = Index.select().where(Index.filepath == '/a/b')
+    assert 'USING INDEX index_filepath' in plan(lookup)
+    clones = plan(tagfile.core.clone_rows())
+    assert 'COVERING INDEX sqlite_autoindex_dupgroup_1' in clones
+    assert 'USING INDEX index_filehash_filepath (filehash=?)' in clones
+    assert 'TEMP B-TREE' not in clones
+
+
+def test_duplicate_groups_follow_added_changed_and_removed_files(capfd):
+    testdir = os.path.join(os.environ['TAGFILEDEV_TESTS_CACHE'], 'dupgroup')
+    os.makedirs(testdir, exist_ok=True)
+    for name in ('1.txt', '2.txt', '3.txt'):
+        with open(f'{testdir}/{name}', 'w') as f:
+            f.write('same content\n')
+    tagfile.core.tfman.reconcile([testdir])
+    row = Index.get(Index.filepath == f'{testdir}/1.txt')
+    group = DupGroup.get(DupGroup.filehash == row.filehash)
+    assert (group.count, group.size, group.wasted) == (3, 39, 26)
+    assert row.filehash in tagfile.core.clones_list()
+
+    # groups of a single file are removed
+    with open(f'{testdir}/2.txt', 'w') as f:
+        f.write('other content\n')
+    os.remove(f'{testdir}/3.txt')
+    tagfile.core.tfman.reconcile([testdir])
+    assert not DupGroup.select().where(DupGroup.filehash == row.filehash) \
+        .exists()
+
+    # groups are the same as when they are computed from scratch
+    groups = list(DupGroup.select().order_by(DupGroup.filehash).tuples())
+    DupGroup.rebuild()
+    assert list(DupGroup.select().order_by(DupGroup.filehash).tuples()) \
+        == groups
+
+    # cleanup
+    os.remove(f'{testdir}/1.txt')
+    os.remove(f'{testdir}/2.txt')
+    tagfile.core.tfman.reconcile([testdir])
@@ -0,0 +1,76 @@
+# file: tests/tagfile/test_diagnostics.py
+
+# Copyright (c) 2015-2023 Benjamin Althues <benjamin@babab.nl>
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+# contributors may be used to endorse or promote products derived from this
+# software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import os
+import pstats
+
+from tagfile import diagnostics
+from tagfile.commands.main_cmd import entry
+
+
+def test_expand_profile_flag_without_file():
+    assert diagnostics.expand_profile_flag(['--profile', 'list']) == [
+        f'--profile={diagnostics.DEFAULT_PROFILE}', 'list'
+    ]
+
+
+def test_expand_profile_flag_with_file_is_unchanged():
+    argv = ['--profile=out.prof', 'list']
+    assert diagnostics.expand_profile_flag(argv) == argv
+
+
+def test_expand_profile_flag_ignores_options_of_commands():
+    argv = ['--db', 'main', 'find', '--profile']
+    assert diagnostics.expand_profile_flag(argv) == argv
+
+
+def test_run_without_options_only_calls_func():
+    assert diagnostics.run(lambda: 42) == 42
+
+
+def test_entry_with_profile_writes_pstats_output(capfd):
+    filepath = os.path.join(os.environ['TAGFILEDEV_TESTS_CACHE'], 'ls.prof')
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    exitcode = entry([f'--profile={filepath}', 'ls'])
+    assert exitcode == 0
+    cap = capfd.readouterr()
+    assert 'PROFILE' in cap.err
+    assert f'pstats output written to {filepath}' in cap.err
+    assert pstats.Stats(filepath).total_calls > 0
+
+
+def test_entry_with_trace_memory_reports_peak(capfd):
+    exitcode = entry(['--trace-memory', 'version'])
+    assert exitcode == 0
+    cap = capfd.readouterr()
+    assert 'MEMORY' in cap.err
+    assert 'peak traced memory' in cap.err
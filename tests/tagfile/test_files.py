@@ -35,7 +35,7 @@ import os
 import pytest
 
 import tagfile
-from tagfile.common import ConfigError
+from tagfile.common import ConfigError, SpecialFileError
 import tagfile.files
 
 
@@ -94,3 +94,75 @@ def test_files_function_sizefmt():
     assert tagfile.files.sizefmt(1234567890123456789012345678) == '1021.2Y'
     assert tagfile.files.sizefmt(12345678901234567890123456789) == '10212.1Y'
     assert tagfile.files.sizefmt(123456789012345678901234567890) == '102121.1Y'
+
+
+def test_files_function_walksorted_matches_sqlite_order(tmp_path):
+    for relpath in ('a/b.txt', 'a-b.txt', 'a.txt', 'ab/c.txt', 'B.txt'):
+        os.makedirs(os.path.dirname(tmp_path / relpath), exist_ok=True)
+        (tmp_path / relpath).write_text('x')
+    os.symlink(tmp_path / 'ab', tmp_path / 'link-to-dir')
+    paths = list(tagfile.files.walksorted(str(tmp_path)))
+    assert paths == [
+        f'{tmp_path}/B.txt',
+        f'{tmp_path}/a-b.txt',
+        f'{tmp_path}/a.txt',
+        f'{tmp_path}/a/b.txt',
+        f'{tmp_path}/ab/c.txt',
+    ]
+    assert paths == sorted(paths, key=lambda p: p.encode())
+
+
+def test_files_function_volume_id_from_mountinfo(tmp_path):
+    mountinfo = tmp_path / 'mountinfo'
+    mountinfo.write_text(
+        '28 1 254:0 / / rw,relatime - ext4 /dev/vda rw\n'
+        '29 28 0:40 / /mnt/my\\040nfs rw - nfs4 server:/export rw\n'
+    )
+    uuids = tmp_path / 'by-uuid'
+    uuids.mkdir()
+    # device names of block devices can change between boots
+    assert tagfile.files.volume_id(
+        '/', mountinfo=str(mountinfo), uuid_dir=str(uuids)
+    ) is None
+    os.symlink('/dev/vda', uuids / '1234-abcd')
+    assert tagfile.files.volume_id(
+        '/', mountinfo=str(mountinfo), uuid_dir=str(uuids)
+    ) == 'uuid:1234-abcd'
+    assert tagfile.files._unescape_mountinfo('/mnt/my\\040nfs') == \
+        '/mnt/my nfs'
+    assert tagfile.files.volume_id(
+        '/', mountinfo=str(tmp_path / 'missing')
+    ) is None
+
+
+def test_files_function_hashfile_does_not_open_special_files(tmp_path):
+    fifo = tmp_path / 'fifo'
+    os.mkfifo(fifo)
+    with pytest.raises(SpecialFileError):
+        tagfile.files.hashfile(str(fifo))
+
+
+def test_files_function_fs_location_resolves_bind_mounts(tmp_path):
+    mountinfo = tmp_path / 'mountinfo'
+    mountinfo.write_text(
+        '28 1 254:0 / / rw,relatime - ext4 /dev/vda rw\n'
+        f'29 28 254:0 /srv/data {tmp_path} rw - ext4 /dev/vda rw\n'
+    )
+    (tmp_path / 'photos').mkdir()
+    os.symlink(tmp_path / 'photos', tmp_path / 'link')
+    device = os.stat(tmp_path).st_dev
+    location = tagfile.files.fs_location
+    assert location(str(tmp_path), mountinfo=str(mountinfo)) == \
+        (device, '/srv/data')
+    assert location(f'{tmp_path}/link', mountinfo=str(mountinfo)) == \
+        (device, '/srv/data/photos')
+    assert location(str(tmp_path), mountinfo=str(tmp_path / 'missing')) == \
+        (device, os.path.realpath(tmp_path))
+
+
+def test_files_function_digest_range():
+    assert tagfile.files.digest_range('0d7') == (b'\x0d\x70', b'\x0d\x80')
+    assert tagfile.files.digest_range('0d') == (b'\x0d', b'\x0e')
+    assert tagfile.files.digest_range('ff') == (b'\xff', None)
+    with pytest.raises(ValueError):
+        tagfile.files.digest_range('xyz')
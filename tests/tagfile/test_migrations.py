@@ -0,0 +1,156 @@
+# file: tests/tagfile/test_migrations.py
+
+# Copyright (c) 2015-2023 Benjamin Althues <benjamin@babab.nl>
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+# contributors may be used to endorse or promote products derived from this
+# software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import sqlite3
+
+import pytest
+
+import tagfile
+import tagfile.core
+import tagfile.migrations
+import tagfile.search
+from tagfile.models import (
+    Category,
+    DupGroup,
+    Index,
+    MimeType,
+    Repository,
+)
+
+
+def create_baseline_db(filepath):
+    '''Create a database with the schema of tagfile 0.2.0a13'''
+    conn = sqlite3.connect(filepath)
+    conn.executescript(
+        'CREATE TABLE "repository" ("id" INTEGER NOT NULL PRIMARY KEY, '
+        '"filepath" VARCHAR(255) NOT NULL);'
+        'CREATE TABLE "index" ("id" INTEGER NOT NULL PRIMARY KEY, '
+        '"filehash" VARCHAR(255) NOT NULL, '
+        '"filepath" VARCHAR(4096) NOT NULL, '
+        '"basename" VARCHAR(255) NOT NULL, "filesize" INTEGER NOT NULL, '
+        '"cat" VARCHAR(255) NOT NULL, "mime" VARCHAR(255) NOT NULL);'
+        "INSERT INTO repository (filepath) VALUES ('/media/a');"
+    )
+    rows = [('/media/a/x.txt', 'x.txt'), ('/media/a/sub/y.txt', 'y.txt'),
+            ('/media/a/x.txt', 'x.txt'), ('/media/b/z.txt', 'z.txt')]
+    conn.executemany(
+        'INSERT INTO "index" (filehash, filepath, basename, filesize, cat, '
+        "mime) VALUES ('0d7f', ?, ?, 1, 'text', 'text/plain')", rows
+    )
+    conn.commit()
+    conn.close()
+
+
+@pytest.mark.parametrize('sqlite_version', [None, (3, 34, 1)])
+def test_upgrade_baseline_database_in_place(sqlite_version, tmp_path,
+                                            monkeypatch, capfd):
+    dbpath = str(tmp_path / 'baseline.db')
+    create_baseline_db(dbpath)
+    if sqlite_version:
+        # columns are dropped by rebuilding the table before SQLite 3.35
+        monkeypatch.setattr(sqlite3, 'sqlite_version_info', sqlite_version)
+    monkeypatch.setitem(tagfile.cfg['databases'], 'baseline', dbpath)
+    monkeypatch.setattr(tagfile.migrations, 'BATCH_SIZE', 2)
+    db_name = tagfile.core.tfman.db_name
+    try:
+        assert tagfile.core.tfman.select_db('baseline')
+        cap = capfd.readouterr()
+        assert 'UPGRADING DATABASE' in cap.err
+        assert 'Removed 1 duplicate entries.' in cap.err
+        assert cap.out == ''
+        assert tagfile.migrations.user_version() == \
+            tagfile.migrations.SCHEMA_VERSION
+
+        repo = Repository.get()
+        assert repo.device is None
+        rows = Index.select().order_by(Index.id)
+        assert [(i.filepath, i.repo_id) for i in rows] == [
+            ('/media/a/x.txt', repo.id),
+            ('/media/a/sub/y.txt', repo.id),
+            ('/media/b/z.txt', None),
+        ]
+        names = [i.name for i in tagfile.database.get_indexes('index')]
+        assert 'index_filepath' in names
+        assert 'index_cat_id_filepath' in names
+        assert 'index_cat_filepath' not in names
+
+        assert {i.filehash for i in rows} == {b'\x0d\x7f'}
+
+        # categories and MIME types are moved into lookup tables
+        columns = [c.name for c in tagfile.database.get_columns('index')]
+        assert 'cat' not in columns
+        assert {(Category.name_of(i.cat_id), MimeType.name_of(i.mime_id))
+                for i in rows} == {('text', 'text/plain')}
+
+        # names and paths are added to the full-text index
+        where, params = tagfile.search.match('sub OR "z.txt"')
+        res = Index.raw(f'SELECT * FROM `index` WHERE {where}', *params)
+        assert sorted(i.basename for i in res) == ['y.txt', 'z.txt']
+
+        # the remaining clones are a duplicate group
+        assert list(DupGroup.select().tuples()) == [(b'\x0d\x7f', 3, 3, 2)]
+
+        # nothing to do for an up-to-date database
+        assert tagfile.migrations.upgrade() == 0
+    finally:
+        tagfile.core.tfman.select_db(db_name)
+
+
+def test_new_database_gets_latest_schema_version(tmp_path, monkeypatch):
+    dbpath = str(tmp_path / 'new.db')
+    monkeypatch.setitem(tagfile.cfg['databases'], 'new', dbpath)
+    db_name = tagfile.core.tfman.db_name
+    try:
+        assert tagfile.core.tfman.select_db('new')
+        assert tagfile.migrations.user_version() == \
+            tagfile.migrations.SCHEMA_VERSION
+        assert Index.select().count() == 0
+    finally:
+        tagfile.core.tfman.select_db(db_name)
+
+
+def test_new_database_without_full_text_search(tmp_path, monkeypatch):
+    dbpath = str(tmp_path / 'nofts.db')
+    monkeypatch.setitem(tagfile.cfg['databases'], 'nofts', dbpath)
+    monkeypatch.setattr(tagfile.search, 'supported', lambda: False)
+    db_name = tagfile.core.tfman.db_name
+    try:
+        assert tagfile.core.tfman.select_db('nofts')
+        assert not tagfile.search.available()
+        assert tagfile.search.contains('basename', 'abc') == \
+            ('`basename` LIKE ?', ['%abc%'])
+        Index.create(filehash=b'\0', filepath='/nofts/abc.txt',
+                     basename='abc.txt', filesize=1,
+                     cat=Category.intern('text'),
+                     mime=MimeType.intern('text/plain'))
+    finally:
+        tagfile.core.tfman.select_db(db_name)
@@ -31,6 +31,8 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
 import logging
+import multiprocessing
+import threading
 
 import pytest
 import rich.console
@@ -401,3 +403,109 @@ def test_function_vecho_other_levels_verbose(capfd):
     assert cap.err == 'error: some error thing happened\n'
 
     tagfile.output.settings.verbose = False
+
+
+# cached levels and lazy formatting ##########################################
+
+class Unformattable:
+    def __format__(self, spec):
+        raise AssertionError('message was formatted while disabled')
+
+
+def test_settings_enabled_levels_are_cached_for_verbose_and_quiet():
+    assert tagfile.output.settings.enabled[logging.INFO] is False
+    assert tagfile.output.settings.enabled[logging.FATAL] is True
+    tagfile.output.settings.verbose = True
+    assert tagfile.output.settings.enabled[logging.INFO] is True
+    tagfile.output.settings.quiet = True
+    assert tagfile.output.settings.enabled[logging.INFO] is False
+    tagfile.output.settings.quiet = False
+    tagfile.output.settings.verbose = False
+    assert tagfile.output.settings.enabled[logging.INFO] is False
+
+
+def test_disabled_levels_do_not_format_messages(capfd):
+    tagfile.output.info('scan: added {}', Unformattable())
+    cap = capfd.readouterr()
+    assert cap.out == ''
+    assert cap.err == ''
+
+
+def test_enabled_levels_format_messages_lazily(capfd):
+    tagfile.output.settings.verbose = True
+    tagfile.output.info('scan: added {}', '/tmp/file.txt')
+    tagfile.output.info('no args, so {braces} are kept')
+    tagfile.output.settings.verbose = False
+    cap = capfd.readouterr()
+    assert cap.out == ('scan: added /tmp/file.txt\n'
+                       'no args, so {braces} are kept\n')
+
+
+def test_logging_from_worker_threads_through_queue(tmp_path):
+    logfile = tmp_path / 'threads.log'
+    root = logging.getLogger()
+    handlers = root.handlers[:]
+    level = root.level
+    listener = tagfile.output._listener
+    tagfile.output._listener = None
+
+    tagfile.output.start_logging(str(logfile))
+    threads = [
+        threading.Thread(target=tagfile.output.error, args=('thread {}', n))
+        for n in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    tagfile.output.stop_logging()
+
+    # restore logging setup
+    root.handlers[:] = handlers
+    root.setLevel(level)
+    tagfile.output._listener = listener
+
+    lines = logfile.read_text().splitlines()
+    assert len(lines) == 5
+    assert sorted(line.split(': ', 1)[1] for line in lines) == [
+        f'thread {n}' for n in range(5)
+    ]
+
+
+def _log_from_worker_process(queue_obj, n):
+    tagfile.output.worker_logging(queue_obj)
+    tagfile.output.error('process {}', n)
+
+
+def test_logging_from_worker_processes_through_queue(tmp_path):
+    logfile = tmp_path / 'processes.log'
+    root = logging.getLogger()
+    handlers = root.handlers[:]
+    level = root.level
+    listener = tagfile.output._listener
+    tagfile.output._listener = None
+
+    context = multiprocessing.get_context('fork')
+    queue_obj = context.Queue()
+    tagfile.output.start_logging(str(logfile), queue_obj)
+    processes = [
+        context.Process(target=_log_from_worker_process, args=(queue_obj, n))
+        for n in range(3)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    tagfile.output.stop_logging()
+
+    # restore logging setup
+    root.handlers[:] = handlers
+    root.setLevel(level)
+    tagfile.output._listener = listener
+    tagfile.output.log_queue = None
+
+    assert [process.exitcode for process in processes] == [0, 0, 0]
+    lines = logfile.read_text().splitlines()
+    assert sorted(line.split(': ', 1)[1] for line in lines) == [
+        f'process {n}' for n in range(3)
+    ]
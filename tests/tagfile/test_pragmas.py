@@ -0,0 +1,86 @@
+# file: tests/tagfile/test_pragmas.py
+
+# Copyright (c) 2015-2023 Benjamin Althues <benjamin@babab.nl>
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+# contributors may be used to endorse or promote products derived from this
+# software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import tagfile
+import tagfile.core
+import tagfile.pragmas
+
+
+def test_connect_pragmas_set_page_size_first_and_override_profile():
+    pragmas = dict(tagfile.pragmas.connect_pragmas('safe'))
+    assert pragmas['journal_mode'] == 'wal'
+    assert pragmas['synchronous'] == 2
+    assert 'page_size' not in pragmas
+
+    pragmas = tagfile.pragmas.connect_pragmas(
+        'safe', {'page_size': 8192, 'synchronous': 1}
+    )
+    assert pragmas[0] == ('page_size', 8192)
+    assert dict(pragmas)['synchronous'] == 1
+
+
+def test_database_config_is_a_path_or_a_table(monkeypatch):
+    monkeypatch.setitem(tagfile.cfg['databases'], 'a', '~/a.db')
+    monkeypatch.setitem(tagfile.cfg['databases'], 'b', {'path': '~/b.db'})
+    monkeypatch.setitem(tagfile.cfg['databases'], 'c', {
+        'path': '~/c.db', 'profile': 'safe', 'pragmas': {'cache_size': -1},
+    })
+    assert tagfile.pragmas.database_config('a') == ('~/a.db', None, {})
+    assert tagfile.pragmas.database_config('b') == ('~/b.db', None, {})
+    assert tagfile.pragmas.database_config('c') == \
+        ('~/c.db', 'safe', {'cache_size': -1})
+
+
+def test_configured_profile_and_pragmas_take_precedence(tmp_path,
+                                                        monkeypatch):
+    monkeypatch.setitem(tagfile.cfg['databases'], 'archive', {
+        'path': str(tmp_path / 'archive.db'),
+        'profile': 'safe',
+        'pragmas': {'page_size': 8192, 'cache_size': -1000},
+    })
+    tfman = tagfile.core.tfman
+    db_name = tfman.db_name
+    try:
+        assert tfman.select_db('archive')
+        assert tagfile.database.pragma('page_size') == 8192
+        tfman.use_profile('bulk-load')
+        assert tagfile.database.pragma('synchronous') == 2
+        assert tagfile.database.pragma('cache_size') == -1000
+    finally:
+        tfman.select_db(db_name)
+
+    # without configured profile, commands select the profile
+    tfman.use_profile('bulk-load')
+    assert tagfile.database.pragma('synchronous') == 0
+    assert tagfile.database.pragma('temp_store') == 2
+    tfman.use_profile(tagfile.pragmas.DEFAULT)
+    assert tagfile.database.pragma('synchronous') == 1
@@ -0,0 +1,82 @@
+# file: tests/tagfile/test_progress.py
+
+# Copyright (c) 2015-2023 Benjamin Althues <benjamin@babab.nl>
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+# contributors may be used to endorse or promote products derived from this
+# software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import tagfile
+import tagfile.output
+from tagfile.progress import Progress
+
+
+def test_progress_is_disabled_when_output_is_not_a_terminal(capfd):
+    with Progress(total=10) as bar:
+        for _ in range(10):
+            bar.advance()
+    assert bar.enabled is False
+    assert bar.completed == 10
+    cap = capfd.readouterr()
+    assert cap.out == ''
+
+
+def test_progress_is_disabled_when_progressbars_are_disabled_in_config():
+    tagfile.output.settings.update_consoles_for_testing(force_term=True)
+    tagfile.cfg['ui']['progressbars'] = False
+    bar = Progress(total=10)
+    tagfile.cfg['ui']['progressbars'] = True
+    tagfile.output.settings.update_consoles_for_testing(force_term=False)
+    assert bar.enabled is False
+
+
+def test_progress_updates_bar_with_accumulated_bytes(capfd):
+    tagfile.output.settings.update_consoles_for_testing(force_term=True)
+    with Progress(total=3000, unit='bytes', interval=3600) as bar:
+        assert bar.enabled is True
+        bar.advance(1000)  # first advance updates the bar directly
+        bar.advance(1000)  # not within interval
+        task = bar._bar.tasks[0]
+        assert task.completed == 1000
+        bar.advance(1000)
+    # remaining amount is flushed on exit
+    assert task.completed == 3000
+    assert bar.completed == 3000
+    tagfile.output.settings.update_consoles_for_testing(force_term=False)
+    cap = capfd.readouterr()
+    assert '3.0/3.0 kB' in cap.out
+
+
+def test_progress_renders_on_given_console(capfd):
+    tagfile.output.settings.update_consoles_for_testing(force_term=True)
+    with Progress(total=2, console=tagfile.output.conserr) as bar:
+        assert bar.enabled is True
+        bar.advance(2)
+    tagfile.output.settings.update_consoles_for_testing(force_term=False)
+    cap = capfd.readouterr()
+    assert cap.out == ''
+    assert '2/2' in cap.err
@@ -0,0 +1,92 @@
+# file: tests/tagfile/test_reconcile.py
+
+# Copyright (c) 2015-2023 Benjamin Althues <benjamin@babab.nl>
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+# contributors may be used to endorse or promote products derived from this
+# software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import os
+
+from tagfile import reconcile
+from tagfile.models import Category, Index, MimeType
+
+
+class Row:
+    def __init__(self, filepath):
+        self.filepath = filepath
+
+
+def test_merge_yields_added_removed_and_existing_in_order():
+    rows = [Row('/m/a'), Row('/m/c'), Row('/m/d'), Row('/m/f')]
+    paths = ['/m/b', '/m/c', '/m/e', '/m/f', '/m/g']
+    pairs = [
+        (path, row.filepath if row else None)
+        for path, row in reconcile.merge(paths, rows)
+    ]
+    assert pairs == [
+        (None, '/m/a'),
+        ('/m/b', None),
+        ('/m/c', '/m/c'),
+        (None, '/m/d'),
+        ('/m/e', None),
+        ('/m/f', '/m/f'),
+        ('/m/g', None),
+    ]
+
+
+def test_merge_with_empty_inputs():
+    assert list(reconcile.merge([], [])) == []
+    assert list(reconcile.merge(['/m/a'], [])) == [('/m/a', None)]
+    row = Row('/m/a')
+    assert list(reconcile.merge([], [row])) == [(None, row)]
+
+
+def test_index_rows_are_ordered_and_limited_to_subtree():
+    testdir = os.path.join(os.environ['TAGFILEDEV_TESTS_CACHE'], 'rows')
+    filepaths = [
+        f'{testdir}/b.txt',
+        f'{testdir}/a/z.txt',
+        f'{testdir}/a.txt',
+        f'{testdir}2/sibling.txt',
+        testdir.upper() + '/case.txt',
+    ]
+    for filepath in filepaths:
+        Index.create(filehash='0' * 40, filepath=filepath,
+                     basename=os.path.basename(filepath), filesize=1,
+                     cat=Category.intern('text'),
+                     mime=MimeType.intern('text/plain'))
+
+    rows = list(reconcile.index_rows(testdir, chunk_size=2))
+    assert [row.filepath for row in rows] == [
+        f'{testdir}/a.txt',
+        f'{testdir}/a/z.txt',
+        f'{testdir}/b.txt',
+    ]
+
+    # cleanup
+    Index.delete().where(Index.filepath << filepaths).execute()
@@ -0,0 +1,68 @@
+# file: tests/tagfile/test_pragmas.py
+
+# Copyright (c) 2015-2023 Benjamin Althues <benjamin@babab.nl>
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+# contributors may be used to endorse or promote products derived from this
+# software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import tagfile.core
+import tagfile.search
+from tagfile.models import Category, Index, MimeType
+
+
+def test_fuzzy_queries_only_the_rarest_trigrams():
+    names = [f'img{n}.jpg' for n in range(5)] + ['beach.jpg', 'bleach.png']
+    ids = [
+        Index.create(filehash=b'\0', filepath=f'/tagfile-search/{name}',
+                     basename=name, filesize=1,
+                     cat=Category.intern('image'),
+                     mime=MimeType.intern('image/jpeg')).id
+        for name in names
+    ]
+    try:
+        counts = tagfile.search.doc_counts(['jpg', 'eac', 'xyz'])
+        assert counts == {'jpg': 6, 'eac': 2}
+
+        # "jpg" and ".jp" are in most names and left out
+        assert tagfile.search.fuzzy('bech.jpg', max_docs=4) == \
+            'basename : ("ch." OR "h.j")'
+        # at least the rarest trigram, even when it is in more names
+        assert tagfile.search.fuzzy('jpg', max_docs=1) == \
+            'basename : ("jpg")'
+        # trigrams that are in no name match nothing
+        assert tagfile.search.fuzzy('xyz') == 'basename : ("xyz")'
+        assert tagfile.search.fuzzy('xy') is None
+    finally:
+        tagfile.core.delete_ids(ids)
+
+
+def test_trigram_tokenizer_is_supported():
+    # SQLite 3.34 or newer, which is bundled with the Python versions
+    # that are tested
+    assert tagfile.search.supported()
+    assert tagfile.search.available()
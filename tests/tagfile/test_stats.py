@@ -0,0 +1,93 @@
+# file: tests/tagfile/test_stats.py
+
+# Copyright (c) 2015-2023 Benjamin Althues <benjamin@babab.nl>
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+# contributors may be used to endorse or promote products derived from this
+# software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+# IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+# OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+# WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+# OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE,
+# EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# SPDX-License-Identifier: BSD-3-Clause
+
+import json
+import os
+import time
+
+from tagfile.stats import PHASES, ScanStats
+
+
+def test_phases_are_timed_in_order_of_execution():
+    assert PHASES == (
+        'walk', 'ignore', 'stat', 'lookup', 'mime', 'hash', 'write'
+    )
+
+
+def test_walktime_is_included_in_times():
+    stats = ScanStats(walktime=1.5)
+    assert stats.times['walk'] == 1.5
+    assert stats.times['hash'] == 0.0
+
+
+def test_lap_adds_time_to_phase_and_returns_current_time():
+    stats = ScanStats()
+    start = time.perf_counter()
+    now = stats.lap('hash', start)
+    assert now >= start
+    assert stats.times['hash'] == now - start
+
+
+def test_throughput_is_zero_without_elapsed_time():
+    stats = ScanStats()
+    assert stats.files_per_second == 0.0
+    assert stats.mb_per_second == 0.0
+
+
+def test_throughput():
+    stats = ScanStats()
+    stats.total = 10
+    stats.elapsed = 2.0
+    stats.bytes_hashed = 4 * 1024 ** 2
+    stats.times['hash'] = 2.0
+    assert stats.files_per_second == 5.0
+    assert stats.mb_per_second == 2.0
+
+
+def test_write_json():
+    stats = ScanStats()
+    stats.total = 3
+    stats.new = 2
+    stats.ignored = 1
+    stats.stop()
+    filepath = os.path.join(os.environ['TAGFILEDEV_TESTS_CACHE'],
+                            'stats.json')
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    stats.write_json(filepath)
+    with open(filepath) as fh:
+        data = json.load(fh)
+    assert data['files'] == {
+        'total': 3, 'existing': 0, 'ignored': 1, 'special': 0,
+        'moved': 0, 'changed': 0, 'removed': 0, 'new': 2,
+    }
+    assert set(data['seconds']) == set(PHASES) | {'elapsed'}
+    assert data['bytes_hashed'] == 0
@@ -51,7 +51,7 @@ def test_default_cfg_structure():
     cfg = tagfile.cfg
     assert cfg
     assert type(cfg) is dict
-    assert len(cfg) == 7
+    assert len(cfg) == 8
     assert cfg['default_database'] == 'main'
     assert cfg['logging']
     assert type(cfg['logging']) is dict
@@ -93,6 +93,11 @@ def test_default_cfg_structure():
     assert len(cfg['hashing']) == 2
     assert cfg['hashing']['algorithm'] == 'sha1'
     assert cfg['hashing']['buffer-size'] == 1024
+    assert cfg['prune']
+    assert type(cfg['prune']) is dict
+    assert len(cfg['prune']) == 2
+    assert cfg['prune']['workers'] == 8
+    assert cfg['prune']['chunk-size'] == 1000
 
 
 def test_location_variables():